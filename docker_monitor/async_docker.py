@@ -0,0 +1,220 @@
+"""
+Minimal asyncio client for the Docker (and Podman Docker-compatible) REST API.
+
+Talks to the daemon over a pooled unix socket (or TCP) with aiohttp, so events,
+stats streams and lifecycle operations for many containers multiplex on one
+event loop instead of each blocking a thread.
+
+    async with AsyncDockerClient("unix:///var/run/docker.sock") as docker_api:
+        for container in await docker_api.list_containers(all=True):
+            print(container.name, container.status)
+"""
+import asyncio
+import json
+from typing import AsyncIterator, Dict, List, Optional
+
+import aiohttp
+
+from image_pull import split_image
+from monitor_events import container_name
+
+DEFAULT_BASE_URL = "unix:///var/run/docker.sock"
+
+# Docker Engine API version; 1.41 is served by Docker 20.10+ and by Podman's compat API.
+API_VERSION = "v1.41"
+
+
+class DockerAPIError(Exception):
+    """An error response from the Docker API."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.message = message
+
+
+class NotFound(DockerAPIError):
+    """The container, image or endpoint doesn't exist (HTTP 404)."""
+
+
+class DockerConnectionError(DockerAPIError):
+    """
+    The daemon couldn't be reached, or the connection broke (e.g. the daemon
+    restarted mid-stream). A DockerAPIError too, so callers catch one type.
+    """
+
+    def __init__(self, message: str):
+        Exception.__init__(self, message)
+        self.status = None
+        self.message = message
+
+
+class AsyncContainer:
+    """A container as returned by the list or inspect endpoints."""
+
+    def __init__(self, attrs: dict):
+        self.attrs = attrs
+
+    @property
+    def id(self) -> str:
+        return self.attrs["Id"]
+
+    @property
+    def name(self) -> str:
+        return container_name(self)
+
+    @property
+    def status(self) -> str:
+        state = self.attrs.get("State")
+        if isinstance(state, dict):
+            return state.get("Status", "unknown")
+        return state or "unknown"
+
+
+def _encode_filters(filters: Optional[dict]) -> Optional[str]:
+    """Encodes filters the way the Docker API expects: a JSON map of lists."""
+    if not filters:
+        return None
+    return json.dumps({key: value if isinstance(value, list) else [value] for key, value in filters.items()})
+
+
+class AsyncDockerClient:
+    """
+    Pooled asyncio client for the Docker Engine API.
+
+    Every failure, whether an error response or a broken connection, raises a
+    DockerAPIError.
+
+    Args:
+        base_url: 'unix:///path/to/socket', 'tcp://host:port' or 'http://host:port'.
+        pool_size: Maximum number of simultaneous connections to the daemon.
+        timeout: Timeout in seconds for non-streaming requests.
+    """
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, pool_size: int = 100, timeout: float = 30):
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.timeout = timeout
+        if base_url.startswith("unix://"):
+            self._root = f"http://localhost/{API_VERSION}"
+        else:
+            self._root = f"{base_url.replace('tcp://', 'http://', 1).rstrip('/')}/{API_VERSION}"
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """The pooled HTTP session, created on first use inside the running event loop."""
+        if self._session is None:
+            if self.base_url.startswith("unix://"):
+                connector = aiohttp.UnixConnector(path=self.base_url[len("unix://"):], limit=self.pool_size)
+            else:
+                connector = aiohttp.TCPConnector(limit=self.pool_size)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def __aenter__(self) -> "AsyncDockerClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _request(self, method: str, path: str, params: Optional[dict] = None, body=None,
+                       timeout: Optional[float] = None):
+        params = {key: value for key, value in (params or {}).items() if value is not None}
+        request_timeout = aiohttp.ClientTimeout(total=timeout or self.timeout)
+        try:
+            async with self.session.request(method, self._root + path, params=params, json=body,
+                                             timeout=request_timeout) as response:
+                await self._raise_for_status(response)
+                if response.content_type == "application/json":
+                    return await response.json()
+                return await response.read()
+        except aiohttp.ClientError as e:
+            raise DockerConnectionError(f"{method} {path}: {e!r}") from e
+        except asyncio.TimeoutError as e:
+            raise DockerConnectionError(f"{method} {path}: timed out after {request_timeout.total}s") from e
+
+    async def _stream(self, method: str, path: str, params: Optional[dict] = None) -> AsyncIterator[dict]:
+        """Yields the newline-delimited JSON messages of a streaming endpoint."""
+        params = {key: value for key, value in (params or {}).items() if value is not None}
+        timeout = aiohttp.ClientTimeout(total=None, sock_read=None)
+        try:
+            async with self.session.request(method, self._root + path, params=params, timeout=timeout) as response:
+                await self._raise_for_status(response)
+                async for line in response.content:
+                    line = line.strip()
+                    if line:
+                        yield json.loads(line)
+        except aiohttp.ClientError as e:
+            # Not OSErrors: ServerDisconnectedError and ClientPayloadError, when the daemon goes away mid-stream.
+            raise DockerConnectionError(f"{method} {path}: {e!r}") from e
+
+    @staticmethod
+    async def _raise_for_status(response: aiohttp.ClientResponse):
+        if response.status < 400:
+            return
+        try:
+            message = (await response.json()).get("message", "")
+        except (aiohttp.ContentTypeError, ValueError):
+            message = (await response.text()).strip()
+        error = NotFound if response.status == 404 else DockerAPIError
+        raise error(response.status, message)
+
+    # --- System ---
+
+    async def ping(self) -> bool:
+        return await self._request("GET", "/_ping") == b"OK"
+
+    async def info(self) -> dict:
+        return await self._request("GET", "/info")
+
+    # --- Containers ---
+
+    async def list_containers(self, all: bool = False, filters: Optional[dict] = None) -> List[AsyncContainer]:
+        listed = await self._request("GET", "/containers/json",
+                                     {"all": "1" if all else "0", "filters": _encode_filters(filters)})
+        return [AsyncContainer(attrs) for attrs in listed]
+
+    async def inspect_container(self, container_id: str) -> AsyncContainer:
+        return AsyncContainer(await self._request("GET", f"/containers/{container_id}/json"))
+
+    async def create_container(self, name: str, image: str, command: Optional[List[str]] = None,
+                               labels: Optional[Dict[str, str]] = None, **config) -> str:
+        """Creates a container and returns its ID. Extra keyword arguments go into the create body as-is."""
+        body = {"Image": image, "Cmd": command, "Labels": labels or {}, **config}
+        created = await self._request("POST", "/containers/create", {"name": name}, body)
+        return created["Id"]
+
+    async def start_container(self, container_id: str):
+        await self._request("POST", f"/containers/{container_id}/start")
+
+    async def stop_container(self, container_id: str, timeout: int = 10):
+        # The daemon waits up to 'timeout' seconds before killing, so allow for that.
+        await self._request("POST", f"/containers/{container_id}/stop", {"t": timeout},
+                            timeout=self.timeout + timeout)
+
+    async def remove_container(self, container_id: str, force: bool = False):
+        await self._request("DELETE", f"/containers/{container_id}", {"force": "1" if force else None})
+
+    # --- Streams ---
+
+    def events(self, filters: Optional[dict] = None, since: Optional[int] = None) -> AsyncIterator[dict]:
+        return self._stream("GET", "/events", {"filters": _encode_filters(filters), "since": since})
+
+    def stats(self, container_id: str) -> AsyncIterator[dict]:
+        return self._stream("GET", f"/containers/{container_id}/stats", {"stream": "1"})
+
+    # --- Images ---
+
+    async def inspect_image(self, image: str) -> dict:
+        return await self._request("GET", f"/images/{image}/json")
+
+    def pull_image(self, image: str) -> AsyncIterator[dict]:
+        """Pulls an image, yielding the daemon's progress messages."""
+        repository, tag = split_image(image)
+        return self._stream("POST", "/images/create", {"fromImage": repository, "tag": tag})
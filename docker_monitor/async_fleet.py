@@ -0,0 +1,338 @@
+"""
+Asyncio implementation of docker_monitor's launch / monitor / cleanup.
+
+AsyncFleet does the same work as the thread-based functions in
+docker_monitor.py, but every daemon call goes through one AsyncDockerClient,
+so a slow stop() or image pull only suspends its own task. AsyncRuntime runs
+the event loop in a background thread so the existing blocking entry points
+(launch_containers, monitor_containers, cleanup_containers) can drive it.
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from async_docker import AsyncContainer, AsyncDockerClient, DockerAPIError, NotFound
+from fleet_ops import OperationReport
+from fleet_spec import SPEC_HASH_LABEL, FleetConflict, check_fleet, fleet_labels, fleet_selector, plan_reconcile, spec_hash
+from image_pull import ImagePullError, PullProgress, image_key, unique_images
+from readiness import NotReady, ReadinessTracker
+from monitor_events import ContainerEventWatcher, Transition
+
+# Seconds to wait before reopening the event stream after it drops.
+EVENT_STREAM_RETRY_SECONDS = 1
+
+
+class AsyncRuntime:
+    """An asyncio event loop running in a daemon thread, driven from synchronous code."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="asyncio", daemon=True)
+        self._thread.start()
+
+    def run(self, coroutine: Awaitable, timeout: Optional[float] = None):
+        """Runs a coroutine on the loop and waits for its result. Ctrl+C cancels it."""
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        try:
+            return future.result(timeout)
+        except KeyboardInterrupt:
+            future.cancel()
+            raise
+
+
+async def gather_bounded(operation: str, items: Iterable, func: Callable[[object], Awaitable],
+                         key: Callable[[object], str], max_concurrency: int) -> Tuple[Dict[str, object], OperationReport]:
+    """The asyncio counterpart of fleet_ops.run_concurrently()."""
+    report = OperationReport(operation)
+    results = {}
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run_one(item):
+        name = key(item)
+        async with semaphore:
+            try:
+                results[name] = await func(item)
+                report.succeeded.append(name)
+            except Exception as e:
+                report.failed[name] = str(e)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_one(item) for item in items))
+    report.wall_time = time.perf_counter() - start
+    return results, report
+
+
+class AsyncFleet:
+    """
+    Launches, monitors and cleans up a fleet of containers on one event loop.
+
+    Args:
+        api: The async Docker client.
+        fleet: The fleet the containers belong to; only its containers are listed or removed.
+        max_concurrency: Lifecycle operations in flight at the same time.
+        stop_timeout: Seconds to wait for a container to stop before it is killed.
+        pull_policy: 'missing', 'always' or 'never', as for image_pull.ImagePuller.
+        pull_concurrency: Image pulls in flight at the same time.
+        readiness: Gates launches on their dependencies and probes started containers, if given.
+    """
+
+    def __init__(self, api: AsyncDockerClient, fleet: str, max_concurrency: int = 16, stop_timeout: int = 5,
+                 pull_policy: str = "missing", pull_concurrency: int = 4,
+                 readiness: Optional[ReadinessTracker] = None):
+        self.api = api
+        self.fleet = fleet
+        self.label = fleet_selector(fleet)
+        self.max_concurrency = max_concurrency
+        self.stop_timeout = stop_timeout
+        self.pull_policy = pull_policy
+        self.pull_concurrency = pull_concurrency
+        self.readiness = readiness
+        self.watcher: Optional[ContainerEventWatcher] = None
+        self._stats_tasks: Dict[str, asyncio.Task] = {}
+        self._pulls: Dict[str, asyncio.Task] = {}
+        self._pull_semaphore: Optional[asyncio.Semaphore] = None
+
+    async def pull(self, image: str):
+        """Pulls an image unless the policy says otherwise, streaming its layer progress."""
+        if self.pull_policy == "missing":
+            try:
+                await self.api.inspect_image(image)
+                return
+            except NotFound:
+                pass
+        if self._pull_semaphore is None:
+            self._pull_semaphore = asyncio.Semaphore(max(1, self.pull_concurrency))
+        async with self._pull_semaphore:
+            progress = PullProgress(image)
+            logging.info(f"Pulling image '{image}'...")
+            try:
+                async for message in self.api.pull_image(image):
+                    progress.update(message)
+            except DockerAPIError as e:
+                raise ImagePullError(image, str(e))
+            progress.finish()
+
+    def start_pulls(self, images: Iterable[str]):
+        """Starts one pull task per image that isn't pulled or being pulled yet."""
+        if self.pull_policy == "never":
+            return
+        for image in images:
+            key = image_key(image)
+            if key not in self._pulls:
+                task = self._pulls[key] = asyncio.ensure_future(self.pull(image))
+                task.add_done_callback(lambda task, key=key: self._pull_done(key, task))
+
+    def _pull_done(self, key: str, task: asyncio.Task):
+        # Forget a failed pull, so the next launch of the image (e.g. a supervisor restart) tries again.
+        if task.cancelled() or task.exception() is not None:
+            self._pulls.pop(key, None)
+
+    async def image_ready(self, image: str):
+        """Waits for an image's pull, starting it if needed. Raises ImagePullError if it failed."""
+        if self.pull_policy == "never":
+            return
+        self.start_pulls([image])
+        # Shielded: one cancelled launch must not cancel a pull other launches are waiting for.
+        await asyncio.shield(self._pulls[image_key(image)])
+
+    async def launch_one(self, spec: dict) -> AsyncContainer:
+        """
+        Launches a single container from its spec, replacing any existing container with the same name.
+        With readiness tracking, waits for the container's dependencies first and starts probing it after.
+        """
+        if self.readiness is None:
+            return await self._launch_one(spec)
+        name = spec["name"]
+        try:
+            # The tracker's wait blocks, so it runs in the default executor rather than on the loop.
+            await asyncio.to_thread(self.readiness.wait_for_dependencies, name)
+        except NotReady as e:
+            logging.error(f"Container '{name}' not launched: {e}")
+            self.readiness.failed(name, str(e))
+            raise
+        try:
+            container = await self._launch_one(spec)
+        except Exception as e:
+            self.readiness.failed(name, str(e))
+            raise
+        self.readiness.started(container.id, name)
+        return container
+
+    async def _launch_one(self, spec: dict) -> AsyncContainer:
+        name = spec["name"]
+        # Wait for the image first, so an existing container keeps running while it is pulled.
+        try:
+            await self.image_ready(spec["image"])
+        except ImagePullError as e:
+            logging.error(f"Container '{name}' not launched: {e}")
+            raise
+        try:
+            existing = await self.api.inspect_container(name)
+            try:
+                check_fleet(existing, self.fleet)
+            except FleetConflict as e:
+                logging.error(f"Container '{name}' not launched: {e}")
+                raise
+            logging.warning(f"Existing container '{name}' found. Stopping and removing it.")
+            await self.api.stop_container(existing.id, self.stop_timeout)
+            await self.api.remove_container(existing.id)
+        except NotFound:
+            pass # No existing container, proceed
+
+        labels = {**fleet_labels(self.fleet), SPEC_HASH_LABEL: spec_hash(spec)}
+        try:
+            env = [f"{key}={value}" for key, value in (spec.get("env") or {}).items()]
+            container_id = await self.api.create_container(name, spec["image"], spec["command"], labels=labels,
+                                                           Env=env or None)
+        except NotFound:
+            logging.error(f"Image '{spec['image']}' not found for container '{name}'. Please pull it first (e.g., 'docker pull {spec['image']}').")
+            raise
+        await self.api.start_container(container_id)
+        container = await self.api.inspect_container(container_id)
+        logging.info(f"Launched container '{name}' (ID: {container.id[:12]}) using image '{spec['image']}'. Status: {container.status}")
+        return container
+
+    async def start_one(self, container: AsyncContainer) -> AsyncContainer:
+        logging.info(f"Starting existing container '{container.name}' (ID: {container.id[:12]}).")
+        try:
+            await self.api.start_container(container.id)
+        except Exception as e:
+            if self.readiness:
+                self.readiness.failed(container.name, str(e))
+            raise
+        if self.readiness:
+            self.readiness.started(container.id, container.name)
+        return container
+
+    async def cleanup_one(self, container: AsyncContainer):
+        """Stops and removes a single container. A container that is already gone is not an error."""
+        try:
+            logging.info(f"Stopping container '{container.name}' (ID: {container.id[:12]})...")
+            await self.api.stop_container(container.id, self.stop_timeout)
+            await self.api.remove_container(container.id)
+            logging.info(f"Container '{container.name}' removed.")
+        except NotFound:
+            logging.warning(f"Container '{container.name}' (ID: {container.id[:12]}) was already removed or never existed. Skipping cleanup.")
+
+    async def launch(self, specs: List[dict]) -> Tuple[List[AsyncContainer], List[OperationReport]]:
+        """
+        Reconciles the managed containers with the specs, like docker_monitor.launch_containers().
+        Returns the containers in spec order and one report per operation that ran.
+        """
+        try:
+            existing = {c.name: c for c in await self.api.list_containers(all=True, filters={"label": self.label})}
+        except DockerAPIError as e:
+            logging.error(f"Could not list existing containers: {e}")
+            existing = {}
+        plan = plan_reconcile(specs, existing, self.fleet)
+        logging.info(f"Reconcile plan: {plan.summary()}.")
+        # Start pulling every image now; each launch only waits for its own.
+        self.start_pulls(unique_images(plan.create))
+        if self.readiness:
+            for spec, container in plan.keep:
+                self.readiness.started(container.id, spec["name"])
+
+        containers = {spec["name"]: container for spec, container in plan.keep}
+        reports = []
+        for operation, items, func in (("start", [container for _, container in plan.start], self.start_one),
+                                       ("launch", plan.create, self.launch_one),
+                                       ("remove", plan.remove, self.cleanup_one)):
+            if not items:
+                continue
+            results, report = await gather_bounded(operation, items, func, key=_operation_key,
+                                                   max_concurrency=self.max_concurrency)
+            if operation != "remove":
+                containers.update(results)
+            reports.append(report)
+        return [containers[spec["name"]] for spec in specs if spec["name"] in containers], reports
+
+    async def cleanup(self, containers: List[AsyncContainer]) -> OperationReport:
+        _, report = await gather_bounded("cleanup", containers, self.cleanup_one, key=_operation_key,
+                                         max_concurrency=self.max_concurrency)
+        return report
+
+    async def monitor(self, containers: List[AsyncContainer], on_transition: Callable[[Transition], None],
+                      reconcile_interval: float, metrics=None, since: Optional[float] = None,
+                      replay_until: Optional[float] = None, on_reconcile: Optional[Callable[[float], None]] = None):
+        """
+        Follows the event stream for the containers until cancelled, reconciling
+        every reconcile_interval seconds. If a MetricsRegistry is given, one
+        stats stream task runs per running container. 'since' and 'replay_until'
+        resume the stream as in ContainerEventWatcher.start(); 'on_reconcile' is
+        called with the time of each successful reconcile.
+        """
+        watcher = self.watcher = ContainerEventWatcher(None, containers, label=self.label)
+        if since is not None:
+            watcher.replay_until = replay_until or time.time()
+
+        def dispatch():
+            while not watcher.transitions.empty():
+                transition = watcher.transitions.get_nowait()
+                on_transition(transition)
+                if transition.new_status == "removed":
+                    watcher.forget(transition.container_id)
+                if metrics is not None and transition.new_status == "running":
+                    self.watch_stats(transition.container_id, metrics)
+
+        async def follow_events():
+            cursor = int(since if since is not None else time.time())
+            while True:
+                try:
+                    async for event in self.api.events(filters=watcher.filters, since=cursor):
+                        cursor = event.get("time", cursor)
+                        watcher.handle_event(event)
+                        dispatch()
+                except DockerAPIError as e:
+                    logging.warning(f"Docker event stream interrupted: {e}. Reconnecting...")
+                await asyncio.sleep(EVENT_STREAM_RETRY_SECONDS)
+
+        if metrics is not None:
+            for container in containers:
+                if container.status == "running":
+                    self.watch_stats(container.id, metrics)
+
+        events_task = asyncio.ensure_future(follow_events())
+        try:
+            while True:
+                try:
+                    listed_at = time.time()
+                    watcher.apply_listing(await self.api.list_containers(all=True, filters={"label": self.label}))
+                    dispatch()
+                    if on_reconcile:
+                        on_reconcile(listed_at)
+                except DockerAPIError as e:
+                    logging.error(f"API error while reconciling container state: {e}")
+                await asyncio.sleep(reconcile_interval)
+        finally:
+            self.watcher = None
+            events_task.cancel()
+            for task in self._stats_tasks.values():
+                task.cancel()
+
+    def watch_stats(self, container_id: str, metrics):
+        """Starts a stats stream task for a container unless one is already running."""
+        task = self._stats_tasks.get(container_id)
+        if task is not None and not task.done():
+            return
+
+        async def follow_stats():
+            try:
+                async for sample in self.api.stats(container_id):
+                    if not metrics.record_stats(container_id, sample):
+                        return
+            except NotFound:
+                pass
+            except DockerAPIError as e:
+                logging.warning(f"Stats stream for container {container_id[:12]} ended: {e}")
+
+        task = self._stats_tasks[container_id] = asyncio.ensure_future(follow_stats())
+        # Drop finished streams, so containers that come and go don't pile up here.
+        task.add_done_callback(lambda task: self._stats_tasks.pop(container_id, None)
+                               if self._stats_tasks.get(container_id) is task else None)
+
+
+def _operation_key(item) -> str:
+    """Names a spec or container in operation reports."""
+    return item["name"] if isinstance(item, dict) else item.name
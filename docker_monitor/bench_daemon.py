@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Benchmarks the monitoring strategies against the fake Docker daemon.
+
+For each fleet size a FakeDockerDaemon is seeded with that many managed
+containers, and each strategy is timed through the real docker SDK over the
+daemon's unix socket:
+
+    poll        the 'poll' mode tick: container.reload() for every container
+    batch       the 'batch' mode tick: one labelled list call plus a diff
+    reconcile   the 'events' mode safety net: ContainerEventWatcher.reconcile()
+    async       the batch tick through async_docker.AsyncDockerClient (if aiohttp is installed)
+    events      end-to-end latency from a container dying to its Transition (no polling at all)
+
+Between ticks a few containers crash or come back, so every tick has real
+transitions to diff. Reported per strategy: mean and p95 tick latency, daemon
+requests per tick, and the CPU time the monitor's thread spent per tick (the
+fake daemon runs in its own threads and isn't counted). When both poll and
+batch run, the batch tick's speedup over the poll tick follows.
+
+Usage:
+    python bench_daemon.py [--sizes 10 100 1000] [--ticks 10] [--latency-ms 0.5] [--failure-rate 0]
+                           [--strategies poll batch ...]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import Callable, List, Optional
+
+import docker
+
+from fake_daemon import FakeDockerDaemon
+from monitor_events import ContainerEventWatcher
+from monitor_snapshot import diff_snapshots, snapshot_containers
+
+LABEL = "docker_monitor.managed"
+
+# Fraction of the fleet that crashes or restarts between two ticks.
+CHURN = 0.01
+
+STRATEGIES = ("poll", "batch", "reconcile", "async", "events")
+
+
+class Result:
+    def __init__(self, strategy: str, size: int):
+        self.strategy = strategy
+        self.size = size
+        self.latencies: List[float] = []
+        self.cpu: List[float] = []
+        self.requests = 0
+        self.errors = 0
+
+    def row(self, ticks: int) -> str:
+        latencies = sorted(self.latencies) or [float("nan")]
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        cpu = statistics.mean(self.cpu) if self.cpu else float("nan")
+        requests = f"{self.requests / ticks:>9.1f}" if ticks else f"{'stream':>9}"
+        return (f"{self.size:>10} | {self.strategy:<10} | {statistics.mean(latencies) * 1000:>9.2f} ms | "
+                f"{p95 * 1000:>9.2f} ms | {requests} | {cpu * 1000:>9.2f} ms | {self.errors:>6}")
+
+
+def churn(daemon: FakeDockerDaemon):
+    """Crashes a few running containers and restarts a few stopped ones."""
+    containers = list(daemon.containers.values())
+    for container in random.sample(containers, max(1, int(len(containers) * CHURN))):
+        if container.status == "running":
+            daemon.crash(container.id, exit_code=random.choice([0, 1, 137]))
+        else:
+            daemon.revive(container.id)
+
+
+def measure(result: Result, daemon: FakeDockerDaemon, tick: Callable[[], None], ticks: int):
+    daemon.reset_counters()
+    for _ in range(ticks):
+        churn(daemon)
+        start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            tick()
+        except (docker.errors.APIError, OSError):
+            result.errors += 1
+        result.latencies.append(time.perf_counter() - start)
+        result.cpu.append(time.thread_time() - cpu_start)
+    result.requests = daemon.request_count
+
+
+def bench_poll(daemon, client, size, ticks) -> Result:
+    result = Result("poll", size)
+    containers = client.containers.list(all=True, sparse=True, filters={"label": LABEL})
+
+    def tick():
+        for container in containers:
+            try:
+                container.reload()
+            except docker.errors.APIError:
+                result.errors += 1
+
+    measure(result, daemon, tick, ticks)
+    return result
+
+
+def bench_batch(daemon, client, size, ticks) -> Result:
+    result = Result("batch", size)
+    previous = snapshot_containers(client, LABEL)
+
+    def tick():
+        nonlocal previous
+        current = snapshot_containers(client, LABEL)
+        diff_snapshots(previous, current)
+        previous = current
+
+    measure(result, daemon, tick, ticks)
+    return result
+
+
+def bench_reconcile(daemon, client, size, ticks) -> Result:
+    result = Result("reconcile", size)
+    containers = client.containers.list(all=True, sparse=True, filters={"label": LABEL})
+    watcher = ContainerEventWatcher(client, containers, label=LABEL)
+
+    def tick():
+        watcher.reconcile()
+        while not watcher.transitions.empty():
+            watcher.transitions.get_nowait()
+
+    measure(result, daemon, tick, ticks)
+    return result
+
+
+def bench_async(daemon, size, ticks) -> Optional[Result]:
+    try:
+        from async_docker import AsyncDockerClient
+    except ImportError:
+        return None
+    result = Result("async", size)
+
+    async def run():
+        async with AsyncDockerClient(daemon.base_url) as api:
+            daemon.reset_counters()
+            for _ in range(ticks):
+                churn(daemon)
+                start, cpu_start = time.perf_counter(), time.thread_time()
+                try:
+                    await api.list_containers(all=True, filters={"label": LABEL})
+                except Exception:  # aiohttp errors as well as the client's own
+                    result.errors += 1
+                result.latencies.append(time.perf_counter() - start)
+                result.cpu.append(time.thread_time() - cpu_start)
+            result.requests = daemon.request_count
+
+    asyncio.run(run())
+    return result
+
+
+def wait_for_transition(watcher: ContainerEventWatcher, container_id: str, status: str):
+    while True:
+        transition = watcher.transitions.get(timeout=5)
+        if transition.container_id == container_id and transition.new_status == status:
+            return
+
+
+def bench_events(daemon, client, size, samples) -> Result:
+    """Time from a container dying on the daemon to the watcher reporting it."""
+    result = Result("events", size)
+    containers = client.containers.list(all=True, sparse=True, filters={"label": LABEL})
+    watcher = ContainerEventWatcher(client, containers, label=LABEL)
+    watcher.start()
+    time.sleep(0.2)  # let the event stream connect
+    daemon.reset_counters()
+    for _ in range(samples):
+        running = [c for c in daemon.containers.values() if c.status == "running"]
+        victim = random.choice(running)
+        cpu_start = time.thread_time()
+        start = time.perf_counter()
+        daemon.crash(victim.id, exit_code=1)
+        wait_for_transition(watcher, victim.id, "exited")
+        result.latencies.append(time.perf_counter() - start)
+        result.cpu.append(time.thread_time() - cpu_start)
+        daemon.revive(victim.id)
+        wait_for_transition(watcher, victim.id, "running")
+    watcher.stop()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--ticks", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latency the fake daemon adds to every request.")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests that fail with a 500.")
+    parser.add_argument("--strategies", nargs="+", choices=STRATEGIES, default=STRATEGIES,
+                        help="Strategies to run, e.g. 'poll batch' for just the tick comparison.")
+    args = parser.parse_args()
+
+    print(f"{'containers':>10} | {'strategy':<10} | {'mean tick':>12} | {'p95 tick':>12} | {'reqs/tick':>9} | "
+          f"{'CPU/tick':>12} | {'errors':>6}")
+    print("-" * 94)
+    for size in args.sizes:
+        with FakeDockerDaemon(latency=args.latency_ms / 1000, failure_rate=args.failure_rate) as daemon:
+            for i in range(size):
+                daemon.add_container(f"bench-{i}", labels={LABEL: "true"})
+            client = docker.DockerClient(base_url=daemon.base_url, version="1.41", max_pool_size=4)
+            results = {}
+            for strategy, bench in (("poll", bench_poll), ("batch", bench_batch), ("reconcile", bench_reconcile)):
+                if strategy in args.strategies:
+                    results[strategy] = bench(daemon, client, size, args.ticks)
+                    print(results[strategy].row(args.ticks), flush=True)
+            result = bench_async(daemon, size, args.ticks) if "async" in args.strategies else None
+            if result:
+                print(result.row(args.ticks), flush=True)
+            if "events" in args.strategies and not args.failure_rate:
+                print(bench_events(daemon, client, size, args.ticks).row(0), flush=True)
+            if "poll" in results and "batch" in results:
+                speedup = statistics.mean(results["poll"].latencies) / statistics.mean(results["batch"].latencies)
+                print(f"{size:>10} | batch tick is {speedup:.1f}x faster than poll", flush=True)
+            client.close()
+        print("-" * 94)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Shared, connection-reusing clients for Docker and Podman.
+
+Finding the socket, building a client (which asks the daemon for its API
+version) and pinging it costs round trips on every start, and a client built
+with the defaults has a pool of 10 connections. This module does the setup once:
+
+* The endpoint is DOCKER_HOST if set; otherwise the first socket that exists
+  among rootless Podman, rootful Podman and Docker (or the reverse, for
+  prefer="docker"). The socket found and the API version it speaks are cached
+  on disk, so the next start skips discovery and version negotiation and
+  only pings to confirm the cache. A stale cache is rediscovered.
+* Clients are created with an explicit pool size and timeout, once per
+  process, and the same instance is handed to every caller and thread, so
+  frequent operations reuse the pooled keep-alive connections.
+
+    client = get_docker_client(pool_size=32)       # docker_monitor.py
+    client = get_docker_client(prefer="podman")    # podman.py
+    libpod = get_libpod_client()                   # podman.py --fleet
+"""
+import json
+import logging
+import os
+import stat
+import threading
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+import docker
+import requests
+
+from libpod import LibpodClient, LibpodError
+
+# Timeout (seconds) of every non-streaming request.
+DEFAULT_TIMEOUT_SECONDS = 60
+
+# Connections kept open per client; docker-py's own default is 10.
+DEFAULT_POOL_SIZE = 32
+
+# Where the discovered endpoint is remembered between runs; set DOCKER_MONITOR_ENDPOINT_CACHE=""
+# to disable the cache.
+ENDPOINT_CACHE = os.environ.get(
+    "DOCKER_MONITOR_ENDPOINT_CACHE",
+    os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "docker_monitor", "endpoint.json"))
+
+
+@dataclass
+class Endpoint:
+    """A daemon socket and what it is."""
+    base_url: str
+    engine: str  # "podman" or "docker"
+    api_version: Optional[str] = None
+
+
+def runtime_dir() -> str:
+    """The user's runtime directory, where rootless sockets live."""
+    return os.environ.get("XDG_RUNTIME_DIR") or f"/run/user/{os.getuid()}"
+
+
+def socket_candidates(prefer: Optional[str] = None) -> List[Tuple[str, str]]:
+    """(engine, socket path) pairs in the order they are tried."""
+    podman = [("podman", os.path.join(runtime_dir(), "podman", "podman.sock")),
+              ("podman", "/run/podman/podman.sock")]
+    docker_sockets = [("docker", "/var/run/docker.sock"),
+                      ("docker", os.path.join(runtime_dir(), "docker.sock"))]
+    return docker_sockets + podman if prefer == "docker" else podman + docker_sockets
+
+
+def _is_socket(path: str) -> bool:
+    try:
+        return stat.S_ISSOCK(os.stat(path).st_mode)
+    except OSError:
+        return False
+
+
+def discover_endpoint(prefer: Optional[str] = None) -> Endpoint:
+    """
+    Finds the daemon to talk to, without contacting it.
+
+    Raises:
+        docker.errors.DockerException: If DOCKER_HOST isn't set and no socket exists.
+    """
+    if os.environ.get("DOCKER_HOST"):
+        base_url = os.environ["DOCKER_HOST"]
+        return Endpoint(base_url, "podman" if "podman" in base_url else "docker")
+    for engine, path in socket_candidates(prefer):
+        if _is_socket(path):
+            return Endpoint(f"unix://{path}", engine)
+    tried = ", ".join(path for _, path in socket_candidates(prefer))
+    raise docker.errors.DockerException(f"No Docker or Podman socket found (tried {tried}). Is the daemon running?")
+
+
+def _cache_key(prefer: Optional[str]) -> str:
+    """Entries are per preference and per DOCKER_HOST, so changing either never reuses a stale answer."""
+    return f"{prefer or 'any'} {os.environ.get('DOCKER_HOST', '')}".rstrip()
+
+
+def _load_cached(prefer: Optional[str]) -> Optional[Endpoint]:
+    if not ENDPOINT_CACHE:
+        return None
+    try:
+        with open(ENDPOINT_CACHE) as f:
+            cached = json.load(f).get(_cache_key(prefer))
+    except (OSError, ValueError):
+        return None
+    if not cached:
+        return None
+    endpoint = Endpoint(**cached)
+    if endpoint.base_url.startswith("unix://") and not _is_socket(endpoint.base_url[len("unix://"):]):
+        return None
+    return endpoint
+
+
+def _save_cached(prefer: Optional[str], endpoint: Endpoint):
+    if not ENDPOINT_CACHE:
+        return
+    try:
+        with open(ENDPOINT_CACHE) as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        entries = {}
+    entries[_cache_key(prefer)] = asdict(endpoint)
+    try:
+        os.makedirs(os.path.dirname(ENDPOINT_CACHE), exist_ok=True)
+        tmp = f"{ENDPOINT_CACHE}.{os.getpid()}"
+        with open(tmp, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp, ENDPOINT_CACHE)
+    except OSError as e:
+        logging.debug(f"Could not write the endpoint cache '{ENDPOINT_CACHE}': {e}")
+
+
+_lock = threading.Lock()
+_docker_clients: Dict[Optional[str], docker.DockerClient] = {}
+_libpod_client: Optional[LibpodClient] = None
+
+
+def _connect(endpoint: Endpoint, pool_size: int, timeout: float) -> docker.DockerClient:
+    """Creates the client; with a known API version no /version round trip is needed."""
+    version = endpoint.api_version or "auto"
+    if os.environ.get("DOCKER_HOST"):
+        # from_env() also picks up DOCKER_TLS_VERIFY and DOCKER_CERT_PATH.
+        client = docker.DockerClient.from_env(version=version, timeout=timeout, max_pool_size=pool_size,
+                                              use_ssh_client=endpoint.base_url.startswith("ssh://"))
+    else:
+        client = docker.DockerClient(base_url=endpoint.base_url, version=version, timeout=timeout,
+                                     max_pool_size=pool_size)
+    client.ping()
+    endpoint.api_version = client.api.api_version
+    return client
+
+
+def get_docker_client(prefer: Optional[str] = None, pool_size: int = DEFAULT_POOL_SIZE,
+                      timeout: float = DEFAULT_TIMEOUT_SECONDS) -> docker.DockerClient:
+    """
+    The process-wide docker SDK client, created (and pinged) on the first call.
+    Later calls return the same client, whatever their arguments.
+
+    Args:
+        prefer: "podman" or "docker" to try that engine's sockets first.
+        pool_size: Connections kept open to the daemon; size it for the threads that share the client.
+        timeout: Timeout in seconds for non-streaming requests.
+
+    Raises:
+        docker.errors.DockerException: If no daemon can be reached.
+    """
+    with _lock:
+        client = _docker_clients.get(prefer)
+        if client is not None:
+            return client
+        endpoint = _load_cached(prefer)
+        if endpoint is not None:
+            try:
+                client = _connect(endpoint, pool_size, timeout)
+            except (docker.errors.DockerException, requests.exceptions.RequestException) as e:
+                logging.info(f"Cached endpoint {endpoint.base_url} is not answering ({e}); looking for another one.")
+                client = None
+        if client is None:
+            endpoint = discover_endpoint(prefer)
+            try:
+                client = _connect(endpoint, pool_size, timeout)
+            except requests.exceptions.RequestException as e:
+                raise docker.errors.DockerException(f"Could not reach {endpoint.base_url}: {e}")
+            _save_cached(prefer, endpoint)
+        logging.debug(f"Using {endpoint.engine} at {endpoint.base_url} (API {endpoint.api_version}).")
+        _docker_clients[prefer] = client
+        return client
+
+
+def _libpod_candidates() -> List[str]:
+    """Base URLs that may serve the libpod API: the cached Podman endpoint, DOCKER_HOST, then the Podman sockets."""
+    urls = []
+    cached = _load_cached("podman")
+    if cached is not None and cached.engine == "podman":
+        urls.append(cached.base_url)
+    if os.environ.get("DOCKER_HOST"):
+        urls.append(os.environ["DOCKER_HOST"])
+    urls += [f"unix://{path}" for engine, path in socket_candidates("podman") if engine == "podman" and _is_socket(path)]
+    return list(dict.fromkeys(urls))
+
+
+def get_libpod_client(pool_size: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_TIMEOUT_SECONDS) -> LibpodClient:
+    """
+    The process-wide libpod API client, created on the first call. The first
+    candidate endpoint whose libpod API answers a ping is used, so a DOCKER_HOST
+    that points at Docker falls back to the rootless or rootful Podman socket.
+
+    Raises:
+        docker.errors.DockerException: If no libpod endpoint answers.
+    """
+    global _libpod_client
+    with _lock:
+        if _libpod_client is not None:
+            return _libpod_client
+        tried = []
+        for base_url in _libpod_candidates():
+            client = LibpodClient(base_url, pool_size=pool_size, timeout=timeout)
+            try:
+                if client.ping():
+                    _libpod_client = client
+                    return client
+                reason = "unexpected ping response"
+            except (LibpodError, requests.exceptions.RequestException) as e:
+                reason = str(e)
+            client.close()
+            logging.info(f"{base_url} does not serve the libpod API ({reason}); trying the next endpoint.")
+            tried.append(f"{base_url} ({reason})")
+        raise docker.errors.DockerException(
+            f"No Podman (libpod) endpoint answered. Tried: {'; '.join(tried) or 'no Podman socket exists'}.")
@@ -3,104 +3,471 @@ import docker
 import time
 import logging
 import atexit
+import os
+import queue
+import sqlite3
 import sys
 
+from client_factory import discover_endpoint, get_docker_client
+from fleet_ops import run_concurrently
+from fleet_spec import (SPEC_HASH_LABEL, FleetConflict, check_fleet, fleet_labels, fleet_name, fleet_selector,
+                        load_specs, plan_reconcile, spec_hash)
+from image_pull import PULL_POLICIES, ImagePuller, ImagePullError, unique_images
+from readiness import NotReady, ReadinessTracker
+from log_tail import LogTailer
+from metrics_exporter import MetricsRegistry, start_metrics_server
+from monitor_events import ContainerEventWatcher, Transition, container_name
+from monitor_snapshot import diff_snapshots, snapshot_containers
+from multi_host import HostMonitor, connect_hosts, parse_endpoints, place_specs
+from state_journal import JournalEntry, StateJournal
+from supervisor import Supervisor
+
 # Configure logging
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Multi-host mode: a comma-separated list of (optionally named) endpoints, e.g.
+# "local=unix:///var/run/docker.sock,edge=tcp://10.0.0.5:2375,ssh://ops@10.0.0.6".
+# The specs are spread across the hosts and each host is monitored separately (see multi_host.py).
+ENDPOINTS = os.environ.get("DOCKER_MONITOR_ENDPOINTS")
+
+# Timeout (seconds) for calls to each host, so a hung host can't stall its operations forever.
+HOST_TIMEOUT_SECONDS = 10
+
 # Docker client initialization
-# This will try to connect to the Docker daemon using environment variables or default socket
-try:
-    client = docker.from_env()
-    client.ping() # Test connection to Docker daemon
-    logging.info("Successfully connected to Docker daemon.")
-except docker.errors.DockerException as e:
-    logging.error(f"Could not connect to Docker daemon: {e}")
-    logging.error("Please ensure Docker is running and accessible.")
-    sys.exit(1)
+# The shared client from client_factory.py: DOCKER_HOST, or else the first Docker or Podman
+# socket found (cached between runs along with its API version). Every thread uses this one
+# client, so its connection pool is sized for the launch/cleanup workers.
+if ENDPOINTS:
+    hosts = connect_hosts(parse_endpoints(ENDPOINTS), timeout=HOST_TIMEOUT_SECONDS,
+                          pool_size=int(os.environ.get("DOCKER_MONITOR_CONCURRENCY", "16")))
+    if not any(host.up for host in hosts):
+        logging.error("Could not connect to any of the Docker hosts.")
+        sys.exit(1)
+    # The first reachable host stands in wherever a single client is needed.
+    client = next(host.client for host in hosts if host.up)
+else:
+    hosts = []
+    try:
+        client = get_docker_client(prefer="docker", pool_size=2 * int(os.environ.get("DOCKER_MONITOR_CONCURRENCY", "16")))
+        logging.info("Successfully connected to Docker daemon.")
+    except docker.errors.DockerException as e:
+        logging.error(f"Could not connect to Docker daemon: {e}")
+        logging.error("Please ensure Docker is running and accessible.")
+        sys.exit(1)
 
 # List to hold references to launched containers
 launched_containers = []
 
+# Reports (with wall time) of the launch and cleanup operations run so far
+operation_reports = []
+
 # --- Configuration for your containers ---
 # Each dictionary defines a container: name, image, and the command it runs.
 # 'sleep infinity' ensures the container runs indefinitely until stopped.
-CONTAINER_SPECS = [
-    {"name": "my-app-container-1", "image": "alpine/git", "command": ["sleep", "infinity"]},
-    {"name": "my-app-container-2", "image": "alpine/git", "command": ["sleep", "infinity"]},
-    {"name": "my-app-container-3", "image": "alpine/git", "command": ["sleep", "infinity"]},
-]
+# Set DOCKER_MONITOR_SPEC_FILE to load the specs from a JSON/YAML file instead
+# (see fleet.example.yaml).
+SPEC_FILE = os.environ.get("DOCKER_MONITOR_SPEC_FILE")
+if SPEC_FILE:
+    try:
+        CONTAINER_SPECS = load_specs(SPEC_FILE)
+    except (OSError, ValueError) as e:
+        logging.error(f"Could not load container specs from '{SPEC_FILE}': {e}")
+        sys.exit(1)
+else:
+    CONTAINER_SPECS = [
+        {"name": "my-app-container-1", "image": "alpine/git", "command": ["sleep", "infinity"]},
+        {"name": "my-app-container-2", "image": "alpine/git", "command": ["sleep", "infinity"]},
+        {"name": "my-app-container-3", "image": "alpine/git", "command": ["sleep", "infinity"]},
+    ]
+
+# State journal: set DOCKER_MONITOR_JOURNAL to an SQLite file to record the container
+# IDs, spec hashes, restart counts and last seen states of the fleet (see state_journal.py).
+# A restarted monitor (even after a SIGKILL) reattaches to the running fleet, keeps the
+# restart counts, and resumes the event stream where the previous run stopped.
+JOURNAL_PATH = os.environ.get("DOCKER_MONITOR_JOURNAL")
+journal = None
+previous_journal = {}  # what the previous run left in the journal, by container name
+resume_from = None     # its event cursor
+attached_at = None     # when this run started reattaching; earlier events are replayed history
+if JOURNAL_PATH:
+    try:
+        journal = StateJournal(JOURNAL_PATH)
+        previous_journal, resume_from = journal.entries(), journal.event_cursor
+    except sqlite3.Error as e:
+        logging.error(f"Could not open the state journal '{JOURNAL_PATH}': {e}")
+        sys.exit(1)
+
+# Whether to stop and remove the fleet on exit. When the specs come from a file
+# (or a journal is kept) the fleet is left running by default, so a restart with
+# no config change makes no container changes at all.
+CLEANUP_ON_EXIT = os.environ.get("DOCKER_MONITOR_CLEANUP_ON_EXIT",
+                                 "0" if SPEC_FILE or JOURNAL_PATH else "1").lower() in ("1", "true", "yes")
+
+# The fleet this monitor manages: a hash of the spec file's path unless DOCKER_MONITOR_FLEET
+# names it. Every container it launches is labelled with it, so the whole fleet can be listed
+# (or followed on the event stream) with a single filter, and monitors of other spec files
+# on the same daemon never see (or remove) each other's containers.
+FLEET = os.environ.get("DOCKER_MONITOR_FLEET") or fleet_name(SPEC_FILE)
+FLEET_SELECTOR = fleet_selector(FLEET)
+
+# Maximum number of containers launched or cleaned up at the same time
+MAX_CONCURRENCY = int(os.environ.get("DOCKER_MONITOR_CONCURRENCY", "16"))
+
+# Seconds to wait for a container to stop before it is killed
+STOP_TIMEOUT_SECONDS = 5
+
+# Image pre-pull: 'missing' pulls the images that aren't present locally, 'always'
+# pulls every image, 'never' doesn't pull. Up to PULL_CONCURRENCY pulls run at once
+# per daemon, and each container is created as soon as its own image is ready.
+PULL_POLICY = os.environ.get("DOCKER_MONITOR_PULL_POLICY", "missing")
+PULL_CONCURRENCY = int(os.environ.get("DOCKER_MONITOR_PULL_CONCURRENCY", "4"))
+if PULL_POLICY not in PULL_POLICIES:
+    logging.error(f"Unknown DOCKER_MONITOR_PULL_POLICY '{PULL_POLICY}' (expected one of {', '.join(PULL_POLICIES)}).")
+    sys.exit(1)
+
+# One ImagePuller per Docker client (i.e. per host)
+image_pullers = {}
 
 # Monitoring interval in seconds
 MONITOR_INTERVAL_SECONDS = 5
 
+# Monitoring mode:
+#   'events' follows the Docker /events stream and reports transitions as they happen.
+#   'batch'  makes one labelled containers.list() call every MONITOR_INTERVAL_SECONDS.
+#   'poll'   reloads every container every MONITOR_INTERVAL_SECONDS.
+MONITOR_MODE = os.environ.get("DOCKER_MONITOR_MODE", "events")
+
+# In 'events' mode, how often to do a full reconcile as a safety net.
+RECONCILE_INTERVAL_SECONDS = 60
+
+# Readiness: specs can declare a 'healthcheck' (docker / tcp / http probe) and
+# 'depends_on' other containers (see readiness.py). A container is created only
+# once its dependencies are ready, and startup waits up to READY_TIMEOUT_SECONDS
+# for the whole fleet to become ready. Off for fleets that declare neither.
+READY_TIMEOUT_SECONDS = 120
+if any(spec.get("healthcheck") or spec.get("depends_on") for spec in CONTAINER_SPECS):
+    try:
+        readiness = ReadinessTracker(CONTAINER_SPECS, lambda name: client_for_container(name),
+                                     on_ready=lambda *ready: metrics.record_ready(*ready) if metrics else None)
+    except ValueError as e:
+        logging.error(f"Invalid container specs: {e}")
+        sys.exit(1)
+else:
+    readiness = None
+
+# Backend:
+#   'sync'  drives the daemon with the docker SDK, one blocking call per thread.
+#   'async' runs launch, monitoring (events mode) and cleanup on one asyncio event
+#           loop over a pooled socket (see async_fleet.py; needs 'pip install aiohttp').
+BACKEND = os.environ.get("DOCKER_MONITOR_BACKEND", "sync")
+if BACKEND == "async" and hosts:
+    logging.warning("Multi-host mode uses the sync backend; ignoring DOCKER_MONITOR_BACKEND=async.")
+    BACKEND = "sync"
+if BACKEND == "async":
+    from async_docker import AsyncDockerClient
+    from async_fleet import AsyncFleet, AsyncRuntime
+
+    async_runtime = AsyncRuntime()
+    async_fleet = AsyncFleet(AsyncDockerClient(discover_endpoint("docker").base_url, pool_size=MAX_CONCURRENCY * 2),
+                             FLEET, max_concurrency=MAX_CONCURRENCY, stop_timeout=STOP_TIMEOUT_SECONDS,
+                             pull_policy=PULL_POLICY, pull_concurrency=PULL_CONCURRENCY, readiness=readiness)
+else:
+    async_fleet = None
+
+# Port for the Prometheus /metrics endpoint; 0 disables the exporter.
+METRICS_PORT = int(os.environ.get("DOCKER_MONITOR_METRICS_PORT", "0"))
+# With the async backend, stats streams run on the event loop instead of in threads.
+# In multi-host mode only the state metrics are exported: stats streams need the container's own host.
+metrics = MetricsRegistry(None if async_fleet or hosts else client) if METRICS_PORT else None
+
+# Supervisor mode: restart failed containers according to each spec's 'restart'
+# entry (see supervisor.py), or DEFAULT_RESTART_POLICY for specs without one.
+SUPERVISE = os.environ.get("DOCKER_MONITOR_SUPERVISE", "0").lower() in ("1", "true", "yes")
+DEFAULT_RESTART_POLICY = {"policy": "on-failure", "max_attempts": 5}
+supervisor = None
+
+# Log tailing: the last LOG_TAIL_LINES lines of every monitored container are
+# kept in memory and dumped when it exits (see log_tail.py); 0 disables it.
+# LOG_ALERT_RULES apply to every container; specs can add their own under 'log_alerts'.
+LOG_TAIL_LINES = int(os.environ.get("DOCKER_MONITOR_LOG_LINES", "100"))
+LOG_ALERT_RULES = {"error": r"(?i)\b(error|exception|traceback|panic|fatal)\b"}
+log_tailer = None
+
+# The event watcher, while monitoring in 'events' mode
+event_watcher = None
+
+# In multi-host mode: the host each container was placed on, and the per-host monitor
+container_hosts = {}
+host_monitor = None
+
+def launch_container(spec, docker_client=None):
+    """
+    Launches a single container from its spec, replacing any existing container
+    with the same name. Returns the new container; raises on failure.
+    Uses 'docker_client' if given (multi-host mode), the default client otherwise.
+    """
+    docker_client = docker_client or client
+    name = spec["name"]
+    image = spec["image"]
+    command = spec["command"]
+
+    # Wait for the image first, so an existing container keeps running while it is pulled.
+    try:
+        image_puller_for(docker_client).wait(image)
+    except ImagePullError as e:
+        logging.error(f"Container '{name}' not launched: {e}")
+        raise
+
+    # First, try to remove any existing container with the same name, unless another fleet owns it
+    try:
+        existing_container = docker_client.containers.get(name)
+        if existing_container:
+            try:
+                check_fleet(existing_container, FLEET)
+            except FleetConflict as e:
+                logging.error(f"Container '{name}' not launched: {e}")
+                raise
+            logging.warning(f"Existing container '{name}' found. Stopping and removing it.")
+            existing_container.stop(timeout=STOP_TIMEOUT_SECONDS)
+            existing_container.remove()
+    except docker.errors.NotFound:
+        pass # No existing container, proceed
+
+    try:
+        container = docker_client.containers.run(
+            image,
+            command,
+            name=name,
+            detach=True,  # Run in the background
+            environment=spec.get("env"),
+            labels={**fleet_labels(FLEET), SPEC_HASH_LABEL: spec_hash(spec)},
+            remove=False  # Do not remove automatically on exit (we'll handle cleanup)
+        )
+    except docker.errors.ImageNotFound:
+        logging.error(f"Image '{image}' not found for container '{name}'. Please pull it first (e.g., 'docker pull {image}').")
+        raise
+    logging.info(f"Launched container '{name}' (ID: {container.id[:12]}) using image '{image}'. Status: {container.status}")
+    return container
+
+def launch_when_ready(spec, docker_client=None):
+    """
+    Launches a container once the containers it depends on are ready, then
+    starts probing it. Without readiness tracking this is just launch_container().
+    """
+    if not readiness:
+        return launch_container(spec, docker_client)
+    name = spec["name"]
+    try:
+        readiness.wait_for_dependencies(name)
+    except NotReady as e:
+        logging.error(f"Container '{name}' not launched: {e}")
+        readiness.failed(name, str(e))
+        raise
+    try:
+        container = launch_container(spec, docker_client)
+    except Exception as e:
+        # Let the containers that depend on this one stop waiting for it.
+        readiness.failed(name, str(e))
+        raise
+    readiness.started(container.id, name)
+    return container
+
+def image_puller_for(docker_client):
+    """The ImagePuller of a daemon, created on first use."""
+    return image_pullers.setdefault(docker_client, ImagePuller(docker_client, PULL_CONCURRENCY, PULL_POLICY))
+
+def start_container(container):
+    """Starts an existing, up-to-date container that is not running."""
+    logging.info(f"Starting existing container '{container.name}' (ID: {container.id[:12]}).")
+    try:
+        container.start()
+    except Exception as e:
+        if readiness:
+            readiness.failed(container.name, str(e))
+        raise
+    if readiness:
+        readiness.started(container.id, container.name)
+    return container
+
 def launch_containers():
     """
-    Launches Docker containers based on the CONTAINER_SPECS.
-    Stores references to running containers in 'launched_containers' list.
-    """
-    logging.info("Attempting to launch containers...")
-    for spec in CONTAINER_SPECS:
-        name = spec["name"]
-        image = spec["image"]
-        command = spec["command"]
-
-        # First, try to remove any existing container with the same name
-        try:
-            existing_container = client.containers.get(name)
-            if existing_container:
-                logging.warning(f"Existing container '{name}' found. Stopping and removing it.")
-                existing_container.stop()
-                existing_container.remove()
-        except docker.errors.NotFound:
-            pass # No existing container, proceed
-
-        try:
-            container = client.containers.run(
-                image,
-                command,
-                name=name,
-                detach=True,  # Run in the background
-                remove=False  # Do not remove automatically on exit (we'll handle cleanup)
-            )
-            launched_containers.append(container)
-            logging.info(f"Launched container '{name}' (ID: {container.id[:12]}) using image '{image}'. Status: {container.status}")
-        except docker.errors.ImageNotFound:
-            logging.error(f"Image '{image}' not found for container '{name}'. Please pull it first (e.g., 'docker pull {image}').")
-            # If an image is not found, we can't launch this container, but try others.
-        except docker.errors.APIError as e:
-            logging.error(f"Failed to launch container '{name}': {e}")
-            # If there's an API error, it might be a general Docker issue or specific to this container.
+    Brings the managed containers in line with CONTAINER_SPECS, up to
+    MAX_CONCURRENCY operations at a time.
+
+    Each container carries a hash of its spec, so only containers whose spec
+    changed (or that don't exist yet) are recreated; up-to-date containers are
+    reused as they are. Managed containers that are no longer in any spec are removed.
+    Stores references to the containers in 'launched_containers' list.
+    """
+    logging.info(f"Reconciling {len(CONTAINER_SPECS)} container specs (concurrency {MAX_CONCURRENCY})...")
+    if async_fleet:
+        containers, reports = async_runtime.run(async_fleet.launch(CONTAINER_SPECS))
+        for report in reports:
+            operation_reports.append(report)
+            report.log_summary()
+        launched_containers.extend(containers)
+        return
+    if hosts:
+        launch_containers_across_hosts()
+        return
+    launched_containers.extend(reconcile_containers(client, CONTAINER_SPECS))
+
+def reconcile_containers(docker_client, specs, host=None):
+    """
+    Reconciles the managed containers on one daemon with 'specs' and returns
+    the resulting containers in spec order.
+    """
+    where = f" on host '{host}'" if host else ""
+    try:
+        managed = docker_client.containers.list(all=True, sparse=True, filters={"label": FLEET_SELECTOR})
+    except docker.errors.APIError as e:
+        logging.error(f"Could not list existing containers{where}: {e}")
+        managed = []
+    existing = {}
+    for container in managed:
+        # Sparse list results have 'Names' but not the 'Name' that container.name reads.
+        container.attrs.setdefault("Name", "/" + container_name(container))
+        existing[container.name] = container
+    plan = plan_reconcile(specs, existing, FLEET)
+    logging.info(f"Reconcile plan{where}: {plan.summary()}.")
+    # Start pulling every image now; each launch below only waits for its own.
+    image_puller_for(docker_client).start(unique_images(plan.create))
+    if readiness:
+        for spec, container in plan.keep:
+            readiness.started(container.id, spec["name"])
+
+    containers = {spec["name"]: container for spec, container in plan.keep}
+    for operation, items, func in (("start", [container for _, container in plan.start], start_container),
+                                   ("launch", plan.create, lambda spec: launch_when_ready(spec, docker_client)),
+                                   ("remove", plan.remove, cleanup_container)):
+        if not items:
+            continue
+        results, report = run_concurrently(operation, items, func, key=_operation_key, max_workers=MAX_CONCURRENCY)
+        if operation != "remove":
+            containers.update(results)
+        operation_reports.append(report)
+        report.log_summary()
+
+    # Keep the monitoring order stable regardless of which operation finished first.
+    return [containers[spec["name"]] for spec in specs if spec["name"] in containers]
+
+def launch_containers_across_hosts():
+    """
+    Spreads CONTAINER_SPECS across the reachable hosts and reconciles every
+    host in parallel. A host that can't be listed is left out of the placement.
+    """
+    up = [host for host in hosts if host.up]
+    listings, report = run_concurrently("list", up, lambda host: snapshot_containers(host.client, FLEET_SELECTOR),
+                                        key=lambda host: host.name, max_workers=len(up))
+    if report.failed:
+        report.log_summary()
+    up = [host for host in up if host.name in listings]
+    if not up:
+        logging.error("None of the Docker hosts could be listed. Nothing launched.")
+        return
+    existing = {name: {entry.name for entry in snapshot.values()} for name, snapshot in listings.items()}
+    placement = place_specs(CONTAINER_SPECS, up, existing)
+    logging.info("Placement: " + ", ".join(f"{name}: {len(specs)}" for name, specs in placement.items()) + ".")
+
+    by_name = {host.name: host for host in up}
+    results, report = run_concurrently("reconcile", up,
+                                       lambda host: reconcile_containers(host.client, placement[host.name], host.name),
+                                       key=lambda host: host.name, max_workers=len(up))
+    operation_reports.append(report)
+    report.log_summary()
+    containers = {}
+    for host_name, host_containers in results.items():
+        for container in host_containers:
+            containers[container.name] = container
+            container_hosts[container.name] = by_name[host_name]
+    launched_containers.extend(containers[spec["name"]] for spec in CONTAINER_SPECS if spec["name"] in containers)
+
+def client_for_container(name):
+    """The client of the host a container was placed on (the default client outside multi-host mode)."""
+    host = container_hosts.get(name)
+    return host.client if host else client
+
+def _operation_key(item):
+    """Names a spec or container in operation reports."""
+    return item["name"] if isinstance(item, dict) else item.name
+
+def journal_entry(container, spec):
+    """The journal entry for a launched or reattached container."""
+    host = container_hosts.get(container.name)
+    return JournalEntry(container.name, container.id, spec_hash(spec), host.name if host else None, container.status)
+
+def journal_fleet():
+    """Records the launched fleet in the journal and logs how much of it was reattached."""
+    specs_by_name = {spec["name"]: spec for spec in CONTAINER_SPECS}
+    journal.record_fleet(journal_entry(container, specs_by_name[container.name]) for container in launched_containers)
+    if previous_journal:
+        reattached = sum(1 for container in launched_containers if container.name in previous_journal
+                         and previous_journal[container.name].container_id == container.id)
+        logging.info(f"Journal: reattached {reattached} of {len(launched_containers)} containers from the previous run, "
+                     f"{len(launched_containers) - reattached} created or replaced.")
 
 def monitor_containers():
     """
-    Continuously monitors the status of launched containers.
-    Logs warnings if a container is not running.
+    Continuously monitors the status of launched containers using MONITOR_MODE.
     """
-    logging.info(f"Starting container monitoring (checking every {MONITOR_INTERVAL_SECONDS} seconds)...")
     if not launched_containers:
         logging.warning("No containers were launched to monitor.")
         return
 
+    if async_fleet:
+        watch_container_events_async()
+    elif hosts:
+        monitor_hosts()
+    elif MONITOR_MODE == "events":
+        watch_container_events()
+    elif MONITOR_MODE == "batch":
+        batch_monitor_containers()
+    else:
+        poll_containers()
+
+def poll_containers():
+    """
+    Polls the status of every launched container every MONITOR_INTERVAL_SECONDS.
+    Logs warnings if a container is not running.
+    """
+    logging.info(f"Starting container monitoring (checking every {MONITOR_INTERVAL_SECONDS} seconds)...")
+
     try:
         while True:
             all_running = True
-            for container in launched_containers:
+            # Iterate over a copy: containers may be removed from (or replaced in) the list meanwhile.
+            for container in list(launched_containers):
                 try:
                     # Reload the container's status from the Docker daemon
                     container.reload()
                     status = container.status
-                    if status == 'running':
-                        logging.info(f"Container '{container.name}' (ID: {container.id[:12]}) is RUNNING.")
+                    health = (container.attrs.get("State", {}).get("Health") or {}).get("Status")
+                    if metrics:
+                        metrics.set_state(container.id, container.name, status, health)
+                    if status == 'running' and health == 'unhealthy':
+                        logging.error(f"Container '{container.name}' (ID: {container.id[:12]}) is RUNNING but UNHEALTHY. INVESTIGATE!")
+                        all_running = False
+                    elif status == 'running':
+                        # Debug only: at one line per container per tick this floods the log.
+                        logging.debug(f"Container '{container.name}' (ID: {container.id[:12]}) is RUNNING.")
                     else:
                         logging.error(f"Container '{container.name}' (ID: {container.id[:12]}) is in status: {status}. INVESTIGATE!")
                         all_running = False
+                    if log_tailer and status == 'running':
+                        log_tailer.follow(container.id, container.name)
+                    if supervisor:
+                        exit_code = container.attrs.get("State", {}).get("ExitCode")
+                        supervisor.observe(Transition(container.id, container.name, None, status, exit_code=exit_code, source="poll"))
                 except docker.errors.NotFound:
                     logging.error(f"Container '{container.name}' (ID: {container.id[:12]}) NO LONGER EXISTS. It might have stopped and been removed unexpectedly.")
                     # Remove from list so we don't keep trying to monitor a non-existent container
                     launched_containers.remove(container)
                     all_running = False
+                    if metrics:
+                        metrics.forget(container.id)
+                    if supervisor:
+                        supervisor.observe(Transition(container.id, container.name, None, "removed", source="poll"))
                 except docker.errors.APIError as e:
                     logging.error(f"API error while monitoring container '{container.name}': {e}")
                     all_running = False
@@ -114,39 +481,274 @@ def monitor_containers():
     finally:
         logging.info("Exiting monitoring loop.")
 
+def batch_monitor_containers():
+    """
+    Monitors launched containers with one labelled containers.list() call per
+    tick, logging only the containers whose status changed since the last tick.
+    """
+    logging.info(f"Starting batched container monitoring (checking every {MONITOR_INTERVAL_SECONDS} seconds)...")
+    previous = {}
+    try:
+        while True:
+            try:
+                current = snapshot_containers(client, FLEET_SELECTOR)
+            except docker.errors.APIError as e:
+                logging.error(f"API error while listing containers: {e}")
+            else:
+                for transition in diff_snapshots(previous, current):
+                    handle_transition(transition)
+                not_running = [entry.name for entry in current.values() if entry.status != 'running']
+                if not_running:
+                    logging.warning(f"{len(not_running)} of {len(current)} containers are not in 'running' state. Check logs for details.")
+                previous = current
+            time.sleep(MONITOR_INTERVAL_SECONDS)
+    except KeyboardInterrupt:
+        logging.info("Monitoring interrupted by user (Ctrl+C).")
+    finally:
+        logging.info("Exiting monitoring loop.")
+
+def monitor_hosts():
+    """
+    Monitors every host from its own thread (one labelled list call per host per
+    tick) and logs the aggregated fleet status whenever it changes.
+    """
+    global host_monitor
+    logging.info(f"Starting multi-host container monitoring of {len(hosts)} hosts (checking every {MONITOR_INTERVAL_SECONDS} seconds)...")
+    host_monitor = HostMonitor(hosts, FLEET_SELECTOR, MONITOR_INTERVAL_SECONDS, handle_host_transition,
+                               timeout=HOST_TIMEOUT_SECONDS,
+                               pool_size=int(os.environ.get("DOCKER_MONITOR_CONCURRENCY", "16")))
+    host_monitor.start()
+    last_summary = None
+    try:
+        while True:
+            time.sleep(MONITOR_INTERVAL_SECONDS)
+            summary = host_monitor.summary()
+            if summary != last_summary:
+                logging.info(f"Fleet status: {summary}")
+                last_summary = summary
+    except KeyboardInterrupt:
+        logging.info("Monitoring interrupted by user (Ctrl+C).")
+    finally:
+        host_monitor.stop()
+        logging.info("Exiting monitoring loop.")
+
+def log_transition(transition):
+    """Logs a single container state transition reported by the event watcher."""
+    on_host = f" on host '{transition.host}'" if transition.host else ""
+    label = f"Container '{transition.name}' (ID: {transition.container_id[:12]}){on_host}"
+    if transition.source == "replay":
+        exit_code = f" (exit code {transition.exit_code})" if transition.exit_code is not None else ""
+        logging.warning(f"{label} went from {transition.old_status} to {transition.new_status}{exit_code} "
+                        f"while the monitor was down.")
+    elif transition.new_status == "running" and transition.health != "unhealthy" and not transition.oom_killed:
+        health = f" ({transition.health})" if transition.health else ""
+        logging.info(f"{label} is RUNNING{health}.")
+    elif transition.new_status == "removed":
+        logging.error(f"{label} NO LONGER EXISTS. It might have stopped and been removed unexpectedly.")
+    else:
+        details = []
+        if transition.exit_code is not None:
+            details.append(f"exit code {transition.exit_code}")
+        if transition.oom_killed:
+            details.append("OOM killed")
+        if transition.health:
+            details.append(f"health: {transition.health}")
+        suffix = f" ({', '.join(details)})" if details else ""
+        logging.error(f"{label} is in status: {transition.new_status}{suffix}. INVESTIGATE!")
+
+def handle_transition(transition):
+    """
+    Logs a container state transition and feeds it to the journal, metrics
+    exporter, log tailer and supervisor. Transitions replayed from before this
+    run are only logged and journaled: the fleet was reconciled since.
+    """
+    log_transition(transition)
+    if journal:
+        journal.record_transition(transition)
+    if transition.source == "replay":
+        return
+    if metrics:
+        metrics.record_transition(transition)
+    if log_tailer:
+        log_tailer.observe(transition)
+    if supervisor:
+        supervisor.observe(transition)
+
+def handle_host_transition(transition):
+    """
+    Handles a transition reported by a host's poller. A host that was down at
+    startup may come back with containers whose specs were placed on another
+    host meanwhile; those are logged but not handled a second time.
+    """
+    host = container_hosts.get(transition.name)
+    if host and host.name != transition.host:
+        logging.warning(f"Container '{transition.name}' (ID: {transition.container_id[:12]}) on host "
+                        f"'{transition.host}' is a leftover: the fleet runs it on host '{host.name}'.")
+        return
+    handle_transition(transition)
+
+def replace_container(old_id, container):
+    """Swaps a container recreated by the supervisor into the monitored set."""
+    for i, launched in enumerate(launched_containers):
+        if launched.id == old_id:
+            launched_containers[i] = container
+            break
+    else:
+        launched_containers.append(container)
+    if event_watcher:
+        event_watcher.track(container)
+    if async_fleet and async_fleet.watcher:
+        async_fleet.watcher.track(container)
+    if metrics:
+        # The old container is gone: stop exporting its series.
+        metrics.forget(old_id)
+        metrics.set_state(container.id, container.name, container.status)
+    if journal:
+        spec = next(spec for spec in CONTAINER_SPECS if spec["name"] == container.name)
+        journal.record_container(journal_entry(container, spec))
+
+def watch_container_events():
+    """
+    Monitors launched containers by following the Docker event stream.
+    Transitions are logged as soon as they happen; a full reconcile runs every
+    RECONCILE_INTERVAL_SECONDS in case the stream missed something.
+    """
+    global event_watcher
+    logging.info(f"Starting event-driven container monitoring (reconciling every {RECONCILE_INTERVAL_SECONDS} seconds)...")
+    watcher = event_watcher = ContainerEventWatcher(client, launched_containers, label=FLEET_SELECTOR)
+    if resume_from:
+        logging.info(f"Resuming the event stream from {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(resume_from))}.")
+    watcher.start(since=resume_from, replay_until=attached_at)
+    try:
+        next_reconcile = time.monotonic()
+        while True:
+            timeout = max(0, next_reconcile - time.monotonic())
+            try:
+                transition = watcher.transitions.get(timeout=timeout)
+            except queue.Empty:
+                try:
+                    reconciled_at = time.time()
+                    watcher.reconcile()
+                    if journal:
+                        # The watcher's state is current as of the reconcile: a later run needn't replay further back.
+                        journal.advance_cursor(reconciled_at)
+                except docker.errors.APIError as e:
+                    logging.error(f"API error while reconciling container state: {e}")
+                next_reconcile = time.monotonic() + RECONCILE_INTERVAL_SECONDS
+                continue
+            handle_transition(transition)
+            if transition.new_status == "removed":
+                watcher.forget(transition.container_id)
+    except KeyboardInterrupt:
+        logging.info("Monitoring interrupted by user (Ctrl+C).")
+    finally:
+        watcher.stop()
+        event_watcher = None
+        logging.info("Exiting monitoring loop.")
+
+def watch_container_events_async():
+    """Event-driven monitoring on the async backend's event loop."""
+    logging.info(f"Starting async event-driven container monitoring (reconciling every {RECONCILE_INTERVAL_SECONDS} seconds)...")
+    try:
+        async_runtime.run(async_fleet.monitor(launched_containers, handle_transition, RECONCILE_INTERVAL_SECONDS, metrics,
+                                              since=resume_from, replay_until=attached_at,
+                                              on_reconcile=journal.advance_cursor if journal else None))
+    except KeyboardInterrupt:
+        logging.info("Monitoring interrupted by user (Ctrl+C).")
+    finally:
+        logging.info("Exiting monitoring loop.")
+
+def relaunch_container(spec):
+    """Recreates a container for the supervisor on whichever backend is in use."""
+    if async_fleet:
+        return async_runtime.run(async_fleet.launch_one(spec))
+    return launch_when_ready(spec, client_for_container(spec["name"]))
+
+def cleanup_container(container):
+    """Stops and removes a single container. A container that is already gone is not an error."""
+    try:
+        logging.info(f"Stopping container '{container.name}' (ID: {container.id[:12]})...")
+        container.stop(timeout=STOP_TIMEOUT_SECONDS)
+        logging.info(f"Removing container '{container.name}' (ID: {container.id[:12]})...")
+        container.remove()
+        logging.info(f"Container '{container.name}' removed.")
+    except docker.errors.NotFound:
+        logging.warning(f"Container '{container.name}' (ID: {container.id[:12]}) was already removed or never existed. Skipping cleanup.")
 
 def cleanup_containers():
     """
-    Stops and removes all containers that were launched by this script.
+    Stops and removes all containers that were launched by this script, up to
+    MAX_CONCURRENCY at a time.
     Registered with atexit to ensure cleanup on script exit.
     """
     if launched_containers:
-        logging.info("Starting cleanup of launched containers...")
-        for container in launched_containers:
-            try:
-                logging.info(f"Stopping container '{container.name}' (ID: {container.id[:12]})...")
-                container.stop(timeout=5) # Give it 5 seconds to stop
-                logging.info(f"Removing container '{container.name}' (ID: {container.id[:12]})...")
-                container.remove()
-                logging.info(f"Container '{container.name}' removed.")
-            except docker.errors.NotFound:
-                logging.warning(f"Container '{container.name}' (ID: {container.id[:12]}) was already removed or never existed. Skipping cleanup.")
-            except docker.errors.APIError as e:
-                logging.error(f"Error during cleanup of container '{container.name}': {e}")
-        logging.info("All launched containers have been cleaned up.")
+        logging.info(f"Starting cleanup of {len(launched_containers)} launched containers (concurrency {MAX_CONCURRENCY})...")
+        if async_fleet:
+            report = async_runtime.run(async_fleet.cleanup(launched_containers))
+        else:
+            _, report = run_concurrently("cleanup", launched_containers, cleanup_container,
+                                         key=_operation_key, max_workers=MAX_CONCURRENCY)
+        operation_reports.append(report)
+        report.log_summary()
+        if journal:
+            for name in report.succeeded:
+                journal.forget(name)
+        if not report.failed:
+            logging.info("All launched containers have been cleaned up.")
     else:
         logging.info("No containers to clean up.")
 
+def close_async_client():
+    """Releases the async client's session and connection pool. Registered with atexit."""
+    async_runtime.run(async_fleet.api.close())
+
+# atexit runs handlers in reverse order, so the async client is closed after the cleanup used it
+if async_fleet:
+    atexit.register(close_async_client)
+
 # Register the cleanup function to be called automatically on script exit
-atexit.register(cleanup_containers)
+if CLEANUP_ON_EXIT:
+    atexit.register(cleanup_containers)
 
 if __name__ == "__main__":
     logging.info("Starting Docker container management script.")
+    attached_at = time.time()
     launch_containers()
+    if journal:
+        journal_fleet()
+    if readiness and launched_containers:
+        # 'Launched' isn't 'ready': wait for the probes before declaring the fleet up.
+        ready_report = readiness.wait_all([container.name for container in launched_containers], READY_TIMEOUT_SECONDS)
+        operation_reports.append(ready_report)
+        ready_report.log_summary()
+    if metrics:
+        start_metrics_server(metrics, METRICS_PORT)
+        for container in launched_containers:
+            metrics.set_state(container.id, container.name, container.status)
+    if LOG_TAIL_LINES:
+        specs_by_name = {spec["name"]: spec for spec in CONTAINER_SPECS}
+        log_tailer = LogTailer(client_for_container, LOG_TAIL_LINES, LOG_ALERT_RULES,
+                               rules_for=lambda name: specs_by_name.get(name, {}).get("log_alerts") or {})
+        for container in launched_containers:
+            log_tailer.follow(container.id, container.name)
+    if SUPERVISE:
+        supervisor = Supervisor(client, CONTAINER_SPECS, relaunch_container, on_replaced=replace_container,
+                                default_policy=DEFAULT_RESTART_POLICY, client_for=client_for_container,
+                                on_attempt=journal.record_restarts if journal else None)
+        if previous_journal:
+            supervisor.restore_attempts({name: entry.restarts for name, entry in previous_journal.items() if entry.restarts},
+                                        running=[c.name for c in launched_containers if c.status == "running"])
+        supervisor.start()
     if launched_containers:
         monitor_containers()
     else:
         logging.error("No containers were successfully launched. Monitoring aborted.")
+    if supervisor:
+        # Stop restarting containers before the atexit cleanup tears them down.
+        supervisor.stop()
+    if log_tailer:
+        # Don't dump the log of every container the cleanup stops.
+        log_tailer.stop()
     logging.info("Script finished.")
 
 
@@ -0,0 +1,670 @@
+#!/usr/bin/env python3
+"""
+In-process fake of the Docker Engine REST API, served over a unix socket.
+
+It implements the endpoints docker_monitor uses: ping/version/info, container
+list/inspect/create/start/stop/wait/delete, logs, stats, events and image
+inspect/pull. Both the docker SDK and async_docker.AsyncDockerClient talk to
+it exactly as they would to a real daemon. Containers are simulated in
+memory, so a fleet of thousands costs nothing. Every request is counted by
+route. Latency and failures can be injected to see how the monitor copes with
+a slow or flaky daemon.
+
+    with FakeDockerDaemon(latency=0.001) as daemon:
+        daemon.add_container("web", labels={"docker_monitor.managed": "true"})
+        client = docker.DockerClient(base_url=daemon.base_url)
+        ...
+        daemon.crash("web", exit_code=137)
+        print(daemon.requests)
+
+Run it standalone to point docker_monitor.py at a simulated fleet:
+
+    python fake_daemon.py --socket /tmp/fake-docker.sock --chaos-seconds 10
+    DOCKER_HOST=unix:///tmp/fake-docker.sock python docker_monitor.py
+"""
+import argparse
+import json
+import os
+import queue
+import random
+import re
+import socketserver
+import struct
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, unquote, urlparse
+
+API_VERSION = "1.41"
+
+# Events kept for 'since' replays.
+EVENT_HISTORY = 10_000
+
+# Log lines kept per container.
+LOG_HISTORY = 1_000
+
+
+def _rfc3339(timestamp_ns: int) -> str:
+    seconds, nanos = divmod(timestamp_ns, 1_000_000_000)
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds)) + f".{nanos:09d}Z"
+
+
+def _image_reference(image: str) -> str:
+    """Normalizes an image name, so 'alpine' and 'alpine:latest' are the same image."""
+    if "@" in image or ":" in image.rsplit("/", 1)[-1]:
+        return image
+    return f"{image}:latest"
+
+
+def _matches_labels(labels: Dict[str, str], wanted: List[str]) -> bool:
+    for label in wanted:
+        key, has_value, value = label.partition("=")
+        if key not in labels or (has_value and labels[key] != value):
+            return False
+    return True
+
+
+class FakeContainer:
+    """A simulated container."""
+
+    def __init__(self, container_id: str, name: str, image: str, command, labels: Dict[str, str],
+                 healthcheck: Optional[dict] = None):
+        self.id = container_id
+        self.name = name
+        self.image = image
+        self.command = command
+        self.labels = labels
+        self.healthcheck = healthcheck
+        self.status = "created"
+        self.health: Optional[str] = None
+        self.exit_code = 0
+        self.oom_killed = False
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.ip_address = f"172.17.{int(container_id[:4], 16) % 250}.{int(container_id[4:6], 16) % 250 + 2}"
+        self.logs = deque(maxlen=LOG_HISTORY)  # (timestamp ns, stream 1/2, bytes)
+        self.cpu_ns = 0
+        self.network_bytes = 0
+
+    def summary(self) -> dict:
+        """The /containers/json representation."""
+        if self.status == "running":
+            health = {"healthy": " (healthy)", "unhealthy": " (unhealthy)", "starting": " (health: starting)"}
+            status = f"Up {int(time.time() - self.started)} seconds{health.get(self.health, '')}"
+        elif self.status in ("exited", "dead"):
+            status = f"Exited ({self.exit_code}) {int(time.time() - (self.finished or self.created))} seconds ago"
+        else:
+            status = self.status.capitalize()
+        return {"Id": self.id, "Names": ["/" + self.name], "Image": self.image, "Command": " ".join(self.command or []),
+                "Created": int(self.created), "State": self.status, "Status": status, "Labels": self.labels}
+
+    def inspect(self) -> dict:
+        """The /containers/{id}/json representation."""
+        state = {"Status": self.status, "Running": self.status == "running", "Paused": self.status == "paused",
+                 "OOMKilled": self.oom_killed, "Dead": self.status == "dead", "ExitCode": self.exit_code,
+                 "StartedAt": _rfc3339(int((self.started or 0) * 1e9)),
+                 "FinishedAt": _rfc3339(int((self.finished or 0) * 1e9))}
+        if self.health is not None:
+            state["Health"] = {"Status": self.health, "FailingStreak": 0, "Log": []}
+        return {"Id": self.id, "Name": "/" + self.name, "Image": self.image, "Created": _rfc3339(int(self.created * 1e9)),
+                "State": state, "Config": {"Image": self.image, "Cmd": self.command, "Labels": self.labels,
+                                           "Tty": False, "Healthcheck": self.healthcheck},
+                "HostConfig": {}, "NetworkSettings": {"IPAddress": self.ip_address, "Networks": {
+                    "bridge": {"IPAddress": self.ip_address}}}}
+
+    def stats_sample(self, previous: Optional[dict]) -> dict:
+        """A synthetic /containers/{id}/stats sample: ~25% of one CPU, slowly growing memory and traffic."""
+        self.cpu_ns += random.randint(200_000_000, 300_000_000)
+        self.network_bytes += random.randint(1_000, 50_000)
+        system_ns = int(time.time() * 4e9)
+        return {"read": _rfc3339(time.time_ns()),
+                "cpu_stats": {"cpu_usage": {"total_usage": self.cpu_ns}, "system_cpu_usage": system_ns, "online_cpus": 4},
+                "precpu_stats": (previous or {}).get("cpu_stats", {}),
+                "memory_stats": {"usage": 50_000_000 + self.cpu_ns // 1000, "limit": 2_000_000_000,
+                                 "stats": {"inactive_file": 1_000_000}},
+                "networks": {"eth0": {"rx_bytes": self.network_bytes, "tx_bytes": self.network_bytes // 2}}}
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class FakeDockerDaemon:
+    """
+    A simulated Docker daemon listening on a unix socket.
+
+    Args:
+        socket_path: Where to listen; a temporary path by default.
+        latency: Seconds added to every request.
+        failure_rate: Fraction of requests (other than ping/version) answered with a 500.
+        stats_interval: Seconds between samples on a stats stream.
+        health_delay: Seconds a container with a healthcheck stays 'starting' before turning healthy.
+        images: Images that exist locally. If given, any other image must be pulled before it can be used.
+    """
+
+    def __init__(self, socket_path: Optional[str] = None, latency: float = 0.0, failure_rate: float = 0.0,
+                 stats_interval: float = 1.0, health_delay: float = 0.5, images: Optional[List[str]] = None):
+        self.socket_path = socket_path or os.path.join(tempfile.mkdtemp(prefix="fake-docker-"), "docker.sock")
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.stats_interval = stats_interval
+        self.health_delay = health_delay
+        self.images = {_image_reference(image) for image in images or []}
+        self.containers: Dict[str, FakeContainer] = {}
+        self.requests: Counter = Counter()  # route -> requests served
+        self._events = deque(maxlen=EVENT_HISTORY)
+        self._subscribers: List[queue.Queue] = []
+        self._lock = threading.RLock()
+        self._changed = threading.Condition(self._lock)
+        self._server: Optional[_UnixHTTPServer] = None
+        self._next_id = 1
+
+    @property
+    def base_url(self) -> str:
+        return f"unix://{self.socket_path}"
+
+    def start(self) -> "FakeDockerDaemon":
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = _UnixHTTPServer(self.socket_path, _make_handler(self))
+        threading.Thread(target=self._server.serve_forever, name="fake-docker", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        with self._lock:
+            for subscriber in self._subscribers:
+                subscriber.put(None)
+            self._changed.notify_all()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def __enter__(self) -> "FakeDockerDaemon":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def request_count(self) -> int:
+        return sum(self.requests.values())
+
+    def reset_counters(self):
+        with self._lock:
+            self.requests.clear()
+
+    # --- Simulation ---
+
+    def add_container(self, name: str, image: str = "fake/image:latest", labels: Optional[Dict[str, str]] = None,
+                      command=None, status: str = "running", health: Optional[str] = None) -> str:
+        """Adds a container directly (no events), e.g. to seed a large fleet. Returns its ID."""
+        with self._lock:
+            container = self._create(name, image, command or ["sleep", "infinity"], labels or {}, None)
+            container.status = status
+            container.health = health
+            if status == "running":
+                container.started = time.time()
+            elif status in ("exited", "dead"):
+                container.started = container.finished = time.time()
+        return container.id
+
+    def crash(self, container: str, exit_code: int = 1, oom_killed: bool = False):
+        """Makes a running container die with the given exit code."""
+        with self._lock:
+            c = self._find(container)
+            if oom_killed:
+                c.oom_killed = True
+                self._emit(c, "oom")
+            self._finish(c, exit_code)
+
+    def revive(self, container: str):
+        """Starts a stopped container again, as a restart policy would."""
+        with self._lock:
+            self._start(self._find(container))
+
+    def set_health(self, container: str, health: str):
+        with self._lock:
+            c = self._find(container)
+            c.health = health
+            self._emit(c, f"health_status: {health}")
+
+    def log(self, container: str, line: str, stderr: bool = False):
+        """Appends a line to a container's log."""
+        with self._lock:
+            c = self._find(container)
+            c.logs.append((time.time_ns(), 2 if stderr else 1, line.encode() + b"\n"))
+            self._changed.notify_all()
+
+    # --- Internals (called with the lock held) ---
+
+    def _create(self, name: str, image: str, command, labels: Dict[str, str], healthcheck) -> FakeContainer:
+        if any(c.name == name for c in self.containers.values()):
+            raise _APIError(409, f'Conflict. The container name "/{name}" is already in use.')
+        container_id = f"{self._next_id:08x}{random.getrandbits(224):056x}"
+        self._next_id += 1
+        container = self.containers[container_id] = FakeContainer(container_id, name, image, command, labels, healthcheck)
+        return container
+
+    def _find(self, ref: str) -> FakeContainer:
+        container = self.containers.get(ref)
+        if container is None:
+            container = next((c for c in self.containers.values() if c.name == ref.lstrip("/")
+                              or (len(ref) >= 12 and c.id.startswith(ref))), None)
+        if container is None:
+            raise _APIError(404, f"No such container: {ref}")
+        return container
+
+    def _start(self, c: FakeContainer):
+        if c.status == "running":
+            return
+        c.status, c.started, c.exit_code, c.oom_killed = "running", time.time(), 0, False
+        self._emit(c, "start")
+        if c.healthcheck:
+            c.health = "starting"
+            threading.Timer(self.health_delay, self._become_healthy, args=(c, c.started)).start()
+
+    def _become_healthy(self, c: FakeContainer, started: float):
+        with self._lock:
+            if c.status == "running" and c.started == started and c.health == "starting":
+                c.health = "healthy"
+                self._emit(c, "health_status: healthy")
+
+    def _finish(self, c: FakeContainer, exit_code: int):
+        if c.status != "running":
+            return
+        c.status, c.exit_code, c.finished = "exited", exit_code, time.time()
+        self._emit(c, "die", exitCode=str(exit_code))
+        self._changed.notify_all()
+
+    def _emit(self, c: FakeContainer, action: str, **attributes):
+        now = time.time_ns()
+        event = {"Type": "container", "Action": action, "status": action, "id": c.id, "from": c.image,
+                 "Actor": {"ID": c.id, "Attributes": {"name": c.name, "image": c.image, **c.labels, **attributes}},
+                 "scope": "local", "time": now // 1_000_000_000, "timeNano": now}
+        self._events.append(event)
+        for subscriber in self._subscribers:
+            subscriber.put(event)
+
+
+class _APIError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# Routes: (method, path regex, handler method name, route name used in the request counters)
+_ROUTES = [
+    ("GET", r"/_ping", "ping"),
+    ("HEAD", r"/_ping", "ping"),
+    ("GET", r"/version", "version"),
+    ("GET", r"/info", "info"),
+    ("GET", r"/containers/json", "list_containers"),
+    ("POST", r"/containers/create", "create_container"),
+    ("GET", r"/containers/(?P<id>[^/]+)/json", "inspect_container"),
+    ("POST", r"/containers/(?P<id>[^/]+)/start", "start_container"),
+    ("POST", r"/containers/(?P<id>[^/]+)/stop", "stop_container"),
+    ("POST", r"/containers/(?P<id>[^/]+)/kill", "kill_container"),
+    ("POST", r"/containers/(?P<id>[^/]+)/restart", "restart_container"),
+    ("POST", r"/containers/(?P<id>[^/]+)/wait", "wait_container"),
+    ("DELETE", r"/containers/(?P<id>[^/]+)", "remove_container"),
+    ("GET", r"/containers/(?P<id>[^/]+)/logs", "logs"),
+    ("GET", r"/containers/(?P<id>[^/]+)/stats", "stats"),
+    ("GET", r"/events", "events"),
+    ("GET", r"/images/json", "list_images"),
+    ("POST", r"/images/create", "pull_image"),
+    ("GET", r"/images/(?P<name>.+)/json", "inspect_image"),
+]
+_COMPILED_ROUTES = [(method, re.compile(pattern + "$"), name) for method, pattern, name in _ROUTES]
+_VERSION_PREFIX = re.compile(r"^/v[0-9.]+(?=/)")
+
+
+def _make_handler(daemon: FakeDockerDaemon):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass  # client_address is empty on a unix socket, and the monitor has its own logging
+
+        def do_GET(self):
+            self._dispatch()
+
+        do_POST = do_DELETE = do_HEAD = do_GET
+
+        def _dispatch(self):
+            url = urlparse(self.path)
+            path = _VERSION_PREFIX.sub("", unquote(url.path))
+            self.query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            length = int(self.headers.get("Content-Length") or 0)
+            self.body = json.loads(self.rfile.read(length) or b"null") if length else None
+            for method, pattern, name in _COMPILED_ROUTES:
+                match = pattern.match(path)
+                if match and method == self.command:
+                    break
+            else:
+                self._send_json(404, {"message": f"page not found: {self.command} {path}"})
+                return
+            with daemon._lock:
+                daemon.requests[name] += 1
+            if daemon.latency:
+                time.sleep(daemon.latency)
+            if name not in ("ping", "version") and daemon.failure_rate and random.random() < daemon.failure_rate:
+                self._send_json(500, {"message": "injected failure"})
+                return
+            try:
+                getattr(self, name)(**match.groupdict())
+            except _APIError as e:
+                if e.status == 304:
+                    self._send_empty(304)  # a 304 has no body
+                else:
+                    self._send_json(e.status, {"message": e.message})
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True
+
+        # --- Responses ---
+
+        def _send_json(self, status: int, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_empty(self, status: int = 204):
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def _start_stream(self, content_type: str = "application/json"):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+        def _write_chunk(self, data: bytes):
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def _end_stream(self):
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+        def _flag(self, key: str, default: bool = False) -> bool:
+            value = self.query.get(key)
+            return default if value is None else value.lower() in ("1", "true")
+
+        def _filters(self) -> Dict[str, List[str]]:
+            filters = json.loads(self.query.get("filters") or "{}")
+            # Old clients send {"label": {"key": true}} instead of lists.
+            return {key: list(value) if isinstance(value, (list, dict)) else [value] for key, value in filters.items()}
+
+        # --- System ---
+
+        def ping(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Content-Length", "2")
+            self.send_header("Api-Version", API_VERSION)
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(b"OK")
+
+        def version(self):
+            self._send_json(200, {"Version": "fake", "ApiVersion": API_VERSION, "MinAPIVersion": "1.12",
+                                  "Os": "linux", "Arch": "amd64"})
+
+        def info(self):
+            with daemon._lock:
+                containers = list(daemon.containers.values())
+            running = sum(1 for c in containers if c.status == "running")
+            self._send_json(200, {"ID": "fake", "Name": "fake-docker", "ServerVersion": "fake", "NCPU": os.cpu_count(),
+                                  "MemTotal": 16 * 2 ** 30, "Containers": len(containers),
+                                  "ContainersRunning": running, "ContainersStopped": len(containers) - running,
+                                  "Images": len(daemon.images)})
+
+        # --- Containers ---
+
+        def list_containers(self):
+            filters = self._filters()
+            show_all = self._flag("all")
+            with daemon._lock:
+                listed = [c.summary() for c in daemon.containers.values()
+                          if (show_all or c.status == "running")
+                          and _matches_labels(c.labels, filters.get("label", []))
+                          and all(name in c.name for name in filters.get("name", []))
+                          and all(c.id.startswith(ref) for ref in filters.get("id", []))
+                          and (not filters.get("status") or c.status in filters["status"])]
+            self._send_json(200, listed)
+
+        def create_container(self):
+            body = self.body or {}
+            image = body.get("Image", "")
+            with daemon._lock:
+                if daemon.images and _image_reference(image) not in daemon.images:
+                    raise _APIError(404, f"No such image: {image}")
+                name = self.query.get("name") or f"fake_{daemon._next_id}"
+                container = daemon._create(name, image, body.get("Cmd"), body.get("Labels") or {},
+                                           body.get("Healthcheck"))
+                daemon._emit(container, "create")
+            self._send_json(201, {"Id": container.id, "Warnings": []})
+
+        def inspect_container(self, id):
+            with daemon._lock:
+                attrs = daemon._find(id).inspect()
+            self._send_json(200, attrs)
+
+        def start_container(self, id):
+            with daemon._lock:
+                container = daemon._find(id)
+                if container.status == "running":
+                    raise _APIError(304, "container already started")
+                daemon._start(container)
+            self._send_empty()
+
+        def stop_container(self, id):
+            with daemon._lock:
+                container = daemon._find(id)
+                if container.status != "running":
+                    raise _APIError(304, "container already stopped")
+                daemon._emit(container, "kill", signal="15")
+                daemon._finish(container, 0)
+                daemon._emit(container, "stop")
+            self._send_empty()
+
+        def kill_container(self, id):
+            with daemon._lock:
+                container = daemon._find(id)
+                if container.status != "running":
+                    raise _APIError(409, f"Container {id} is not running")
+                daemon._emit(container, "kill", signal="9")
+                daemon._finish(container, 137)
+            self._send_empty()
+
+        def restart_container(self, id):
+            with daemon._lock:
+                container = daemon._find(id)
+                daemon._finish(container, 0)
+                daemon._start(container)
+                daemon._emit(container, "restart")
+            self._send_empty()
+
+        def wait_container(self, id):
+            with daemon._lock:
+                container = daemon._find(id)
+                while container.status == "running" and daemon._server is not None:
+                    daemon._changed.wait(1)
+                exit_code = container.exit_code
+            self._send_json(200, {"StatusCode": exit_code, "Error": None})
+
+        def remove_container(self, id):
+            with daemon._lock:
+                container = daemon._find(id)
+                if container.status == "running":
+                    if not self._flag("force"):
+                        raise _APIError(409, f"You cannot remove a running container {container.id}. Stop the container before attempting removal or force remove")
+                    daemon._finish(container, 137)
+                del daemon.containers[container.id]
+                daemon._emit(container, "destroy")
+                daemon._changed.notify_all()
+            self._send_empty()
+
+        def logs(self, id):
+            follow = self._flag("follow")
+            timestamps = self._flag("timestamps")
+            streams = {1} if self._flag("stdout") else set()
+            if self._flag("stderr"):
+                streams.add(2)
+            since_ns = int(float(self.query.get("since") or 0) * 1e9)
+            tail = self.query.get("tail", "all")
+            with daemon._lock:
+                container = daemon._find(id)
+                lines = [entry for entry in container.logs if entry[1] in streams and entry[0] >= since_ns]
+            if tail != "all":
+                lines = lines[-int(tail):] if int(tail) else []
+            self._start_stream("application/vnd.docker.raw-stream")
+            last = lines[-1][0] if lines else since_ns - 1
+            while True:
+                for timestamp, stream, data in lines:
+                    payload = (_rfc3339(timestamp).encode() + b" " + data) if timestamps else data
+                    self._write_chunk(struct.pack(">BxxxL", stream, len(payload)) + payload)
+                    last = timestamp
+                if not follow:
+                    break
+                with daemon._lock:
+                    if container.status != "running" or daemon._server is None:
+                        break
+                    daemon._changed.wait(1)
+                    lines = [entry for entry in container.logs if entry[1] in streams and entry[0] > last]
+            self._end_stream()
+
+        def stats(self, id):
+            stream = self._flag("stream", True)
+            with daemon._lock:
+                container = daemon._find(id)
+            self._start_stream()
+            previous = None
+            while True:
+                with daemon._lock:
+                    running = container.status == "running"
+                    sample = container.stats_sample(previous) if running else {"read": _rfc3339(time.time_ns())}
+                self._write_chunk(json.dumps(sample).encode() + b"\n")
+                previous = sample
+                if not stream or not running or daemon._server is None:
+                    break
+                time.sleep(daemon.stats_interval)
+            self._end_stream()
+
+        def events(self):
+            filters = self._filters()
+            since = self.query.get("since")
+            subscriber: queue.Queue = queue.Queue()
+
+            def wanted(event):
+                return ((not filters.get("type") or event["Type"] in filters["type"])
+                        and (not filters.get("event") or event["Action"].split(":")[0] in filters["event"])
+                        and (not filters.get("container") or event["id"] in filters["container"]
+                             or event["Actor"]["Attributes"]["name"] in filters["container"])
+                        and _matches_labels(event["Actor"]["Attributes"], filters.get("label", [])))
+
+            with daemon._lock:
+                backlog = [e for e in daemon._events if since is not None and e["timeNano"] >= float(since) * 1e9]
+                daemon._subscribers.append(subscriber)
+            try:
+                self._start_stream()
+                for event in backlog:
+                    if wanted(event):
+                        self._write_chunk(json.dumps(event).encode() + b"\n")
+                while True:
+                    event = subscriber.get()
+                    if event is None:
+                        break
+                    if wanted(event):
+                        self._write_chunk(json.dumps(event).encode() + b"\n")
+                self._end_stream()
+            finally:
+                with daemon._lock:
+                    daemon._subscribers.remove(subscriber)
+                self.close_connection = True
+
+        # --- Images ---
+
+        def list_images(self):
+            with daemon._lock:
+                images = sorted(daemon.images)
+            self._send_json(200, [{"Id": f"sha256:{abs(hash(image)):064x}"[:71], "RepoTags": [image]} for image in images])
+
+        def inspect_image(self, name):
+            name = _image_reference(name)
+            with daemon._lock:
+                present = name in daemon.images
+            if not present:
+                raise _APIError(404, f"No such image: {name}")
+            self._send_json(200, {"Id": f"sha256:{abs(hash(name)):064x}"[:71], "RepoTags": [name]})
+
+        def pull_image(self):
+            image = self.query.get("fromImage", "")
+            tag = self.query.get("tag") or "latest"
+            reference = f"{image}@{tag}" if tag.startswith("sha256:") else f"{image}:{tag}"
+            self._start_stream()
+            if image.startswith("missing/"):
+                self._write_chunk(json.dumps({"error": f"pull access denied for {image}, repository does not exist"}).encode() + b"\n")
+                self._end_stream()
+                return
+            self._write_chunk(json.dumps({"status": f"Pulling from {image}", "id": tag}).encode() + b"\n")
+            for layer in ("a1b2c3d4e5f6", "f6e5d4c3b2a1"):
+                for current in (0, 512_000, 1_024_000):
+                    message = {"status": "Downloading", "id": layer, "progressDetail": {"current": current, "total": 1_024_000}}
+                    self._write_chunk(json.dumps(message).encode() + b"\n")
+                self._write_chunk(json.dumps({"status": "Pull complete", "id": layer}).encode() + b"\n")
+            with daemon._lock:
+                daemon.images.add(reference)
+            self._write_chunk(json.dumps({"status": f"Status: Downloaded newer image for {reference}"}).encode() + b"\n")
+            self._end_stream()
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", default="/tmp/fake-docker.sock", help="Unix socket to listen on.")
+    parser.add_argument("--containers", type=int, default=0, help="Managed containers to seed the daemon with.")
+    parser.add_argument("--label", default="docker_monitor.managed", help="Label put on the seeded containers.")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latency added to every request.")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests that fail with a 500.")
+    parser.add_argument("--chaos-seconds", type=float, default=0.0,
+                        help="Crash a random running container every this many seconds (0 = never).")
+    args = parser.parse_args()
+
+    daemon = FakeDockerDaemon(args.socket, latency=args.latency_ms / 1000, failure_rate=args.failure_rate)
+    for i in range(args.containers):
+        daemon.add_container(f"fake-{i}", labels={args.label: "true"})
+    daemon.start()
+    print(f"Fake Docker daemon listening on {daemon.base_url} (Ctrl+C to stop).")
+    try:
+        while True:
+            time.sleep(args.chaos_seconds or 60)
+            if args.chaos_seconds:
+                with daemon._lock:
+                    running = [c.id for c in daemon.containers.values() if c.status == "running"]
+                if running:
+                    victim = random.choice(running)
+                    daemon.crash(victim, exit_code=random.choice([1, 2, 137]))
+                    print(f"Crashed {daemon.containers[victim].name}.")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.stop()
+        print(f"Served {daemon.request_count} requests: {dict(daemon.requests)}")
+
+
+if __name__ == "__main__":
+    main()
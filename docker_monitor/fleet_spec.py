@@ -0,0 +1,229 @@
+"""
+Declarative fleet specs and incremental reconcile planning.
+
+Container specs can be loaded from a JSON or YAML file. Each spec is hashed and
+the hash is stamped on the container as a label, so on restart only the
+containers whose spec actually changed need to be recreated.
+
+Every container is also stamped with the fleet it belongs to, and a fleet only
+ever lists (and so only ever removes) its own containers. Several monitors,
+each with its own spec file, or a monitor and `podman.py --fleet`, can therefore
+share a daemon without reconciling away each other's containers.
+"""
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+# Label stamped on every container docker_monitor.py or podman.py launches.
+MANAGED_LABEL = "docker_monitor.managed"
+
+# Label naming the fleet a container belongs to (see fleet_name()).
+FLEET_LABEL = "docker_monitor.fleet"
+
+# The fleet of the specs built into docker_monitor.py, used when there is no spec file.
+DEFAULT_FLEET = "default"
+
+# Label holding the hash of the spec a container was created from.
+SPEC_HASH_LABEL = "docker_monitor.spec-hash"
+
+# Spec keys that only affect how the monitor treats a container, not the
+# container itself. Changing them must not force a recreate.
+MONITOR_ONLY_KEYS = {"restart", "host", "log_alerts", "healthcheck", "depends_on"}
+
+REQUIRED_KEYS = ("name", "image", "command")
+
+# Spec keys applied to the container itself. Anything else is rejected, rather than
+# ignored: it would be part of the spec hash, so editing it would recreate the
+# container without the setting ever taking effect.
+CONTAINER_KEYS = {"name", "image", "command", "env"}
+
+
+def load_specs(path: str, extra_keys: Iterable[str] = ()) -> List[dict]:
+    """
+    Loads container specs from a JSON or YAML file.
+
+    The file holds either a list of specs or a mapping with a 'containers' list.
+    Each spec needs at least 'name', 'image' and 'command', and may only use
+    CONTAINER_KEYS, MONITOR_ONLY_KEYS and 'extra_keys' (keys a particular
+    backend applies, e.g. libpod's 'pod').
+
+    Raises:
+        ValueError: If the file can't be parsed or a spec is invalid.
+    """
+    text = Path(path).read_text()
+    if path.endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError(f"PyYAML is required to read '{path}' (pip install pyyaml).")
+        try:
+            data = yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise ValueError(f"Invalid YAML: {e}")
+    else:
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+
+    specs = data.get("containers") if isinstance(data, dict) else data
+    if not isinstance(specs, list):
+        raise ValueError(f"'{path}' must contain a list of container specs.")
+    names = set()
+    for spec in specs:
+        if not isinstance(spec, dict):
+            raise ValueError(f"Container spec {spec!r} must be a mapping.")
+        missing = [key for key in REQUIRED_KEYS if key not in spec]
+        if missing:
+            raise ValueError(f"Container spec {spec} is missing {', '.join(missing)}.")
+        for key in ("name", "image"):
+            if not isinstance(spec[key], str) or not spec[key]:
+                raise ValueError(f"'{key}' of container spec {spec} must be a non-empty string.")
+        if not isinstance(spec["command"], (str, list)):
+            raise ValueError(f"'command' of container '{spec['name']}' must be a string or a list.")
+        unknown = sorted(set(spec) - CONTAINER_KEYS - MONITOR_ONLY_KEYS - set(extra_keys))
+        if unknown:
+            raise ValueError(f"Container '{spec['name']}' has unsupported key(s) {', '.join(unknown)}.")
+        if not isinstance(spec.get("env") or {}, dict):
+            raise ValueError(f"'env' of container '{spec['name']}' must map variable names to values.")
+        if spec["name"] in names:
+            raise ValueError(f"Duplicate container name '{spec['name']}' in '{path}'.")
+        names.add(spec["name"])
+        alerts = spec.get("log_alerts", {})
+        if not isinstance(alerts, dict):
+            raise ValueError(f"'log_alerts' of container '{spec['name']}' must map rule names to patterns.")
+        for rule, pattern in alerts.items():
+            try:
+                re.compile(pattern)
+            except (re.error, TypeError) as e:
+                raise ValueError(f"Invalid pattern for log alert '{rule}' of container '{spec['name']}': {e}")
+    for spec in specs:
+        if not isinstance(spec.get("depends_on") or [], list):
+            raise ValueError(f"'depends_on' of container '{spec['name']}' must be a list of container names.")
+        unknown = [dep for dep in spec.get("depends_on") or [] if dep not in names]
+        if unknown:
+            raise ValueError(f"Container '{spec['name']}' depends on unknown container(s) {', '.join(unknown)}.")
+    dependency_order(specs)
+    return specs
+
+
+def dependency_order(specs: List[dict]) -> List[dict]:
+    """
+    Orders specs so every spec comes after the specs in its 'depends_on' list,
+    keeping the file order otherwise. Dependencies that aren't among 'specs' are ignored.
+
+    Raises:
+        ValueError: If the dependencies form a cycle.
+    """
+    by_name = {spec["name"]: spec for spec in specs}
+    ordered, state = [], {}  # state: name -> "visiting" | "done"
+
+    def visit(spec, path):
+        name = spec["name"]
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError(f"Dependency cycle between containers: {' -> '.join(path + [name])}.")
+        state[name] = "visiting"
+        for dep in spec.get("depends_on") or []:
+            if dep in by_name:
+                visit(by_name[dep], path + [name])
+        state[name] = "done"
+        ordered.append(spec)
+
+    for spec in specs:
+        visit(spec, [])
+    return ordered
+
+
+def fleet_name(spec_file: Optional[str]) -> str:
+    """
+    Names the fleet a spec file defines: a short hash of its absolute path, so
+    each spec file is its own fleet. DEFAULT_FLEET without a spec file.
+    """
+    if not spec_file:
+        return DEFAULT_FLEET
+    return hashlib.sha256(os.path.realpath(spec_file).encode()).hexdigest()[:12]
+
+
+def fleet_labels(fleet: str) -> Dict[str, str]:
+    """The labels marking a container (or pod) as part of a fleet."""
+    return {MANAGED_LABEL: "true", FLEET_LABEL: fleet}
+
+
+def fleet_selector(fleet: str) -> str:
+    """The label filter matching the containers of a fleet, and only those."""
+    return f"{FLEET_LABEL}={fleet}"
+
+
+def container_labels(container) -> Dict[str, str]:
+    """Returns the labels of both full and sparse (list) container objects."""
+    if "Labels" in container.attrs:
+        return container.attrs["Labels"] or {}
+    return container.attrs.get("Config", {}).get("Labels") or {}
+
+
+class FleetConflict(Exception):
+    """Raised when a spec's container name is taken by a container of another fleet."""
+
+
+def check_fleet(container, fleet: str):
+    """
+    Makes sure an existing container with a spec's name may be replaced by 'fleet'.
+
+    Raises:
+        FleetConflict: If the container belongs to another fleet.
+    """
+    owner = container_labels(container).get(FLEET_LABEL)
+    if owner is not None and owner != fleet:
+        raise FleetConflict(f"Container '{container.name}' belongs to fleet '{owner}', not to this fleet "
+                            f"('{fleet}'). Not replacing it.")
+
+
+def spec_hash(spec: dict) -> str:
+    """Returns a stable hash of the parts of a spec that define the container."""
+    relevant = {key: value for key, value in spec.items() if key not in MONITOR_ONLY_KEYS}
+    canonical = json.dumps(relevant, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+@dataclass
+class ReconcilePlan:
+    """What needs to happen to bring the existing containers in line with the specs."""
+    keep: List[tuple] = field(default_factory=list)      # (spec, container) already up to date and running
+    start: List[tuple] = field(default_factory=list)     # (spec, container) up to date but stopped
+    create: List[dict] = field(default_factory=list)     # specs that are new or changed
+    remove: List[object] = field(default_factory=list)   # containers of the fleet no longer in any spec
+
+    def summary(self) -> str:
+        return (f"{len(self.keep)} unchanged, {len(self.start)} to start, "
+                f"{len(self.create)} to (re)create, {len(self.remove)} to remove")
+
+
+def plan_reconcile(specs: List[dict], existing: Dict[str, object], fleet: str) -> ReconcilePlan:
+    """
+    Compares the specs with the existing managed containers.
+
+    Args:
+        specs: The desired container specs.
+        existing: The fleet's containers keyed by name (listed with fleet_selector()).
+        fleet: The fleet being reconciled. Only its containers are ever removed.
+    """
+    plan = ReconcilePlan()
+    # Dependencies first, so containers are started (and created) before the containers that need them.
+    for spec in dependency_order(specs):
+        container = existing.get(spec["name"])
+        if container is None or container_labels(container).get(SPEC_HASH_LABEL) != spec_hash(spec):
+            plan.create.append(spec)
+        elif container.status == "running":
+            plan.keep.append((spec, container))
+        else:
+            plan.start.append((spec, container))
+    wanted = {spec["name"] for spec in specs}
+    plan.remove = [container for name, container in existing.items()
+                   if name not in wanted and container_labels(container).get(FLEET_LABEL) == fleet]
+    return plan
@@ -0,0 +1,200 @@
+"""
+Parallel, deduplicated image pre-pull.
+
+Before containers are created, the unique images across all specs are pulled
+concurrently by a small pool of workers. Layer progress is streamed and logged
+at a fixed interval. Launching doesn't wait for the whole stage: each launch
+waits only for its own image, so a container starts as soon as its image is
+ready.
+
+    puller = ImagePuller(client, max_workers=4)
+    puller.start(unique_images(specs))
+    ...
+    puller.wait(spec["image"])  # in each launch
+"""
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import docker
+import requests
+
+PULL_POLICIES = ("missing", "always", "never")
+
+# Seconds between progress lines for one image.
+PROGRESS_INTERVAL_SECONDS = 2.0
+
+
+class ImagePullError(Exception):
+    """An image could not be pulled."""
+
+    def __init__(self, image: str, message: str):
+        super().__init__(f"Could not pull image '{image}': {message}")
+        self.image = image
+
+
+def split_image(image: str) -> Tuple[str, str]:
+    """Splits an image reference into repository and tag (or digest), defaulting to 'latest'."""
+    repository, tag = docker.utils.parse_repository_tag(image)
+    return repository, tag or "latest"
+
+
+def image_key(image: str) -> str:
+    """Normalizes an image reference, so 'alpine' and 'alpine:latest' are pulled once."""
+    repository, tag = split_image(image)
+    return f"{repository}@{tag}" if tag.startswith("sha256:") else f"{repository}:{tag}"
+
+
+def unique_images(specs: Iterable[dict]) -> List[str]:
+    """The distinct images used by the specs, in first-use order."""
+    images = {}
+    for spec in specs:
+        images.setdefault(image_key(spec["image"]), spec["image"])
+    return list(images.values())
+
+
+class PullProgress:
+    """
+    Aggregates the per-layer progress messages of one pull and reports them at
+    most every PROGRESS_INTERVAL_SECONDS.
+    """
+
+    def __init__(self, image: str, report: Callable[[str], None] = logging.info):
+        self.image = image
+        self.report = report
+        self.layers: Dict[str, Tuple[int, int]] = {}  # layer id -> (downloaded, total) bytes
+        self.done = set()
+        self.started = time.monotonic()
+        self._last_report = self.started
+
+    def update(self, message: dict):
+        """Applies one progress message. Raises ImagePullError for an error message."""
+        if message.get("error"):
+            raise ImagePullError(self.image, message["error"])
+        layer = message.get("id")
+        status = message.get("status", "")
+        if not layer or status.startswith("Pulling from"):
+            return
+        detail = message.get("progressDetail") or {}
+        current, total = self.layers.get(layer, (0, 0))
+        if status == "Downloading" and detail.get("total"):
+            current, total = detail.get("current", 0), detail["total"]
+        elif status in ("Download complete", "Pull complete", "Already exists"):
+            current = total
+        self.layers[layer] = (current, total)
+        if status in ("Pull complete", "Already exists"):
+            self.done.add(layer)
+
+        now = time.monotonic()
+        if now - self._last_report >= PROGRESS_INTERVAL_SECONDS:
+            self._last_report = now
+            self.report(f"Pulling '{self.image}': {self.summary()}")
+
+    def summary(self) -> str:
+        current = sum(c for c, _ in self.layers.values())
+        total = sum(t for _, t in self.layers.values())
+        size = f", {current / 1e6:.1f}/{total / 1e6:.1f} MB" if total else ""
+        return f"{len(self.done)}/{len(self.layers)} layers{size}"
+
+    def finish(self):
+        self.report(f"Pulled '{self.image}' in {time.monotonic() - self.started:.1f}s ({self.summary()}).")
+
+
+@dataclass
+class _Pull:
+    """One image's pull, shared by everyone waiting for that image."""
+    image: str
+    ready: threading.Event = field(default_factory=threading.Event)
+    error: Optional[Exception] = None
+
+
+class ImagePuller:
+    """
+    Pulls images for one daemon with a bounded pool of workers, at most once per image.
+
+    Args:
+        client: The Docker client.
+        max_workers: Pulls in flight at the same time.
+        policy: 'missing' pulls images that aren't present, 'always' pulls every
+            image, 'never' pulls nothing (launch fails on a missing image).
+        report: Where progress lines go.
+    """
+
+    def __init__(self, client: docker.DockerClient, max_workers: int = 4, policy: str = "missing",
+                 report: Callable[[str], None] = logging.info):
+        if policy not in PULL_POLICIES:
+            raise ValueError(f"Unknown pull policy '{policy}' (expected one of {', '.join(PULL_POLICIES)}).")
+        self.client = client
+        self.max_workers = max_workers
+        self.policy = policy
+        self.report = report
+        self._pulls: Dict[str, _Pull] = {}
+        self._pending: "queue.Queue[_Pull]" = queue.Queue()
+        self._workers = 0
+        self._lock = threading.Lock()
+
+    def start(self, images: Iterable[str]):
+        """Queues the images that aren't pulled or being pulled yet, and returns immediately."""
+        if self.policy == "never":
+            return
+        with self._lock:
+            for image in images:
+                key = image_key(image)
+                if key not in self._pulls:
+                    self._pulls[key] = _Pull(image)
+                    self._pending.put(self._pulls[key])
+            # Plain threads that exit when the queue runs dry, like fleet_ops.run_concurrently().
+            for _ in range(min(self.max_workers - self._workers, self._pending.qsize())):
+                self._workers += 1
+                threading.Thread(target=self._worker, name=f"pull-{self._workers}", daemon=True).start()
+
+    def wait(self, image: str, timeout: Optional[float] = None):
+        """Blocks until the image is ready, starting its pull if needed. Raises ImagePullError if it failed."""
+        if self.policy == "never":
+            return
+        pull = None
+        while pull is None:  # a failed pull is forgotten, possibly between start() and the lookup
+            self.start([image])
+            with self._lock:
+                pull = self._pulls.get(image_key(image))
+        if not pull.ready.wait(timeout):
+            raise ImagePullError(image, f"not ready after {timeout}s")
+        if pull.error is not None:
+            raise pull.error
+
+    def _worker(self):
+        while True:
+            with self._lock:
+                try:
+                    pull = self._pending.get_nowait()
+                except queue.Empty:
+                    self._workers -= 1
+                    return
+            try:
+                self._pull(pull.image)
+            except Exception as e:
+                pull.error = e if isinstance(e, ImagePullError) else ImagePullError(pull.image, str(e))
+                with self._lock:
+                    # Forget the failure, so the next launch of this image (e.g. a supervisor restart) tries again.
+                    self._pulls.pop(image_key(pull.image), None)
+            pull.ready.set()
+
+    def _pull(self, image: str):
+        if self.policy == "missing":
+            try:
+                self.client.images.get(image)
+                return
+            except docker.errors.ImageNotFound:
+                pass
+        repository, tag = split_image(image)
+        progress = PullProgress(image, self.report)
+        self.report(f"Pulling image '{image}'...")
+        try:
+            for message in self.client.api.pull(repository, tag=tag, stream=True, decode=True):
+                progress.update(message)
+        except (docker.errors.APIError, requests.exceptions.RequestException) as e:
+            raise ImagePullError(image, str(e))
+        progress.finish()
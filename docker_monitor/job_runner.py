@@ -0,0 +1,299 @@
+"""
+Batch job runner: fans out many short-lived container jobs with a concurrency cap.
+
+A job is an image, a command and an environment. Jobs come from a JSON Lines
+file, one per line:
+
+    {"id": "resize-1", "image": "docker.io/library/alpine", "command": ["sh", "-c", "echo hi"], "env": {"N": "1"}}
+
+Each result is appended to a JSON Lines results file as soon as its job
+finishes: job id, exit code, output (stdout and stderr, truncated to
+MAX_OUTPUT_BYTES), duration, and whether it ran in a warm container.
+
+By default every job runs cold: in a fresh container, removed when it is done.
+Starting a container costs far more than running a short command, so with
+warm=True jobs run with 'exec' inside warm containers instead: one idle
+container per image and worker, started once and reused by every later job
+with the same image. A warm container runs 'sleep infinity' as its entrypoint,
+so an exec'd job runs its command directly, without the image's entrypoint,
+and sees files left by earlier jobs. That is why warm reuse is opt-in, for jobs
+that don't depend on a pristine filesystem. Images without 'sleep' run cold
+even then.
+
+When run() is interrupted (e.g. Ctrl+C), every container the runner still has,
+warm or running a cold job, is removed, and jobs that hadn't started yet never
+start a container.
+"""
+import codecs
+import json
+import logging
+import queue
+import shlex
+import statistics
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Set
+
+import docker
+import requests
+
+from fleet_ops import OperationReport, run_concurrently
+from image_pull import ImagePuller, ImagePullError, image_key, unique_images
+
+# Label stamped on the containers the runner starts.
+JOB_LABEL = "docker_monitor.job"
+
+# Output kept per job in the results file.
+MAX_OUTPUT_BYTES = 64 * 1024
+
+
+@dataclass
+class Job:
+    id: str
+    image: str
+    command: List[str]
+    env: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class JobResult:
+    id: str
+    image: str
+    exit_code: Optional[int]
+    output: str
+    duration: float
+    warm: bool
+    error: Optional[str] = None
+
+
+def load_jobs(path: str) -> List[Job]:
+    """
+    Reads jobs from a JSON Lines file. Lines without an 'id' are numbered.
+
+    Raises:
+        ValueError: If a line isn't a valid job.
+    """
+    jobs = []
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                command = entry["command"]
+                jobs.append(Job(str(entry.get("id", number)), entry["image"],
+                                shlex.split(command) if isinstance(command, str) else list(command),
+                                {key: str(value) for key, value in (entry.get("env") or {}).items()}))
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValueError(f"Invalid job on line {number} of '{path}': {e}")
+    return jobs
+
+
+def _read_output(chunks) -> str:
+    """Joins streamed output chunks, keeping at most MAX_OUTPUT_BYTES."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    parts, size = [], 0
+    for chunk in chunks:
+        if size < MAX_OUTPUT_BYTES:
+            parts.append(decoder.decode(chunk[:MAX_OUTPUT_BYTES - size]))
+        size += len(chunk)
+    parts.append(decoder.decode(b"", final=True))
+    if size > MAX_OUTPUT_BYTES:
+        parts.append(f"\n[... {size - MAX_OUTPUT_BYTES} more bytes]")
+    return "".join(parts)
+
+
+def _remove_quietly(container):
+    """Force-removes a container. Only logs a failure, so it never masks the error being handled."""
+    try:
+        container.remove(force=True)
+    except docker.errors.NotFound:
+        pass  # Already removed, e.g. by remove_containers()
+    except (docker.errors.DockerException, requests.exceptions.RequestException) as e:
+        logging.warning(f"Could not remove container {container.short_id}: {e}")
+
+
+class JobRunner:
+    """
+    Runs jobs on one daemon, at most 'concurrency' at a time.
+
+    Args:
+        client: The Docker (or Podman) client; its pool should hold 'concurrency' connections.
+        results_path: The JSON Lines file results are appended to.
+        concurrency: Jobs running at the same time.
+        warm: Whether to reuse warm containers (see the module docstring).
+    """
+
+    def __init__(self, client: docker.DockerClient, results_path: str, concurrency: int = 8, warm: bool = False):
+        self.client = client
+        self.results_path = results_path
+        self.concurrency = concurrency
+        self.warm = warm
+        self.puller = ImagePuller(client, max_workers=4)
+        self._idle: Dict[str, "queue.LifoQueue"] = {}  # image key -> idle warm containers
+        self._warm_containers: List = []
+        self._cold_containers: Set = set()  # containers of cold jobs in flight
+        self._stopping = threading.Event()
+        self._cold_images: Set[str] = set()  # images a warm container can't be started from
+        self._lock = threading.Lock()
+        self._results_lock = threading.Lock()
+        self._results_file = None
+        self.results: List[JobResult] = []
+
+    def run(self, jobs: List[Job]) -> OperationReport:
+        """
+        Runs every job, appending results as they finish, and logs the throughput.
+        However it ends, the runner's containers are removed before it returns.
+        """
+        self._stopping.clear()
+        self.puller.start(unique_images({"image": job.image} for job in jobs))
+        with open(self.results_path, "a") as results_file:
+            self._results_file = results_file
+            try:
+                _, report = run_concurrently("job", jobs, self.run_job, key=lambda job: job.id,
+                                             max_workers=self.concurrency)
+            finally:
+                self.remove_containers()
+        self.log_throughput(report)
+        return report
+
+    def run_job(self, job: Job) -> JobResult:
+        if self._stopping.is_set():
+            raise RuntimeError("The job runner was stopped.")
+        start = time.perf_counter()
+        try:
+            self.puller.wait(job.image)
+            container = self._acquire_warm(job.image) if self.warm else None
+            if container is not None:
+                try:
+                    exit_code, output = self._exec(container, job)
+                except Exception:
+                    # The container may be broken (e.g. it died): don't hand it to the next job.
+                    self._discard_warm(container)
+                    raise
+                self._release_warm(job.image, container)
+            else:
+                exit_code, output = self._run_cold(job)
+            result = JobResult(job.id, job.image, exit_code, output, time.perf_counter() - start, container is not None)
+        except (ImagePullError, docker.errors.DockerException, requests.exceptions.RequestException) as e:
+            result = JobResult(job.id, job.image, None, "", time.perf_counter() - start, False, str(e))
+        if self._stopping.is_set():
+            # Its container was removed under it: whatever it returned is not the job's result.
+            raise RuntimeError("The job runner was stopped.")
+        self._record(result)
+        if result.error:
+            raise RuntimeError(result.error)
+        return result
+
+    def _record(self, result: JobResult):
+        with self._results_lock:
+            self.results.append(result)
+            self._results_file.write(json.dumps(asdict(result)) + "\n")
+            self._results_file.flush()
+
+    def _exec(self, container, job: Job):
+        # exec_run(stream=True) can't report the exit code, so go through the low-level API.
+        exec_id = self.client.api.exec_create(container.id, job.command, environment=job.env)["Id"]
+        output = _read_output(self.client.api.exec_start(exec_id, stream=True))
+        return self.client.api.exec_inspect(exec_id)["ExitCode"], output
+
+    def _run_cold(self, job: Job):
+        # create() and start() rather than run(), which leaves the container behind if it fails to start.
+        container = self.client.containers.create(job.image, job.command, environment=job.env,
+                                                  labels={JOB_LABEL: job.id})
+        self._track(container, self._cold_containers.add)
+        try:
+            container.start()
+            exit_code = container.wait()["StatusCode"]
+            return exit_code, _read_output(container.logs(stream=True, follow=False))
+        finally:
+            with self._lock:
+                self._cold_containers.discard(container)
+            _remove_quietly(container)
+
+    def _acquire_warm(self, image: str):
+        """An idle warm container for the image; started on demand. None if the image can't run one."""
+        key = image_key(image)
+        with self._lock:
+            if key in self._cold_images:
+                return None
+            idle = self._idle.setdefault(key, queue.LifoQueue())
+        try:
+            return idle.get_nowait()
+        except queue.Empty:
+            pass
+        container = self.client.containers.create(image, ["infinity"], entrypoint=["sleep"],
+                                                  labels={JOB_LABEL: "warm"})
+        # Tracked before anything else can fail, so remove_containers() always cleans it up.
+        self._track(container, self._warm_containers.append)
+        try:
+            container.start()
+            container.reload()
+            if container.status != "running":
+                raise docker.errors.APIError(f"warm container exited ({container.status})")
+        except docker.errors.APIError as e:
+            self._discard_warm(container)
+            logging.warning(f"Can't keep a warm container for '{image}' ({e}); its jobs run in fresh containers.")
+            with self._lock:
+                self._cold_images.add(key)
+            return None
+        except Exception:
+            self._discard_warm(container)
+            raise
+        return container
+
+    def _release_warm(self, image: str, container):
+        self._idle[image_key(image)].put(container)
+
+    def _discard_warm(self, container):
+        with self._lock:
+            if container in self._warm_containers:
+                self._warm_containers.remove(container)
+        _remove_quietly(container)
+
+    def _track(self, container, add):
+        """
+        Registers a just-created container for remove_containers() with 'add'.
+        Once the runner is stopping, the container is removed right away instead.
+
+        Raises:
+            RuntimeError: If the runner is stopping.
+        """
+        with self._lock:
+            if not self._stopping.is_set():
+                add(container)
+                return
+        _remove_quietly(container)
+        raise RuntimeError("The job runner was stopped.")
+
+    def remove_containers(self):
+        """
+        Stops the runner from creating containers and removes the ones it has:
+        the warm containers and those of cold jobs still running.
+        """
+        with self._lock:
+            self._stopping.set()
+            containers = self._warm_containers + list(self._cold_containers)
+            self._warm_containers.clear()
+            self._cold_containers.clear()
+            self._idle.clear()
+        if not containers:
+            return
+        _, report = run_concurrently("remove", containers, _remove_quietly,
+                                     key=lambda c: c.short_id, max_workers=self.concurrency)
+        report.log_summary()
+
+    def log_throughput(self, report: OperationReport):
+        done = [result for result in self.results if result.error is None]
+        succeeded = sum(1 for result in done if result.exit_code == 0)
+        warm = sum(1 for result in done if result.warm)
+        rate = len(self.results) / report.wall_time if report.wall_time else 0.0
+        logging.info(f"Ran {len(self.results)} jobs in {report.wall_time:.2f}s: {rate:.1f} jobs/s "
+                     f"(concurrency {self.concurrency}). {succeeded} exited 0, {len(done) - succeeded} non-zero, "
+                     f"{len(self.results) - len(done)} could not run; {warm} ran in warm containers.")
+        if len(done) >= 2:
+            durations = sorted(result.duration for result in done)
+            p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+            logging.info(f"Job duration: median {statistics.median(durations) * 1000:.0f} ms, p95 {p95 * 1000:.0f} ms. "
+                         f"Results in '{self.results_path}'.")
@@ -0,0 +1,412 @@
+"""
+Client and fleet backend for Podman's native libpod REST API.
+
+The Docker-compatible API that the docker SDK speaks knows nothing about pods,
+so every container is started and stopped on its own, and stats are one
+streaming request per container. The libpod API can do better:
+
+* Specs that name the same 'pod' are created in one pod and share its network
+  namespace (they reach each other on localhost). The pod starts and stops with
+  a single call, however many containers it holds.
+* Stats for the whole fleet come from one request to the batch stats endpoint.
+
+    {"name": "web", "image": ..., "command": ..., "pod": "frontend"}
+    {"name": "cache", "image": ..., "command": ..., "pod": "frontend"}
+
+    fleet = PodFleet(LibpodClient(podman_socket_url))
+    fleet.launch(specs)
+    for stats in fleet.stats():
+        ...
+    fleet.remove()
+
+Specs without a 'pod' run as standalone containers. A 'depends_on' between
+containers of the same pod is handed to Podman, which then starts the pod's
+containers in that order; pods themselves are launched concurrently.
+"""
+import hashlib
+import json
+import logging
+import shlex
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import requests
+from docker.transport import UnixHTTPAdapter
+
+from fleet_ops import OperationReport, run_concurrently
+from fleet_spec import DEFAULT_FLEET, SPEC_HASH_LABEL, dependency_order, fleet_labels, fleet_selector, spec_hash
+from image_pull import unique_images
+
+# Libpod API version; 4.0.0 is served by Podman 4 and later.
+LIBPOD_API_VERSION = "v4.0.0"
+
+class LibpodError(Exception):
+    """An error response from the libpod API."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.message = message
+
+
+class NotFound(LibpodError):
+    """The pod, container or image doesn't exist (HTTP 404)."""
+
+
+def _encode_filters(filters: Optional[dict]) -> Optional[str]:
+    """Encodes filters the way the API expects: a JSON map of lists."""
+    if not filters:
+        return None
+    return json.dumps({key: value if isinstance(value, list) else [value] for key, value in filters.items()})
+
+
+class LibpodClient:
+    """
+    Blocking client for the libpod API over Podman's unix socket.
+
+    Args:
+        base_url: 'unix:///path/to/podman.sock' (or 'http://host:port' for 'podman system service tcp:...').
+        pool_size: Connections kept open to the service, for use from several threads.
+        timeout: Timeout in seconds for each request.
+    """
+
+    def __init__(self, base_url: str, pool_size: int = 10, timeout: float = 60):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.session = requests.Session()
+        if base_url.startswith("unix://"):
+            # The same unix socket transport the docker SDK uses.
+            socket_url = "http+unix://" + base_url[len("unix://"):]
+            self.session.mount("http+docker://", UnixHTTPAdapter(socket_url, timeout=timeout, max_pool_size=pool_size))
+            self._root = f"http+docker://localhost/{LIBPOD_API_VERSION}/libpod"
+        else:
+            self.session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=pool_size))
+            self._root = f"{base_url.replace('tcp://', 'http://', 1).rstrip('/')}/{LIBPOD_API_VERSION}/libpod"
+
+    def close(self):
+        self.session.close()
+
+    def _request(self, method: str, path: str, params: Optional[dict] = None, body=None, stream: bool = False):
+        response = self.session.request(method, self._root + path, params=params, json=body,
+                                        timeout=None if stream else self.timeout, stream=stream)
+        # 304: the pod or container already was in the requested state.
+        if response.status_code >= 400:
+            try:
+                message = response.json().get("message") or response.text
+            except ValueError:
+                message = response.text
+            error = NotFound if response.status_code == 404 else LibpodError
+            raise error(response.status_code, message.strip())
+        return response
+
+    def _json(self, method: str, path: str, params: Optional[dict] = None, body=None):
+        response = self._request(method, path, params, body)
+        if response.status_code in (204, 304) or not response.content:
+            return None
+        return response.json()
+
+    def ping(self) -> bool:
+        return self._request("GET", "/_ping").text == "OK"
+
+    # --- Images ---
+
+    def image_exists(self, image: str) -> bool:
+        try:
+            self._request("GET", f"/images/{image}/exists")
+        except NotFound:
+            return False
+        return True
+
+    def pull(self, image: str) -> str:
+        """Pulls an image and returns its ID. Raises LibpodError if the pull fails."""
+        response = self._request("POST", "/images/pull", {"reference": image, "quiet": "true"}, stream=True)
+        image_id = None
+        for line in response.iter_lines():
+            if not line:
+                continue
+            message = json.loads(line)
+            if message.get("error"):
+                raise LibpodError(500, message["error"])
+            image_id = message.get("id") or image_id
+        return image_id
+
+    # --- Pods ---
+
+    def list_pods(self, filters: Optional[dict] = None) -> List[dict]:
+        return self._json("GET", "/pods/json", {"filters": _encode_filters(filters)})
+
+    def create_pod(self, name: str, labels: Optional[Dict[str, str]] = None) -> str:
+        return self._json("POST", "/pods/create", body={"name": name, "labels": labels or {}})["Id"]
+
+    def start_pod(self, name: str):
+        """Starts every container in the pod with one call."""
+        self._pod_action(name, "start")
+
+    def stop_pod(self, name: str, timeout: int = 10):
+        """Stops every container in the pod with one call."""
+        self._pod_action(name, "stop", {"t": timeout})
+
+    def remove_pod(self, name: str, force: bool = True):
+        """Removes the pod and (with 'force') its containers, stopping them first."""
+        self._json("DELETE", f"/pods/{name}", {"force": str(force).lower()})
+
+    def _pod_action(self, name: str, action: str, params: Optional[dict] = None):
+        report = self._json("POST", f"/pods/{name}/{action}", params)
+        # A pod action can half succeed: the per-container errors come back in 'Errs'.
+        errors = (report or {}).get("Errs") or []
+        if errors:
+            raise LibpodError(409, f"{action} of pod '{name}' failed for some containers: {'; '.join(map(str, errors))}")
+
+    # --- Containers ---
+
+    def list_containers(self, all: bool = False, filters: Optional[dict] = None) -> List[dict]:
+        return self._json("GET", "/containers/json", {"all": str(all).lower(), "filters": _encode_filters(filters)})
+
+    def create_container(self, name: str, image: str, command: Optional[List[str]] = None, pod: Optional[str] = None,
+                         labels: Optional[Dict[str, str]] = None, env: Optional[Dict[str, str]] = None,
+                         dependencies: Optional[List[str]] = None) -> str:
+        body = {"name": name, "image": image, "labels": labels or {}}
+        if command:
+            body["command"] = command
+        if pod:
+            body["pod"] = pod
+        if env:
+            body["env"] = env
+        if dependencies:
+            body["dependencies"] = dependencies
+        return self._json("POST", "/containers/create", body=body)["Id"]
+
+    def start_container(self, name: str):
+        self._json("POST", f"/containers/{name}/start")
+
+    def stop_container(self, name: str, timeout: int = 10):
+        self._json("POST", f"/containers/{name}/stop", {"timeout": timeout})
+
+    def remove_container(self, name: str, force: bool = True):
+        self._json("DELETE", f"/containers/{name}", {"force": str(force).lower()})
+
+    def stats(self, containers: Optional[List[str]] = None) -> List[dict]:
+        """
+        One stats sample for many containers in a single request (all running
+        containers if 'containers' is None). CPU and memory come precomputed:
+        'CPU' and 'MemPerc' are percentages, 'MemUsage'/'MemLimit' and
+        'NetInput'/'NetOutput' are bytes.
+        """
+        params = {"stream": "false"}
+        if containers:
+            params["containers"] = containers
+        report = self._json("GET", "/containers/stats", params) or {}
+        if report.get("Error"):
+            raise LibpodError(500, str(report["Error"]))
+        return report.get("Stats") or []
+
+
+def _command(spec: dict) -> List[str]:
+    command = spec.get("command")
+    return shlex.split(command) if isinstance(command, str) else list(command or [])
+
+
+@dataclass
+class Pod:
+    """The specs that share one pod (a standalone container is a Pod with name None)."""
+    name: Optional[str]
+    specs: List[dict] = field(default_factory=list)
+
+    def dependencies(self, spec: dict) -> List[str]:
+        """The members of this pod that 'spec' depends on, which Podman starts first."""
+        members = {member["name"] for member in self.specs}
+        return [dep for dep in spec.get("depends_on") or [] if dep in members]
+
+    @property
+    def hash(self) -> str:
+        """
+        Hash of the member specs, stamped on the pod so an unchanged pod is reused.
+        Unlike spec_hash(), it covers the in-pod dependencies, since those are baked
+        into the containers Podman creates.
+        """
+        member_hashes = sorted(f"{spec['name']}={spec_hash(spec)};after={','.join(sorted(self.dependencies(spec)))}"
+                               for spec in self.specs)
+        return hashlib.sha256("\n".join(member_hashes).encode()).hexdigest()
+
+
+def group_pods(specs: List[dict]) -> List[Pod]:
+    """
+    Groups specs by their 'pod' entry, keeping the first-use order of the pods
+    and the dependency order inside each pod. Standalone specs each get their own Pod(None).
+    """
+    pods: Dict[str, Pod] = {}
+    groups: List[Pod] = []
+    for spec in dependency_order(specs):
+        name = spec.get("pod")
+        if name is None:
+            groups.append(Pod(None, [spec]))
+        elif name not in pods:
+            pods[name] = Pod(name, [spec])
+            groups.append(pods[name])
+        else:
+            pods[name].specs.append(spec)
+    return groups
+
+
+def _pod_key(pod: Pod) -> str:
+    return pod.name or pod.specs[0]["name"]
+
+
+class PodFleet:
+    """
+    Launches, samples and removes a fleet of pods through the libpod API.
+
+    Args:
+        client: The libpod client.
+        max_concurrency: Pods (and image pulls) handled at the same time.
+        stop_timeout: Seconds a container gets to stop before it is killed.
+        fleet: The fleet the pods and containers belong to (see fleet_spec.fleet_name());
+            pods and containers of other fleets are never reused.
+    """
+
+    def __init__(self, client: LibpodClient, max_concurrency: int = 8, stop_timeout: int = 5,
+                 fleet: str = DEFAULT_FLEET):
+        self.client = client
+        self.fleet = fleet
+        self.max_concurrency = max_concurrency
+        self.stop_timeout = stop_timeout
+        self.pods: List[Pod] = []
+        self.container_ids: Dict[str, str] = {}  # container name -> ID
+
+    def launch(self, specs: List[dict]) -> List[OperationReport]:
+        """
+        Pulls the missing images, then creates and starts every pod. A pod that
+        already exists with the same specs is only started (one call, a no-op if
+        it is running); a changed pod is removed and recreated. Pods and
+        standalone containers of the fleet that are no longer in 'specs' are removed.
+        """
+        self.pods = group_pods(specs)
+        reports = []
+        images, report = run_concurrently("pull", unique_images(specs), self._ensure_image, key=lambda image: image,
+                                          max_workers=self.max_concurrency)
+        reports.append(report)
+        report.log_summary()
+
+        # What already exists, in two list calls for the whole fleet.
+        existing_pods = {pod["Name"]: pod for pod in self.client.list_pods({"label": fleet_selector(self.fleet)})}
+        existing_containers = {c["Names"][0]: c for c in self.client.list_containers(True, {"label": fleet_selector(self.fleet)})
+                               if not c.get("Pod")}
+        # Removed before anything is created, so a container that moved into or out of a pod can take its name.
+        wanted_pods = {pod.name for pod in self.pods if pod.name is not None}
+        wanted_containers = {pod.specs[0]["name"] for pod in self.pods if pod.name is None}
+        stale = [(name, True) for name in existing_pods if name not in wanted_pods]
+        stale += [(name, False) for name in existing_containers if name not in wanted_containers]
+        if stale:
+            _, report = run_concurrently("remove", stale, self._remove_stale, key=lambda item: item[0],
+                                         max_workers=self.max_concurrency)
+            reports.append(report)
+            report.log_summary()
+        pods = [pod for pod in self.pods if all(spec["image"] in images for spec in pod.specs)]
+
+        def launch(pod):
+            if pod.name is None:
+                return self._launch_standalone(pod.specs[0], existing_containers.get(pod.specs[0]["name"]))
+            return self._launch_pod(pod, existing_pods.get(pod.name))
+
+        results, report = run_concurrently("launch", pods, launch, key=_pod_key, max_workers=self.max_concurrency)
+        for ids in results.values():
+            self.container_ids.update(ids)
+        reports.append(report)
+        report.log_summary()
+        return reports
+
+    def _ensure_image(self, image: str) -> str:
+        if not self.client.image_exists(image):
+            logging.info(f"Pulling image '{image}'...")
+            self.client.pull(image)
+        return image
+
+    def _launch_standalone(self, spec: dict, existing: Optional[dict]) -> Dict[str, str]:
+        """Creates (or reuses) and starts a container outside any pod."""
+        if existing is not None and (existing.get("Labels") or {}).get(SPEC_HASH_LABEL) == spec_hash(spec):
+            container_id = existing["Id"]
+        else:
+            if existing is not None:
+                logging.warning(f"Container '{spec['name']}' changed. Removing it.")
+                self.client.remove_container(spec["name"])
+            container_id = self.client.create_container(spec["name"], spec["image"], _command(spec), env=spec.get("env"),
+                                                        labels={**fleet_labels(self.fleet), SPEC_HASH_LABEL: spec_hash(spec)})
+        self.client.start_container(container_id)
+        logging.info(f"Started container '{spec['name']}' (ID: {container_id[:12]}).")
+        return {spec["name"]: container_id}
+
+    def _launch_pod(self, pod: Pod, existing: Optional[dict]) -> Dict[str, str]:
+        """Creates (or reuses) and starts one pod; returns its container IDs by name."""
+        if existing is not None and (existing.get("Labels") or {}).get(SPEC_HASH_LABEL) == pod.hash:
+            logging.info(f"Pod '{pod.name}' is up to date; starting it.")
+            self.client.start_pod(pod.name)
+            return {c["Names"]: c["Id"] for c in existing.get("Containers") or [] if c["Id"] != existing.get("InfraId")}
+        if existing is not None:
+            logging.warning(f"Pod '{pod.name}' changed. Removing it and its containers.")
+            self.client.remove_pod(pod.name)
+        self.client.create_pod(pod.name, {**fleet_labels(self.fleet), SPEC_HASH_LABEL: pod.hash})
+        ids = {}
+        for spec in pod.specs:
+            ids[spec["name"]] = self.client.create_container(
+                spec["name"], spec["image"], _command(spec), pod=pod.name, env=spec.get("env"),
+                labels={**fleet_labels(self.fleet), SPEC_HASH_LABEL: spec_hash(spec)},
+                dependencies=pod.dependencies(spec))
+        # One call starts every container of the pod.
+        self.client.start_pod(pod.name)
+        logging.info(f"Started pod '{pod.name}' with {len(ids)} containers ({', '.join(ids)}).")
+        return ids
+
+    def stats(self) -> List[dict]:
+        """One stats sample for the whole fleet, from a single request."""
+        if not self.container_ids:
+            return []
+        return self.client.stats(list(self.container_ids.values()))
+
+    def stop(self) -> OperationReport:
+        """Stops every pod (one call each) and standalone container."""
+        _, report = run_concurrently("stop", self.pods, self._stop_pod, key=_pod_key, max_workers=self.max_concurrency)
+        return report
+
+    def remove(self) -> OperationReport:
+        """Removes every pod with its containers, and the standalone containers."""
+        _, report = run_concurrently("remove", self.pods, self._remove_pod, key=_pod_key,
+                                     max_workers=self.max_concurrency)
+        self.container_ids.clear()
+        return report
+
+    def _remove_stale(self, item: Tuple[str, bool]):
+        """Removes a pod (with its containers) or standalone container no spec asks for any more."""
+        name, is_pod = item
+        logging.info(f"{'Pod' if is_pod else 'Standalone container'} '{name}' is no longer in the specs. Removing it.")
+        try:
+            if is_pod:
+                self.client.remove_pod(name)
+            else:
+                self.client.remove_container(name)
+        except NotFound:
+            pass
+
+    def _stop_pod(self, pod: Pod):
+        if pod.name is None:
+            self.client.stop_container(pod.specs[0]["name"], self.stop_timeout)
+        else:
+            self.client.stop_pod(pod.name, self.stop_timeout)
+
+    def _remove_pod(self, pod: Pod):
+        try:
+            if pod.name is None:
+                self.client.remove_container(pod.specs[0]["name"])
+            else:
+                self.client.remove_pod(pod.name)
+        except NotFound:
+            logging.warning(f"'{_pod_key(pod)}' was already removed.")
+
+
+def format_stats(stats: List[dict]) -> Iterator[str]:
+    """Renders a stats sample as table lines."""
+    yield f"{'NAME':<30} {'CPU %':>7} {'MEM USAGE / LIMIT':>22} {'MEM %':>7} {'NET I/O':>22}"
+    for sample in sorted(stats, key=lambda s: s.get("Name", "")):
+        memory = f"{sample.get('MemUsage', 0) / 1e6:.1f}MB / {sample.get('MemLimit', 0) / 1e6:.1f}MB"
+        network = f"{sample.get('NetInput', 0) / 1e6:.1f}MB / {sample.get('NetOutput', 0) / 1e6:.1f}MB"
+        yield (f"{sample.get('Name', sample.get('ContainerID', '')[:12]):<30} {sample.get('CPU', 0):>6.2f}% "
+               f"{memory:>22} {sample.get('MemPerc', 0):>6.2f}% {network:>22}")
@@ -0,0 +1,216 @@
+"""
+Bounded log tailing and pattern alerts for monitored containers.
+
+Every followed container gets one streaming logs connection. Lines go into a
+ring buffer holding the last N lines, so memory stays flat however chatty the
+container is. Each line is matched against regex alert rules, and the buffer
+is dumped to the log when the container exits. The stream is opened with
+timestamps, and the last timestamp seen is kept as a cursor: when the stream
+drops, or the container is started again, following resumes with since=cursor
+instead of replaying the log.
+"""
+import calendar
+import logging
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional, Pattern, Tuple
+
+import docker
+import requests
+
+# Longer lines are cut, so one runaway line can't grow the buffer without bound.
+MAX_LINE_BYTES = 16 * 1024
+
+# An alert rule fires at most once per container in this many seconds; the rest are counted.
+ALERT_COOLDOWN_SECONDS = 60
+
+# Seconds to wait before reopening a log stream that failed.
+RETRY_SECONDS = 2
+
+
+def compile_rules(rules: Dict[str, str]) -> List[Tuple[str, Pattern]]:
+    """Compiles {rule name: regex} alert rules. Raises ValueError on an invalid pattern."""
+    compiled = []
+    for name, pattern in rules.items():
+        try:
+            compiled.append((name, re.compile(pattern)))
+        except re.error as e:
+            raise ValueError(f"Invalid pattern for log alert '{name}': {e}")
+    return compiled
+
+
+def parse_timestamp(value: bytes) -> Optional[int]:
+    """Parses an RFC 3339 log timestamp ('2024-05-01T12:00:00.123456789Z') into nanoseconds."""
+    try:
+        text = value.decode("ascii").rstrip("Z")
+        base, _, fraction = text.partition(".")
+        seconds = calendar.timegm(time.strptime(base, "%Y-%m-%dT%H:%M:%S"))
+        return seconds * 1_000_000_000 + int(fraction[:9].ljust(9, "0") or 0)
+    except ValueError:
+        return None
+
+
+@dataclass
+class ContainerTail:
+    """The ring buffer and stream position of one container."""
+    container_id: str
+    name: str
+    lines: Deque[str]
+    rules: List[Tuple[str, Pattern]]
+    cursor: Optional[int] = None  # nanosecond timestamp of the last line seen
+    pending: bytes = b""
+    alerted: Dict[str, float] = field(default_factory=dict)
+    suppressed: Dict[str, int] = field(default_factory=dict)
+    stream: Optional[object] = None
+    thread: Optional[threading.Thread] = None
+
+
+class LogTailer:
+    """
+    Follows the logs of monitored containers, one stream thread per running container.
+
+    Args:
+        client_for: Returns the Docker client for a container name.
+        max_lines: Lines kept per container (and dumped when it exits).
+        rules: Alert rules for every container, {rule name: regex}.
+        rules_for: Returns extra alert rules for a container name (e.g. from its spec).
+    """
+
+    def __init__(self, client_for: Callable[[str], docker.DockerClient], max_lines: int = 100,
+                 rules: Optional[Dict[str, str]] = None,
+                 rules_for: Optional[Callable[[str], Dict[str, str]]] = None):
+        self.client_for = client_for
+        self.max_lines = max_lines
+        self.rules = compile_rules(rules or {})
+        self.rules_for = rules_for
+        self.alerts: Dict[Tuple[str, str], int] = {}  # (container name, rule) -> matches
+        self.tails: Dict[str, ContainerTail] = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def follow(self, container_id: str, name: str):
+        """Starts following a container's logs unless it is already being followed."""
+        with self._lock:
+            tail = self.tails.get(container_id)
+            if tail is None:
+                extra = compile_rules(self.rules_for(name)) if self.rules_for else []
+                tail = self.tails[container_id] = ContainerTail(container_id, name, deque(maxlen=self.max_lines),
+                                                                self.rules + extra)
+            if tail.thread is not None and tail.thread.is_alive():
+                return
+            tail.thread = threading.Thread(target=self._follow, args=(tail,), name=f"logs-{container_id[:12]}",
+                                           daemon=True)
+        tail.thread.start()
+
+    def observe(self, transition):
+        """Feeds a container Transition: (re)starts following running containers, forgets removed ones."""
+        if transition.new_status == "running":
+            self.follow(transition.container_id, transition.name)
+        elif transition.new_status == "removed":
+            with self._lock:
+                tail = self.tails.get(transition.container_id)
+            # The stream thread dumps the buffer when it notices the container is gone.
+            if tail is not None and (tail.thread is None or not tail.thread.is_alive()):
+                self.forget(transition.container_id)
+
+    def forget(self, container_id: str):
+        with self._lock:
+            tail = self.tails.pop(container_id, None)
+        if tail is not None and tail.stream is not None:
+            tail.stream.close()
+
+    def stop(self):
+        """Closes every log stream."""
+        self._stopping.set()
+        with self._lock:
+            streams = [tail.stream for tail in self.tails.values() if tail.stream is not None]
+        for stream in streams:
+            stream.close()
+
+    def _follow(self, tail: ContainerTail):
+        while not self._stopping.is_set():
+            client = self.client_for(tail.name)
+            try:
+                if tail.cursor is None:
+                    # First connection: only the last max_lines lines, not the container's whole history.
+                    options = {"tail": self.max_lines}
+                else:
+                    options = {"since": tail.cursor / 1e9}
+                # An unfinished line from a dropped stream is replayed in full after the cursor.
+                tail.pending = b""
+                tail.stream = client.api.logs(tail.container_id, stream=True, follow=True, timestamps=True, **options)
+                for chunk in tail.stream:
+                    self._feed(tail, chunk)
+                tail.stream = None
+                if self._stopping.is_set():
+                    return
+                # The stream ends when the container stops (or the daemon drops it).
+                state = client.api.inspect_container(tail.container_id)["State"]
+                if not state.get("Running"):
+                    self._dump(tail, state.get("Status", "exited"), state.get("ExitCode"), state.get("OOMKilled"))
+                    return
+            except docker.errors.NotFound:
+                self._dump(tail, "removed")
+                self.forget(tail.container_id)
+                return
+            except (docker.errors.APIError, requests.exceptions.RequestException) as e:
+                if self._stopping.is_set():
+                    return
+                logging.warning(f"Log stream for container '{tail.name}' interrupted: {e}. Reconnecting...")
+            self._stopping.wait(RETRY_SECONDS)
+
+    def _feed(self, tail: ContainerTail, chunk: bytes):
+        """Splits a chunk of the log stream into lines (chunks don't follow line boundaries)."""
+        data = tail.pending + chunk
+        *lines, tail.pending = data.split(b"\n")
+        if len(tail.pending) > MAX_LINE_BYTES:
+            lines.append(tail.pending[:MAX_LINE_BYTES])
+            tail.pending = b""
+        for raw in lines:
+            self._add_line(tail, raw[:MAX_LINE_BYTES])
+
+    def _add_line(self, tail: ContainerTail, raw: bytes):
+        stamp, _, message = raw.partition(b" ")
+        timestamp = parse_timestamp(stamp)
+        if timestamp is None:
+            message = raw  # continuation of a cut line
+        elif tail.cursor is not None and timestamp <= tail.cursor:
+            return  # already seen: 'since' has one-second granularity on some daemons
+        else:
+            tail.cursor = timestamp
+        line = message.decode("utf-8", errors="replace").rstrip("\r")
+        tail.lines.append(line)
+        for rule, pattern in tail.rules:
+            if pattern.search(line):
+                self._alert(tail, rule, line)
+
+    def _alert(self, tail: ContainerTail, rule: str, line: str):
+        key = (tail.name, rule)
+        self.alerts[key] = self.alerts.get(key, 0) + 1
+        now = time.monotonic()
+        if now - tail.alerted.get(rule, float("-inf")) < ALERT_COOLDOWN_SECONDS:
+            tail.suppressed[rule] = tail.suppressed.get(rule, 0) + 1
+            return
+        suppressed = tail.suppressed.pop(rule, 0)
+        more = f" ({suppressed} more matches suppressed)" if suppressed else ""
+        tail.alerted[rule] = now
+        logging.warning(f"LOG ALERT '{rule}' in container '{tail.name}'{more}: {line}")
+
+    def _dump(self, tail: ContainerTail, status: str, exit_code: Optional[int] = None, oom_killed: bool = False):
+        details = []
+        if exit_code is not None:
+            details.append(f"exit code {exit_code}")
+        if oom_killed:
+            details.append("OOM killed")
+        suffix = f" ({', '.join(details)})" if details else ""
+        if tail.pending:
+            self._add_line(tail, tail.pending)
+            tail.pending = b""
+        if not tail.lines:
+            logging.error(f"Container '{tail.name}' is {status}{suffix}. It logged nothing.")
+            return
+        body = "\n".join(f"    {line}" for line in tail.lines)
+        logging.error(f"Container '{tail.name}' is {status}{suffix}. Last {len(tail.lines)} log lines:\n{body}")
@@ -0,0 +1,233 @@
+"""
+Prometheus/OpenMetrics exporter for docker_monitor.
+
+Serves a /metrics endpoint with container state gauges, restart counters and
+CPU/memory/network figures. Resource figures come from one long-lived
+streaming stats connection per container (the daemon pushes a sample roughly
+every second), so a scrape only renders what is already in memory and never
+calls the daemon, however many containers there are.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass, replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+import docker
+import requests
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@dataclass
+class ContainerMetrics:
+    """Everything exported for one container."""
+    name: str
+    status: str = "unknown"
+    health: Optional[str] = None
+    restarts: int = 0
+    cpu_seconds: Optional[float] = None
+    cpu_percent: Optional[float] = None
+    memory_bytes: Optional[int] = None
+    memory_limit_bytes: Optional[int] = None
+    network_rx_bytes: Optional[int] = None
+    network_tx_bytes: Optional[int] = None
+    stats_updated: Optional[float] = None
+    time_to_ready: Optional[float] = None
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _apply_stats_sample(metrics: ContainerMetrics, sample: dict):
+    """Updates a container's resource metrics from one /containers/{id}/stats sample."""
+    cpu = sample.get("cpu_stats") or {}
+    precpu = sample.get("precpu_stats") or {}
+    total = (cpu.get("cpu_usage") or {}).get("total_usage")
+    if total is not None:
+        metrics.cpu_seconds = total / 1e9
+        cpu_delta = total - (precpu.get("cpu_usage") or {}).get("total_usage", 0)
+        system_delta = cpu.get("system_cpu_usage", 0) - precpu.get("system_cpu_usage", 0)
+        online_cpus = cpu.get("online_cpus") or len((cpu.get("cpu_usage") or {}).get("percpu_usage") or []) or 1
+        if system_delta > 0 and cpu_delta >= 0:
+            metrics.cpu_percent = cpu_delta / system_delta * online_cpus * 100.0
+
+    memory = sample.get("memory_stats") or {}
+    if "usage" in memory:
+        details = memory.get("stats") or {}
+        # Same as 'docker stats': page cache doesn't count as used memory.
+        cache = details.get("inactive_file", details.get("total_inactive_file", details.get("cache", 0)))
+        metrics.memory_bytes = max(0, memory["usage"] - cache)
+        metrics.memory_limit_bytes = memory.get("limit")
+
+    networks = sample.get("networks")
+    if networks:
+        metrics.network_rx_bytes = sum(n.get("rx_bytes", 0) for n in networks.values())
+        metrics.network_tx_bytes = sum(n.get("tx_bytes", 0) for n in networks.values())
+    metrics.stats_updated = time.time()
+
+
+class MetricsRegistry:
+    """
+    In-memory metrics for the monitored fleet.
+
+    State is fed in from the monitor (transitions, polls); resource usage from
+    one streaming stats thread per running container. Pass client=None when the
+    stats streams are managed elsewhere (e.g. the async backend) and fed in
+    through record_stats(). Restarts are counted per container name, so the
+    count carries over when the supervisor recreates a container under a new ID.
+    """
+
+    def __init__(self, client: Optional[docker.DockerClient]):
+        self.client = client
+        self.containers: Dict[str, ContainerMetrics] = {}
+        self._restarts: Dict[str, int] = {}  # container name -> restarts
+        self._last_status: Dict[str, str] = {}  # container name -> last status of any container with that name
+        self._lock = threading.Lock()
+        self._streams: Dict[str, threading.Thread] = {}
+        self._stopping = threading.Event()
+
+    def set_state(self, container_id: str, name: str, status: str, health: Optional[str] = None):
+        """Records a container's current status, counting restarts and (re)starting its stats stream."""
+        self.update_state(container_id, name, status, health)
+        if status == "running" and self.client is not None:
+            self.watch_stats(container_id)
+
+    def update_state(self, container_id: str, name: str, status: str, health: Optional[str] = None):
+        """Records a container's current status and counts restarts, without touching stats streams."""
+        with self._lock:
+            metrics = self.containers.setdefault(container_id, ContainerMetrics(name))
+            if status == "running" and self._last_status.get(name) in ("exited", "dead", "restarting", "removed"):
+                self._restarts[name] = self._restarts.get(name, 0) + 1
+            self._last_status[name] = status
+            metrics.restarts = self._restarts.get(name, 0)
+            metrics.status = status
+            metrics.health = health
+        if status == "removed":
+            self.forget(container_id)
+
+    def record_ready(self, container_id: str, name: str, seconds: float):
+        """Records how long a container took from start to passing its readiness probe."""
+        with self._lock:
+            self.containers.setdefault(container_id, ContainerMetrics(name)).time_to_ready = seconds
+
+    def record_transition(self, transition):
+        """Records a Transition from the event watcher or snapshot diff."""
+        self.set_state(transition.container_id, transition.name, transition.new_status, transition.health)
+
+    def forget(self, container_id: str):
+        """Stops exporting a container and drops its stats stream (which ends at its next sample)."""
+        with self._lock:
+            self.containers.pop(container_id, None)
+            self._streams.pop(container_id, None)
+
+    def watch_stats(self, container_id: str):
+        """Starts the long-lived stats stream for a container unless one is already running."""
+        with self._lock:
+            thread = self._streams.get(container_id)
+            if thread is not None and thread.is_alive():
+                return
+            thread = threading.Thread(target=self._follow_stats, args=(container_id,),
+                                      name=f"stats-{container_id[:12]}", daemon=True)
+            self._streams[container_id] = thread
+        thread.start()
+
+    def record_stats(self, container_id: str, sample: dict) -> bool:
+        """
+        Applies one stats sample from an externally managed stream.
+        Returns False once the container is no longer running, so the caller can stop streaming.
+        """
+        with self._lock:
+            metrics = self.containers.get(container_id)
+            if metrics is None or metrics.status != "running" or self._stopping.is_set():
+                return False
+            _apply_stats_sample(metrics, sample)
+            return True
+
+    def stop(self):
+        """Asks every stats stream to finish after its next sample."""
+        self._stopping.set()
+
+    def _follow_stats(self, container_id: str):
+        try:
+            for sample in self.client.api.stats(container_id, decode=True, stream=True):
+                if not self.record_stats(container_id, sample):
+                    return
+        except docker.errors.NotFound:
+            pass
+        except (docker.errors.APIError, requests.exceptions.RequestException) as e:
+            logging.warning(f"Stats stream for container {container_id[:12]} ended: {e}")
+        finally:
+            with self._lock:
+                # Unless a newer stream for the container has replaced this one already.
+                if self._streams.get(container_id) is threading.current_thread():
+                    del self._streams[container_id]
+
+    def render(self) -> str:
+        """Renders all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            snapshot = [(container_id, replace(m)) for container_id, m in self.containers.items()]
+
+        families = [
+            ("docker_monitor_container_up", "gauge", "Whether the container is running (1) or not (0).",
+             lambda m: 1 if m.status == "running" else 0),
+            ("docker_monitor_container_healthy", "gauge", "Whether the container health check passes (1), fails (0); absent without a health check.",
+             lambda m: None if m.health is None else (1 if m.health == "healthy" else 0)),
+            ("docker_monitor_container_time_to_ready_seconds", "gauge", "Seconds from the last start until the container became ready.",
+             lambda m: m.time_to_ready),
+            ("docker_monitor_container_restarts_total", "counter", "Times the container was seen coming back to running.",
+             lambda m: m.restarts),
+            ("docker_monitor_container_cpu_usage_seconds_total", "counter", "Total CPU time consumed by the container.",
+             lambda m: m.cpu_seconds),
+            ("docker_monitor_container_cpu_percent", "gauge", "CPU usage over the last stats interval, 100 per core.",
+             lambda m: m.cpu_percent),
+            ("docker_monitor_container_memory_usage_bytes", "gauge", "Memory used by the container, excluding page cache.",
+             lambda m: m.memory_bytes),
+            ("docker_monitor_container_memory_limit_bytes", "gauge", "Memory limit of the container.",
+             lambda m: m.memory_limit_bytes),
+            ("docker_monitor_container_network_receive_bytes_total", "counter", "Bytes received on all container networks.",
+             lambda m: m.network_rx_bytes),
+            ("docker_monitor_container_network_transmit_bytes_total", "counter", "Bytes sent on all container networks.",
+             lambda m: m.network_tx_bytes),
+        ]
+        lines = []
+        for metric, kind, help_text, value_of in families:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for container_id, m in snapshot:
+                value = value_of(m)
+                if value is not None:
+                    lines.append(f'{metric}{{name="{_escape(m.name)}",id="{container_id[:12]}"}} {value}')
+
+        lines.append("# HELP docker_monitor_container_state Current container status (1 for the active status).")
+        lines.append("# TYPE docker_monitor_container_state gauge")
+        for container_id, m in snapshot:
+            lines.append(f'docker_monitor_container_state{{name="{_escape(m.name)}",id="{container_id[:12]}",state="{_escape(m.status)}"}} 1')
+        return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(registry: MetricsRegistry, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serves registry.render() on http://host:port/metrics from a background thread."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Scrapes would otherwise flood the log.
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logging.info(f"Serving Prometheus metrics on http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,243 @@
+"""
+Event-driven container watching built on the Docker /events API.
+
+Instead of calling container.reload() for every container on every tick, the
+ContainerEventWatcher follows a single /events stream and keeps an in-memory
+state table keyed by container ID. While the fleet is healthy no per-container
+requests are made at all; die/oom/health_status transitions arrive as soon as
+the daemon emits them. A periodic reconcile() does one list call to catch
+anything the stream may have missed (e.g. while reconnecting).
+"""
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional
+
+import docker
+import requests
+
+# Seconds to wait before reopening the event stream after it drops.
+EVENT_STREAM_RETRY_SECONDS = 1
+
+
+@dataclass
+class ContainerState:
+    """Last known state of a single container."""
+    name: str
+    status: str
+    health: Optional[str] = None
+    exit_code: Optional[int] = None
+    oom_killed: bool = False
+    updated: float = field(default_factory=time.time)
+
+
+@dataclass
+class Transition:
+    """A change in a container's status or health."""
+    container_id: str
+    name: str
+    old_status: Optional[str]
+    new_status: str
+    health: Optional[str] = None
+    exit_code: Optional[int] = None
+    oom_killed: bool = False
+    source: str = "event"  # "event", "replay", "reconcile", "snapshot" or "poll"
+    host: Optional[str] = None  # set in multi-host mode
+
+
+def health_from_summary(summary: str) -> Optional[str]:
+    """Extracts the health state from a /containers/json 'Status' string, e.g. 'Up 5 minutes (healthy)'."""
+    if "(healthy)" in summary:
+        return "healthy"
+    if "(unhealthy)" in summary:
+        return "unhealthy"
+    if "(health: starting)" in summary:
+        return "starting"
+    return None
+
+
+def exit_code_from_summary(summary: str) -> Optional[int]:
+    """Extracts the exit code from a /containers/json 'Status' string, e.g. 'Exited (137) 2 minutes ago'."""
+    if summary.startswith("Exited ("):
+        code = summary[len("Exited ("):].split(")", 1)[0]
+        if code.lstrip("-").isdigit():
+            return int(code)
+    return None
+
+
+def container_name(container) -> str:
+    """Returns the container name for both full and sparse (list) container objects."""
+    if container.attrs.get("Name"):
+        return container.attrs["Name"].lstrip("/")
+    names = container.attrs.get("Names") or [container.id[:12]]
+    return names[0].lstrip("/")
+
+
+class ContainerEventWatcher:
+    """
+    Follows the Docker event stream for a set of containers and keeps their state.
+
+    Transitions are pushed onto the 'transitions' queue so the caller can react
+    to them immediately. Call reconcile() periodically as a safety net.
+    """
+
+    def __init__(self, client: docker.DockerClient, containers: Iterable, label: Optional[str] = None):
+        self.client = client
+        self.label = label
+        self.state: Dict[str, ContainerState] = {}
+        self.transitions: "queue.Queue[Transition]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._stream = None
+        self._thread = None
+        self._since = None
+        # Events before this time are history replayed from a resumed stream (see start()).
+        self.replay_until: Optional[float] = None
+        for container in containers:
+            state = container.attrs.get("State")
+            if isinstance(state, dict):
+                health = (state.get("Health") or {}).get("Status")
+                self.state[container.id] = ContainerState(container_name(container), state.get("Status", "unknown"), health)
+            else:
+                self.state[container.id] = ContainerState(container_name(container), container.status)
+        # Only container events for the containers we are watching. A label filter
+        # keeps the query short however many containers there are.
+        if label:
+            self.filters = {"type": "container", "label": label}
+        else:
+            self.filters = {"type": "container", "container": list(self.state)}
+
+    def start(self, since: Optional[float] = None, replay_until: Optional[float] = None):
+        """
+        Starts following the event stream in a background thread.
+
+        With 'since', the stream resumes from that time (e.g. a journal's event
+        cursor), and the events from before 'replay_until' (default: now) are
+        reported as 'replay' transitions.
+        """
+        if since is not None:
+            self.replay_until = replay_until or time.time()
+        self._since = int(since if since is not None else time.time())
+        self._thread = threading.Thread(target=self._follow_events, name="docker-events", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the background thread and closes the event stream."""
+        self._stopping.set()
+        if self._stream is not None:
+            self._stream.close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _follow_events(self):
+        while not self._stopping.is_set():
+            try:
+                # Resume from the last event seen so nothing is lost across reconnects.
+                self._stream = self.client.events(decode=True, filters=self.filters, since=self._since)
+                for event in self._stream:
+                    self._since = event.get("time", self._since)
+                    self.handle_event(event)
+            except (docker.errors.APIError, requests.exceptions.RequestException) as e:
+                if self._stopping.is_set():
+                    break
+                logging.warning(f"Docker event stream interrupted: {e}. Reconnecting...")
+            except Exception as e:
+                if self._stopping.is_set():
+                    break
+                logging.error(f"Unexpected error in Docker event stream: {e}")
+            self._stopping.wait(EVENT_STREAM_RETRY_SECONDS)
+
+    def handle_event(self, event: dict):
+        """Applies a single /events message to the state table."""
+        if event.get("Type") != "container":
+            return
+        container_id = event.get("id") or event.get("Actor", {}).get("ID")
+        attributes = event.get("Actor", {}).get("Attributes", {})
+        # Health events look like 'health_status: healthy'.
+        action, _, detail = event.get("Action", event.get("status", "")).partition(":")
+        detail = detail.strip()
+
+        with self._lock:
+            current = self.state.get(container_id)
+            if current is None:
+                return
+            old_status, old_health = current.status, current.health
+            if action in ("start", "restart", "unpause"):
+                current.status = "running"
+                current.exit_code = None
+                current.oom_killed = False
+            elif action == "die":
+                current.status = "exited"
+                exit_code = attributes.get("exitCode")
+                current.exit_code = int(exit_code) if exit_code is not None else None
+            elif action == "oom":
+                current.oom_killed = True
+            elif action == "pause":
+                current.status = "paused"
+            elif action == "destroy":
+                current.status = "removed"
+            elif action == "health_status":
+                current.health = detail
+            else:
+                return
+            current.updated = time.time()
+            changed = (current.status, current.health) != (old_status, old_health) or action == "oom"
+            if changed:
+                self.transitions.put(self._transition(container_id, current, old_status, self.event_source(event)))
+
+    def event_source(self, event: dict) -> str:
+        """'replay' for an event from before the monitor resumed, 'event' otherwise."""
+        if self.replay_until is None:
+            return "event"
+        timestamp = event["timeNano"] / 1e9 if "timeNano" in event else event.get("time", 0)
+        return "replay" if timestamp < self.replay_until else "event"
+
+    def reconcile(self):
+        """
+        Re-reads the state of every watched container with a single list call.
+        Emits transitions for anything the event stream missed.
+        """
+        with self._lock:
+            ids = list(self.state)
+        if not ids:
+            return
+        # sparse=True keeps this to one request; the default inspects every container.
+        filters = {"label": self.label} if self.label else {"id": ids}
+        self.apply_listing(self.client.containers.list(all=True, sparse=True, filters=filters))
+
+    def apply_listing(self, listed: Iterable):
+        """
+        Brings the state table in line with a /containers/json listing.
+        Emits transitions for anything the event stream missed.
+        """
+        seen = {c.id: c for c in listed}
+        with self._lock:
+            for container_id, current in self.state.items():
+                old_status, old_health = current.status, current.health
+                container = seen.get(container_id)
+                if container is None:
+                    current.status = "removed"
+                else:
+                    current.status = container.status
+                    current.health = health_from_summary(container.attrs.get("Status", ""))
+                    current.exit_code = exit_code_from_summary(container.attrs.get("Status", ""))
+                if (current.status, current.health) != (old_status, old_health):
+                    current.updated = time.time()
+                    self.transitions.put(self._transition(container_id, current, old_status, "reconcile"))
+
+    def track(self, container):
+        """Starts tracking another container, e.g. one recreated by the supervisor."""
+        with self._lock:
+            self.state[container.id] = ContainerState(container_name(container), container.status)
+
+    def forget(self, container_id: str):
+        """Stops tracking a container (e.g. after it has been removed)."""
+        with self._lock:
+            self.state.pop(container_id, None)
+
+    @staticmethod
+    def _transition(container_id: str, state: ContainerState, old_status: Optional[str], source: str) -> Transition:
+        return Transition(container_id, state.name, old_status, state.status, state.health,
+                          state.exit_code, state.oom_killed, source)
@@ -0,0 +1,198 @@
+"""
+Multi-host fleet monitoring across several Docker/Podman endpoints.
+
+Endpoints are given as a comma-separated list, optionally named:
+
+    DOCKER_MONITOR_ENDPOINTS="local=unix:///var/run/docker.sock,edge=tcp://10.0.0.5:2375,ssh://ops@10.0.0.6"
+
+Each host gets its own DockerClient (and so its own connection pool and
+timeout). Specs are spread across the hosts by capacity, sticking to the host
+a container already runs on. Each host is polled from its own thread with one
+labelled list call per tick, so a slow or dead host only delays its own part
+of the aggregated status view.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set
+from urllib.parse import urlparse
+
+import docker
+import requests
+
+from fleet_ops import run_concurrently
+from monitor_events import Transition
+from monitor_snapshot import Snapshot, diff_snapshots, snapshot_containers
+
+# A host whose last successful poll is older than this many intervals is reported as stale.
+STALE_AFTER_INTERVALS = 3
+
+
+@dataclass
+class Host:
+    """One Docker/Podman endpoint and what we last saw on it."""
+    name: str
+    base_url: str
+    client: Optional[docker.DockerClient] = None
+    capacity: float = 1.0
+    up: bool = False
+    error: Optional[str] = None
+    snapshot: Snapshot = field(default_factory=dict)
+    snapshot_time: Optional[float] = None
+
+
+def parse_endpoints(value: str) -> List[Host]:
+    """Parses 'name=url,url,...' into Hosts. Unnamed endpoints are named after their host part."""
+    hosts = []
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        name, _, url = entry.partition("=") if "=" in entry.split("://")[0] else ("", "", entry)
+        if not name:
+            parsed = urlparse(url)
+            name = parsed.hostname or parsed.path or url
+        hosts.append(Host(name, url))
+    return hosts
+
+
+def connect_host(host: Host, timeout: int, pool_size: int) -> Host:
+    """
+    Connects to a host and reads its capacity (CPU count). Marks the host down on
+    failure; a failure that repeats the previous one is not logged again.
+    """
+    try:
+        host.client = docker.DockerClient(base_url=host.base_url, timeout=timeout, max_pool_size=pool_size,
+                                          use_ssh_client=host.base_url.startswith("ssh://"))
+        info = host.client.info()
+        host.capacity = float(info.get("NCPU") or 1)
+        host.up, host.error = True, None
+        logging.info(f"Connected to host '{host.name}' ({host.base_url}): {info.get('NCPU')} CPUs, "
+                     f"{info.get('ContainersRunning', 0)} containers running.")
+    except (docker.errors.DockerException, requests.exceptions.RequestException) as e:
+        if host.error != str(e):
+            logging.error(f"Could not connect to host '{host.name}' ({host.base_url}): {e}")
+        host.up, host.error = False, str(e)
+    return host
+
+
+def connect_hosts(hosts: List[Host], timeout: int = 10, pool_size: int = 10) -> List[Host]:
+    """Connects to all hosts in parallel, so one unreachable host doesn't hold up the rest."""
+    run_concurrently("connect", hosts, lambda host: connect_host(host, timeout, pool_size),
+                     key=lambda host: host.name, max_workers=len(hosts))
+    return hosts
+
+
+def place_specs(specs: List[dict], hosts: List[Host], existing: Dict[str, Set[str]]) -> Dict[str, List[dict]]:
+    """
+    Assigns every spec to one of the (up) hosts.
+
+    A spec stays where it is pinned ('host' key) or where its container already
+    exists, so restarts don't move containers around. Everything else goes to
+    the host with the lowest number of assigned containers per unit of capacity.
+
+    Args:
+        specs: The container specs.
+        hosts: The hosts that are up.
+        existing: Names of the managed containers already on each host.
+    """
+    by_name = {host.name: host for host in hosts}
+    placement = {host.name: [] for host in hosts}
+    unplaced = []
+    for spec in specs:
+        pinned = spec.get("host")
+        current = next((host for host, names in existing.items() if spec["name"] in names and host in by_name), None)
+        if pinned in by_name:
+            placement[pinned].append(spec)
+        elif pinned:
+            logging.error(f"Container '{spec['name']}' is pinned to host '{pinned}', which is not available.")
+        elif current:
+            placement[current].append(spec)
+        else:
+            unplaced.append(spec)
+    for spec in unplaced:
+        target = min(hosts, key=lambda host: len(placement[host.name]) / host.capacity)
+        placement[target.name].append(spec)
+    return placement
+
+
+class HostMonitor:
+    """
+    Polls every host from its own thread and keeps an aggregated view.
+
+    Args:
+        hosts: The hosts to monitor.
+        label: Label filter for the managed containers.
+        interval: Seconds between polls of each host.
+        on_transition: Called (from the host's thread) with every Transition; its 'host' field is set.
+        timeout: Client timeout when reconnecting a host that was unreachable at startup.
+        pool_size: Connection pool size of a reconnected host's client.
+    """
+
+    def __init__(self, hosts: List[Host], label: str, interval: float, on_transition: Callable[[Transition], None],
+                 timeout: int = 10, pool_size: int = 10):
+        self.hosts = hosts
+        self.label = label
+        self.interval = interval
+        self.on_transition = on_transition
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._stopping = threading.Event()
+        self._threads = []
+        self._started = time.time()
+
+    def start(self):
+        self._started = time.time()
+        self._threads = [threading.Thread(target=self._poll_host, args=(host,), name=f"host-{host.name}", daemon=True)
+                         for host in self.hosts]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stopping.set()
+
+    def _poll_host(self, host: Host):
+        while not self._stopping.is_set():
+            if host.client is None:
+                # Unreachable at startup: keep retrying the same Host, so it stays a single entry.
+                connect_host(host, self.timeout, self.pool_size)
+                if host.client is None:
+                    self._stopping.wait(self.interval)
+                    continue
+            try:
+                current = snapshot_containers(host.client, self.label)
+            except (docker.errors.DockerException, requests.exceptions.RequestException) as e:
+                if host.up:
+                    logging.error(f"Host '{host.name}' is DOWN: {e}")
+                host.up, host.error = False, str(e)
+            else:
+                if not host.up:
+                    logging.info(f"Host '{host.name}' is back UP.")
+                host.up, host.error = True, None
+                for transition in diff_snapshots(host.snapshot, current):
+                    transition.host = host.name
+                    self.on_transition(transition)
+                host.snapshot, host.snapshot_time = current, time.time()
+            self._stopping.wait(self.interval)
+
+    def status(self) -> dict:
+        """The aggregated status of all hosts, from the latest snapshot of each."""
+        view = {"hosts": {}, "containers": 0, "running": 0}
+        now = time.time()
+        for host in self.hosts:
+            running = sum(1 for entry in host.snapshot.values() if entry.status == "running")
+            # A hung host never gets to report an error, so also flag hosts that haven't answered lately.
+            stale = now - (host.snapshot_time or self._started) > STALE_AFTER_INTERVALS * self.interval
+            view["hosts"][host.name] = {"up": host.up, "stale": stale, "error": host.error,
+                                        "containers": len(host.snapshot), "running": running,
+                                        "updated": host.snapshot_time}
+            view["containers"] += len(host.snapshot)
+            view["running"] += running
+        return view
+
+    def summary(self) -> str:
+        view = self.status()
+        up = sum(1 for host in view["hosts"].values() if host["up"] and not host["stale"])
+        per_host = ", ".join(f"{name}: {h['running']}/{h['containers']}"
+                             f"{' DOWN' if not h['up'] else ' STALE' if h['stale'] else ''}"
+                             for name, h in view["hosts"].items())
+        return (f"{len(view['hosts'])} hosts ({up} up), {view['running']}/{view['containers']} containers running "
+                f"[{per_host}]")
@@ -27,22 +27,39 @@
 #    pip install docker
 #
 # ---------------------------------------------------------------------------
+#
+# USAGE:
+#
+#    python podman.py                      # the step-by-step demo below
+#    python podman.py --fleet fleet.yaml   # run a fleet of pods (see below)
+#    python podman.py --jobs jobs.jsonl    # run a batch of jobs (see job_runner.py)
+#
+# The demo uses Podman's Docker-compatible API. Fleet mode uses the native
+# libpod API instead (see libpod.py): specs that name the same 'pod' share a
+# pod that starts and stops with a single call, and the stats of the whole
+# fleet come from a single request every --interval seconds. Ctrl+C stops and
+# removes the fleet (unless --keep is given).
+#
+# Job mode runs every (image, command, env) job of a JSON Lines file, at most
+# --concurrency at a time, each in a fresh container (or, with --warm, reusing
+# warm containers for jobs with the same image), and appends each job's exit
+# code and output to --results as it finishes. It reports the throughput in jobs per second.
+#
+# ---------------------------------------------------------------------------
 
+import argparse
+import codecs
 import docker
-import os
-
-def get_podman_socket_path():
-    """Constructs the default path for the rootless Podman socket."""
-    # The socket path is typically in the user's runtime directory.
-    # The XDG_RUNTIME_DIR environment variable points to this directory.
-    xdg_runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
-    if not xdg_runtime_dir:
-        # Fallback for systems where XDG_RUNTIME_DIR might not be set.
-        # It constructs the path using the user's ID (UID).
-        uid = os.getuid()
-        xdg_runtime_dir = f"/run/user/{uid}"
+import logging
+import requests
+import sys
+import time
 
-    return f"{xdg_runtime_dir}/podman/podman.sock"
+from fleet_spec import fleet_name, load_specs
+from client_factory import get_docker_client, get_libpod_client
+from image_pull import ImagePuller, ImagePullError
+from job_runner import JobRunner, load_jobs
+from libpod import LibpodError, PodFleet, format_stats
 
 def main():
     """
@@ -50,23 +67,10 @@ def main():
     """
     print("--- Podman Python Controller ---")
 
-    # Construct the DOCKER_HOST URL for the Podman socket
-    socket_path = get_podman_socket_path()
-    podman_socket_url = f"unix://{socket_path}"
-
-    print(f"Attempting to connect to Podman service at: {podman_socket_url}")
-
     try:
-        # Initialize the client, pointing it to the Podman socket
-        client = docker.DockerClient(base_url=podman_socket_url)
-
-        # Ping the server to check the connection
-        if not client.ping():
-            print("\nError: Could not connect to the Podman service.")
-            print("Please ensure the podman socket is running with:")
-            print("  'systemctl --user enable --now podman.socket'")
-            return
-        
+        # The shared client: the socket (rootless Podman first, then rootful Podman, then Docker)
+        # and its API version are discovered once and cached, and the client pings it on creation.
+        client = get_docker_client(prefer="podman")
         print("Successfully connected to the Podman service!")
 
     except Exception as e:
@@ -82,11 +86,12 @@ def main():
     try:
         # --- 1. Pull an image ---
         print(f"\n1. Pulling image: '{image_name}'...")
+        # Streams layer progress while pulling (and skips the pull if the image is already present).
         try:
-            client.images.pull(image_name)
-            print("Image pulled successfully.")
-        except docker.errors.ImageNotFound:
-            print(f"Error: Image '{image_name}' not found.")
+            ImagePuller(client, report=lambda line: print(f"  {line}")).wait(image_name)
+            print("Image is ready.")
+        except ImagePullError as e:
+            print(f"Error: {e}")
             return
 
         # --- 2. List images ---
@@ -119,9 +124,13 @@ def main():
         # The container runs, prints its message, and exits.
         # We need to wait for it to finish to get the logs.
         container.wait()
-        logs = container.logs().decode('utf-8').strip()
         print("--- LOGS START ---")
-        print(logs)
+        # Stream the logs chunk by chunk instead of reading them into memory in one go.
+        # The incremental decoder copes with multi-byte characters split across chunks.
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        for chunk in container.logs(stream=True, follow=False):
+            print(decoder.decode(chunk), end='')
+        print(decoder.decode(b'', final=True))
         print("--- LOGS END ---")
 
 
@@ -171,6 +180,102 @@ def main():
         print("\n--- Script Finished ---")
 
 
+def run_fleet(spec_file, interval, keep, samples=None):
+    """Launches the pods and containers in 'spec_file' and prints fleet stats until Ctrl+C."""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    try:
+        specs = load_specs(spec_file, extra_keys=("pod",))
+    except (OSError, ValueError) as e:
+        print(f"Could not load container specs from '{spec_file}': {e}")
+        return 1
+
+    try:
+        client = get_libpod_client()
+        print(f"Connecting to the libpod API at: {client.base_url}")
+        client.ping()
+    except Exception as e:
+        print(f"\nCould not connect to the Podman service: {e}")
+        print("Please ensure the podman socket is running with:")
+        print("  'systemctl --user enable --now podman.socket'")
+        return 1
+
+    fleet = PodFleet(client, fleet=fleet_name(spec_file))
+    status = 0
+    try:
+        fleet.launch(specs)
+        taken = 0
+        while samples is None or taken < samples:
+            time.sleep(interval)
+            start = time.perf_counter()
+            try:
+                stats = fleet.stats()
+            except LibpodError as e:
+                print(f"Could not read stats: {e}")
+                continue
+            taken += 1
+            print(f"\n--- {len(stats)} containers, sampled in one request ({(time.perf_counter() - start) * 1000:.0f} ms) ---")
+            for line in format_stats(stats):
+                print(line)
+    except KeyboardInterrupt:
+        print("\nInterrupted.")
+    except LibpodError as e:
+        print(f"\nA libpod API error occurred: {e}")
+        status = 1
+    except requests.exceptions.ConnectionError as e:
+        print(f"\nLost the connection to the Podman service: {e}")
+        status = 1
+    finally:
+        if not keep:
+            print("\nStopping and removing the fleet...")
+            fleet.stop().log_summary()
+            fleet.remove().log_summary()
+    return status
+
+
+def run_jobs(jobs_file, results_file, concurrency, warm, timeout):
+    """Runs the jobs in 'jobs_file' and appends their results to 'results_file'."""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    try:
+        jobs = load_jobs(jobs_file)
+    except (OSError, ValueError) as e:
+        print(f"Could not load jobs from '{jobs_file}': {e}")
+        return 1
+    try:
+        # Every worker shares the client, so its pool must hold a connection per worker. The timeout
+        # also bounds how long a job's output may stay silent.
+        client = get_docker_client(prefer="podman", pool_size=max(10, concurrency * 2), timeout=timeout)
+    except docker.errors.DockerException as e:
+        print(f"\nAn error occurred while connecting to Podman: {e}")
+        return 1
+
+    print(f"Running {len(jobs)} jobs (concurrency {concurrency}, warm containers {'on' if warm else 'off'})...")
+    runner = JobRunner(client, results_file, concurrency=concurrency, warm=warm)
+    try:
+        report = runner.run(jobs)
+    except KeyboardInterrupt:
+        print("\nInterrupted.")
+        runner.remove_containers()
+        return 1
+    return 1 if report.failed else 0
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Control Podman containers from Python.")
+    parser.add_argument("--fleet", metavar="SPEC_FILE", help="Run the pods and containers of a JSON/YAML spec file.")
+    parser.add_argument("--interval", type=float, default=5, help="Seconds between fleet stats samples.")
+    parser.add_argument("--samples", type=int, help="Stop after this many stats samples.")
+    parser.add_argument("--keep", action="store_true", help="Leave the fleet running on exit.")
+    parser.add_argument("--jobs", metavar="JOBS_FILE", help="Run the jobs of a JSON Lines file.")
+    parser.add_argument("--results", default="results.jsonl", help="JSON Lines file job results are appended to.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Jobs running at the same time.")
+    parser.add_argument("--warm", action="store_true",
+                        help="Reuse warm containers across jobs with the same image (jobs see each other's files).")
+    parser.add_argument("--job-timeout", type=float, default=600,
+                        help="Seconds a job may run without printing anything before it counts as failed.")
+    args = parser.parse_args()
+    if args.jobs:
+        sys.exit(run_jobs(args.jobs, args.results, args.concurrency, args.warm, args.job_timeout))
+    if args.fleet:
+        sys.exit(run_fleet(args.fleet, args.interval, args.keep, args.samples))
     main()
 
@@ -0,0 +1,246 @@
+"""
+Health-check-aware readiness tracking and startup gating.
+
+A spec can declare how to tell that its container is ready, and which
+containers it needs:
+
+    {"name": "api", "image": ..., "command": ...,
+     "healthcheck": {"type": "http", "port": 8080, "path": "/health"},
+     "depends_on": ["db"]}
+
+Probe types are 'docker' (the container's own HEALTHCHECK reports healthy),
+'tcp' (the port accepts connections) and 'http' (GET returns 2xx/3xx, or
+'expect_status'). TCP and HTTP probes go to the container's IP address unless
+'host' is given, e.g. 'localhost' with a published port. A container without a
+healthcheck is ready as soon as it runs.
+
+All probes run concurrently on one asyncio event loop in a background thread,
+so waiting on many slow containers costs no threads. A container is only
+created once every container it depends on is ready; the time from start to
+ready is logged and exported as a metric.
+"""
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import docker
+import requests
+
+from fleet_ops import OperationReport
+
+PROBE_TYPES = ("docker", "tcp", "http")
+
+# Probes in flight at the same time, across the whole fleet.
+MAX_CONCURRENT_PROBES = 64
+
+
+class NotReady(Exception):
+    """A container (or a dependency of it) did not become ready."""
+
+
+@dataclass
+class Probe:
+    """How to tell that a container is ready."""
+    type: str = "docker"
+    port: Optional[int] = None
+    path: str = "/"
+    host: Optional[str] = None
+    expect_status: Optional[int] = None  # http: None accepts any 2xx/3xx
+    interval: float = 1.0
+    timeout: float = 2.0
+    start_timeout: float = 60.0  # give up if not ready this long after the start
+
+    @classmethod
+    def from_spec(cls, spec: dict) -> Optional["Probe"]:
+        """Builds the probe from a spec's 'healthcheck' entry; None if it has none."""
+        config = spec.get("healthcheck")
+        if not config:
+            return None
+        try:
+            probe = cls(**config)
+        except TypeError as e:
+            raise ValueError(f"Invalid healthcheck for container '{spec['name']}': {e}")
+        if probe.type not in PROBE_TYPES:
+            raise ValueError(f"Unknown healthcheck type '{probe.type}' for container '{spec['name']}'.")
+        if probe.type in ("tcp", "http") and not probe.port:
+            raise ValueError(f"The {probe.type} healthcheck of container '{spec['name']}' needs a 'port'.")
+        return probe
+
+
+@dataclass
+class ReadyState:
+    """Readiness of one container start; waiters block on 'done'."""
+    done: threading.Event = field(default_factory=threading.Event)
+    ready: bool = False
+    error: Optional[str] = None
+    container_id: Optional[str] = None
+    seconds: Optional[float] = None  # time to ready
+
+
+def container_address(attrs: dict) -> Optional[str]:
+    """The first IP address of a container, from its inspect data."""
+    settings = attrs.get("NetworkSettings") or {}
+    if settings.get("IPAddress"):
+        return settings["IPAddress"]
+    for network in (settings.get("Networks") or {}).values():
+        if network.get("IPAddress"):
+            return network["IPAddress"]
+    return None
+
+
+async def probe_tcp(host: str, port: int, timeout: float) -> bool:
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    return True
+
+
+async def probe_http(host: str, port: int, path: str, timeout: float, expect_status: Optional[int]) -> bool:
+    """A minimal HTTP/1.0 GET, so probing needs no HTTP client library."""
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    try:
+        writer.write(f"GET {path} HTTP/1.0\r\nHost: {host}:{port}\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    finally:
+        writer.close()
+    try:
+        status = int(status_line.split()[1])
+    except (IndexError, ValueError):
+        return False
+    return status == expect_status if expect_status is not None else 200 <= status < 400
+
+
+class ReadinessTracker:
+    """
+    Probes containers after they start and gates the launch of their dependents.
+
+    Args:
+        specs: The container specs ('healthcheck' and 'depends_on' entries).
+        client_for: Returns the Docker client for a container name.
+        on_ready: Called with (container ID, name, seconds to ready) when a container becomes ready.
+        dependency_timeout: Longest a launch waits for its dependencies.
+    """
+
+    def __init__(self, specs: List[dict], client_for: Callable[[str], docker.DockerClient],
+                 on_ready: Optional[Callable[[str, str, float], None]] = None, dependency_timeout: float = 300):
+        self.probes = {spec["name"]: Probe.from_spec(spec) for spec in specs}
+        self.depends_on = {spec["name"]: list(spec.get("depends_on") or []) for spec in specs}
+        self.client_for = client_for
+        self.on_ready = on_ready
+        self.dependency_timeout = dependency_timeout
+        self.states: Dict[str, ReadyState] = {name: ReadyState() for name in self.probes}
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        threading.Thread(target=self._loop.run_forever, name="readiness", daemon=True).start()
+
+    def started(self, container_id: str, name: str):
+        """Starts probing a container that was just started (or found running)."""
+        if name not in self.probes:
+            return
+        with self._lock:
+            state = self.states[name]
+            if state.done.is_set() or (state.container_id and state.container_id != container_id):
+                # A new start of the container: waiters from now on wait for this one.
+                state = self.states[name] = ReadyState()
+            state.container_id = container_id
+        asyncio.run_coroutine_threadsafe(self._wait_ready(state, container_id, name, time.monotonic()), self._loop)
+
+    def failed(self, name: str, error: str):
+        """Marks a container that could not be launched, so its dependents stop waiting."""
+        with self._lock:
+            if name not in self.states:
+                return
+            state = self.states[name]
+            if state.done.is_set():
+                state = self.states[name] = ReadyState()
+        state.error = error
+        state.done.set()
+
+    def wait_for_dependencies(self, name: str):
+        """Blocks until every dependency of a container is ready. Raises NotReady otherwise."""
+        deadline = time.monotonic() + self.dependency_timeout
+        for dep in self.depends_on.get(name, []):
+            with self._lock:
+                state = self.states[dep]
+            if not state.done.wait(max(0, deadline - time.monotonic())):
+                raise NotReady(f"dependency '{dep}' not ready after {self.dependency_timeout:.0f}s")
+            if not state.ready:
+                raise NotReady(f"dependency '{dep}' is not ready: {state.error}")
+
+    def wait_all(self, names: List[str], timeout: float) -> OperationReport:
+        """Waits (up to 'timeout' in total) for the named containers to become ready."""
+        report = OperationReport("ready")
+        start = time.perf_counter()
+        deadline = time.monotonic() + timeout
+        for name in names:
+            with self._lock:
+                state = self.states.get(name)
+            if state is None or not state.done.wait(max(0, deadline - time.monotonic())):
+                report.failed[name] = f"not ready after {timeout:.0f}s"
+            elif state.ready:
+                report.succeeded.append(name)
+            else:
+                report.failed[name] = state.error
+        report.wall_time = time.perf_counter() - start
+        return report
+
+    async def _wait_ready(self, state: ReadyState, container_id: str, name: str, started: float):
+        probe = self.probes[name]
+        try:
+            if probe is not None:
+                if self._semaphore is None:
+                    self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_PROBES)
+                await asyncio.wait_for(self._probe_until_ready(probe, container_id, name), probe.start_timeout)
+        except asyncio.TimeoutError:
+            state.error = f"not ready {probe.start_timeout:.0f}s after start"
+            logging.error(f"Container '{name}' (ID: {container_id[:12]}) is NOT READY: {state.error}.")
+        except (NotReady, docker.errors.APIError, requests.exceptions.RequestException) as e:
+            state.error = str(e)
+            logging.error(f"Container '{name}' (ID: {container_id[:12]}) is NOT READY: {e}")
+        else:
+            state.ready = True
+            state.seconds = time.monotonic() - started
+            detail = f" ({probe.type} probe)" if probe else ""
+            logging.info(f"Container '{name}' (ID: {container_id[:12]}) is READY after {state.seconds:.2f}s{detail}.")
+            if self.on_ready:
+                self.on_ready(container_id, name, state.seconds)
+        state.done.set()
+
+    async def _probe_until_ready(self, probe: Probe, container_id: str, name: str):
+        client = self.client_for(name)
+        host = probe.host
+        while True:
+            async with self._semaphore:
+                # The daemon calls are blocking docker SDK calls, so they run in the default executor.
+                attrs = await asyncio.to_thread(client.api.inspect_container, container_id)
+                status = attrs["State"].get("Status")
+                if status in ("exited", "dead"):
+                    raise NotReady(f"container {status} (exit code {attrs['State'].get('ExitCode')})")
+                if probe.type == "docker":
+                    health = (attrs["State"].get("Health") or {}).get("Status")
+                    if health is None:
+                        raise NotReady("the image has no HEALTHCHECK")
+                    if health == "healthy":
+                        return
+                elif status == "running":
+                    host = host or container_address(attrs)
+                    if host is None:
+                        raise NotReady("container has no IP address to probe")
+                    if probe.type == "tcp":
+                        if await probe_tcp(host, probe.port, probe.timeout):
+                            return
+                    elif await probe_http(host, probe.port, probe.path, probe.timeout, probe.expect_status):
+                        return
+            await asyncio.sleep(probe.interval)
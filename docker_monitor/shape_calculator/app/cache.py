@@ -0,0 +1,179 @@
+"""
+Caching of computed areas and the ETags that let clients skip a response.
+
+An area is a pure function of the validated shape, so a shape has one stable
+key: a digest of its canonical model dump (sorted keys, compact JSON, floats as
+validated, so `5` and `5.0` are the same shape). The key serves as
+
+* the cache key for the optional in-process LRU (`LRUCache`) and the optional
+  shared cache (`RedisCache`), both with a TTL, and
+* the response ETag. A client repeating a request with `If-None-Match` gets a
+  304 without the area being looked up or computed again.
+
+Counters of hits, misses and 304s are kept per process (per gunicorn worker).
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from pydantic import BaseModel
+
+# Part of every key and ETag; bump it when an area formula changes, so old ETags and cached areas stop matching.
+CACHE_VERSION = b"1"
+
+
+def shape_key(shape: BaseModel) -> str:
+    """The digest of the shape's canonical model dump."""
+    canonical = json.dumps(shape.model_dump(), sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.blake2b(CACHE_VERSION + canonical, digest_size=16).hexdigest()
+
+
+def body_key(body: bytes) -> str:
+    """The digest of a raw request body, for responses computed from the whole body (e.g. a batch)."""
+    return hashlib.blake2b(CACHE_VERSION + b"body:" + body, digest_size=16).hexdigest()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches the ETag (weak comparison, as RFC 9110 asks)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return etag.removeprefix("W/") in (tag.removeprefix("W/") for tag in candidates)
+
+
+class LRUCache:
+    """
+    An in-process LRU of areas with a TTL.
+
+    Args:
+        max_entries: Entries kept; the least recently used one is evicted beyond that.
+        ttl: Seconds an entry stays valid.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # key -> (expiry, area)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[float]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, area: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, area)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisCache:
+    """
+    A cache of areas shared by every worker and replica, in Redis.
+
+    Lookups are short and failures are tolerated: if Redis is slow or down,
+    the area is computed as if it missed.
+
+    Args:
+        url: The Redis URL, e.g. redis://localhost:6379/0.
+        ttl: Seconds an entry stays valid.
+        timeout: Seconds to wait for Redis before giving up on a lookup.
+    """
+    prefix = "shape_calculator:area:"
+
+    def __init__(self, url: str, ttl: float, timeout: float = 0.05):
+        parts = urlsplit(url)
+        self.url = parts._replace(netloc=parts.netloc.rpartition("@")[2]).geturl()  # without the password
+        try:
+            import redis.asyncio
+            import redis.exceptions
+        except ImportError:
+            raise ValueError(f"The redis package is required for the shared cache '{self.url}' (pip install redis).")
+        self.ttl = ttl
+        self._redis = redis.asyncio.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self._failures = (redis.exceptions.RedisError, OSError)
+        self.errors = 0
+
+    async def get(self, key: str) -> Optional[float]:
+        try:
+            value = await self._redis.get(self.prefix + key)
+        except self._failures as e:
+            self._failed(e)
+            return None
+        return float(value) if value is not None else None
+
+    async def set(self, key: str, area: float):
+        try:
+            await self._redis.set(self.prefix + key, repr(area), px=int(self.ttl * 1000))
+        except self._failures as e:
+            self._failed(e)
+
+    def _failed(self, e: Exception):
+        self.errors += 1
+        logging.debug(f"Shared cache {self.url} failed: {e}")
+
+
+class AreaCache:
+    """
+    The area cache in front of the per-shape functions: the LRU first, then the
+    shared cache, then the computation. Either tier may be None.
+    """
+
+    def __init__(self, local: Optional[LRUCache] = None, shared: Optional[RedisCache] = None):
+        self.local = local
+        self.shared = shared
+        self.counters: Dict[str, int] = {"local_hits": 0, "shared_hits": 0, "misses": 0, "not_modified": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.local is not None or self.shared is not None
+
+    async def area(self, key: str, shape: BaseModel, compute: Callable[[BaseModel], float]) -> float:
+        """The area of the shape with the given key, from the first tier that has it or computed."""
+        if not self.enabled:
+            return compute(shape)
+        if self.local is not None:
+            area = self.local.get(key)
+            if area is not None:
+                self.counters["local_hits"] += 1
+                return area
+        if self.shared is not None:
+            area = await self.shared.get(key)
+            if area is not None:
+                self.counters["shared_hits"] += 1
+                if self.local is not None:
+                    self.local.set(key, area)
+                return area
+        self.counters["misses"] += 1
+        area = compute(shape)
+        if self.local is not None:
+            self.local.set(key, area)
+        if self.shared is not None:
+            await self.shared.set(key, area)
+        return area
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "local_entries": len(self.local) if self.local is not None else None,
+            "shared": self.shared.url if self.shared is not None else None,
+            "shared_errors": self.shared.errors if self.shared is not None else 0,
+        }
@@ -1,47 +1,271 @@
-from fastapi import FastAPI, HTTPException
-from typing import Union
+import asyncio
+import math
+import os
+import threading
 
-from .models import Circle, Rectangle, Triangle, Shape
+import numpy as np
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from pydantic import ValidationError
+from typing import List, Union
+
+from .batch import area_overflow_error, calculate_areas, calculate_raw_areas
+from .cache import AreaCache, LRUCache, RedisCache, body_key, etag_matches, shape_key
+from .models import Shape, ShapeListAdapter, RawShapeListAdapter, polygon_area
+from .profiling import sample_stacks
+from .registry import SHAPES
+from .stream import NDJSON_MEDIA_TYPE, NDJSONStreamingResponse, stream_areas
+from .timing import TimingMiddleware, mark_parsed, stage, timing_stats
+
+# Whether the batch endpoint validates shapes into plain dicts instead of models (see `RawShape`).
+# Both accept and reject exactly the same input; set SHAPE_CALCULATOR_RAW_VALIDATION=0 to compare.
+RAW_VALIDATION = os.environ.get("SHAPE_CALCULATOR_RAW_VALIDATION", "1") != "0"
+
+# Bytes per vertex in a binary polygon upload: x and y as little-endian float64.
+VERTEX_DTYPE = np.dtype("<f8")
+
+# Areas kept in each worker's LRU; 0 (the default) disables it.
+CACHE_SIZE = int(os.environ.get("SHAPE_CALCULATOR_CACHE_SIZE", "0"))
+
+# Seconds a cached area stays valid, in the LRU and the shared cache.
+CACHE_TTL = float(os.environ.get("SHAPE_CALCULATOR_CACHE_TTL", "300"))
+
+# Redis URL of a cache shared by all workers (e.g. redis://localhost:6379/0); unset by default.
+CACHE_URL = os.environ.get("SHAPE_CALCULATOR_CACHE_URL", "")
+
+# Whether /debug/profile may sample a worker's stacks; off unless SHAPE_CALCULATOR_PROFILING=1.
+PROFILING = os.environ.get("SHAPE_CALCULATOR_PROFILING", "0") == "1"
+
+# Longest profile /debug/profile takes, in seconds.
+MAX_PROFILE_SECONDS = 60
 
 app = FastAPI(title="Shape Area Calculator",
               description="A simple API to calculate the area of various shapes.")
+app.add_middleware(TimingMiddleware)
+
+area_cache = AreaCache(LRUCache(CACHE_SIZE, CACHE_TTL) if CACHE_SIZE > 0 else None,
+                       RedisCache(CACHE_URL, CACHE_TTL) if CACHE_URL else None)
+
+def shape_list_schema() -> dict:
+    """The OpenAPI schema of a list of shapes, referring to the shape models' component schemas."""
+    schema = ShapeListAdapter.json_schema(ref_template="#/components/schemas/{model}")
+    schema.pop("$defs", None)
+    return schema
+
+def area_of(shape: Shape) -> float:
+    """
+    Calculates the area of a given shape with the kernel registered for its type.
+
+    Raises:
+        HTTPException: If an unknown shape type is provided (should not happen with pydantic validation).
+        RequestValidationError: If the area overflows float64 (a 422 response). Raised here, so it is never cached.
+    """
+    kind = SHAPES.get(shape.shape_type)
+    if kind is None:
+        # This case should theoretically not be reachable due to pydantic validation
+        # and the `Shape` Union type, but good for defensive programming.
+        raise HTTPException(status_code=400, detail="Unknown shape type provided.")
+    try:
+        area = kind.area(shape)
+    except OverflowError:  # Python float ** raises instead of returning inf.
+        area = math.inf
+    if not math.isfinite(area):
+        raise RequestValidationError([area_overflow_error(("body",))])
+    return area
 
-def calculate_circle_area(circle: Circle) -> float:
-    """Calculates the area of a circle."""
-    return 3.14159 * (circle.radius ** 2)
+@app.post("/calculate_area/", response_model=float, summary="Calculate area of a shape",
+          responses={304: {"description": "The area is unchanged since the ETag in If-None-Match."}})
+async def calculate_area(shape: Shape, request: Request) -> Response:
+    """
+    Calculates the area of a given shape (any registered type, e.g. a circle or a polygon).
+
+    The response carries an ETag derived from the shape. A request with a
+    matching If-None-Match header gets a 304 with no body. The area is read
+    from the area cache when it is enabled.
 
-def calculate_rectangle_area(rectangle: Rectangle) -> float:
-    """Calculates the area of a rectangle."""
-    return rectangle.width * rectangle.height
+    Args:
+        shape: The shape object, of any registered type.
+        request: The request, for its If-None-Match header.
 
-def calculate_triangle_area(triangle: Triangle) -> float:
-    """Calculates the area of a triangle."""
-    return 0.5 * triangle.base * triangle.height
+    Returns:
+        The calculated area as a float, or a 304.
+    """
+    mark_parsed()
+    key = shape_key(shape)
+    etag = f'"{key}"'
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        area_cache.counters["not_modified"] += 1
+        return Response(status_code=304, headers={"ETag": etag})
+    with stage("compute"):
+        area = await area_cache.area(key, shape, area_of)
+    with stage("serialize"):
+        return JSONResponse(area, headers={"ETag": etag})
 
-@app.post("/calculate_area/", response_model=float, summary="Calculate area of a shape")
-async def calculate_area(shape: Shape) -> float:
+@app.post("/calculate_area/batch", response_model=List[float], summary="Calculate the areas of many shapes",
+          responses={304: {"description": "The areas are unchanged since the ETag in If-None-Match."}},
+          openapi_extra={"requestBody": {"required": True,
+                                         "content": {"application/json": {"schema": shape_list_schema()}}}})
+async def calculate_area_batch(request: Request) -> Response:
     """
-    Calculates the area of a given shape (circle, rectangle, or triangle).
+    Calculates the areas of a list of shapes in one request.
+
+    The shapes may mix any registered types. They are grouped by `shape_type`
+    and each group is computed with one vectorized NumPy operation,
+    so large batches cost little more than their parsing.
+
+    The body is validated straight from the raw JSON by a precompiled
+    validator, into plain dicts unless RAW_VALIDATION is off, rather than by
+    FastAPI's per-request model parsing. Errors are reported the same way.
+
+    The ETag is a digest of the raw body, so resending the same batch with
+    If-None-Match gets a 304 before the body is even parsed.
 
     Args:
-        shape: The shape object, which can be a Circle, Rectangle, or Triangle.
+        request: The request; its body is a JSON list of shape objects.
 
     Returns:
-        The calculated area as a float.
+        The areas, in the same order as the shapes, or a 304.
 
     Raises:
-        HTTPException: If an unknown shape type is provided (should not happen with pydantic validation).
+        RequestValidationError: If the body isn't a valid list of shapes, or a shape's area
+            overflows float64 (a 422 response).
     """
-    if isinstance(shape, Circle):
-        return calculate_circle_area(shape)
-    elif isinstance(shape, Rectangle):
-        return calculate_rectangle_area(shape)
-    elif isinstance(shape, Triangle):
-        return calculate_triangle_area(shape)
-    else:
-        # This case should theoretically not be reachable due to pydantic validation
-        # and the `Shape` Union type, but good for defensive programming.
-        raise HTTPException(status_code=400, detail="Unknown shape type provided.")
+    body = await request.body()
+    etag = f'"{body_key(body)}"'
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        area_cache.counters["not_modified"] += 1
+        return Response(status_code=304, headers={"ETag": etag})
+    try:
+        shapes = (RawShapeListAdapter if RAW_VALIDATION else ShapeListAdapter).validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError([{**error, "loc": ("body", *error["loc"])}
+                                      for error in e.errors(include_url=False)], body=body)
+    mark_parsed()
+    with stage("compute"):
+        areas = calculate_raw_areas(shapes) if RAW_VALIDATION else calculate_areas(shapes)
+        overflowed = np.flatnonzero(~np.isfinite(areas))
+    if len(overflowed):
+        raise RequestValidationError([area_overflow_error(("body", int(index))) for index in overflowed[:10]],
+                                     body=body[:64])
+    # The floats are already checked; returning them directly skips re-validating the response item by item.
+    with stage("serialize"):
+        return JSONResponse(areas.tolist(), headers={"ETag": etag})
+
+def polygon_upload_error(message: str, body: bytes) -> RequestValidationError:
+    return RequestValidationError([{"type": "polygon_upload", "loc": ("body",), "msg": message}], body=body[:64])
+
+@app.post("/calculate_area/polygon", response_model=float, summary="Calculate the area of a polygon sent as binary",
+          openapi_extra={"requestBody": {"required": True,
+                                         "content": {"application/octet-stream": {"schema": {"type": "string",
+                                                                                             "format": "binary"}}}}})
+async def calculate_polygon_area(request: Request) -> JSONResponse:
+    """
+    Calculates the area of a polygon sent as raw coordinates.
+
+    The body is the vertices in order, as little-endian float64 x/y pairs
+    (`vertices.astype("<f8").tobytes()` for an (n, 2) NumPy array). It is
+    viewed as an array with `np.frombuffer`, without parsing or copying, so
+    polygons with 10^5+ vertices cost little more than their upload. Small
+    polygons can also be sent as JSON to `/calculate_area/`.
+
+    Args:
+        request: The request, with an `application/octet-stream` body.
+
+    Returns:
+        The area as a float.
+
+    Raises:
+        HTTPException: If the body isn't `application/octet-stream` (a 415 response).
+        RequestValidationError: If the body isn't at least 3 finite vertices, or their area
+            overflows float64 (a 422 response).
+    """
+    if request.headers.get("content-type", "").split(";")[0].strip() != "application/octet-stream":
+        raise HTTPException(status_code=415, detail="Send the vertices as application/octet-stream.")
+    body = await request.body()
+    if len(body) % (2 * VERTEX_DTYPE.itemsize):
+        raise polygon_upload_error(f"The body must be x/y pairs of float64, {2 * VERTEX_DTYPE.itemsize} bytes "
+                                   f"per vertex; got {len(body)} bytes.", body)
+    vertices = np.frombuffer(body, dtype=VERTEX_DTYPE).reshape(-1, 2)
+    if len(vertices) < 3:
+        raise polygon_upload_error(f"A polygon needs at least 3 vertices; got {len(vertices)}.", body)
+    if not np.isfinite(vertices).all():
+        raise polygon_upload_error("Every coordinate must be finite.", body)
+    mark_parsed()
+    with stage("compute"), np.errstate(over="ignore"):
+        area = polygon_area(vertices)
+    if not math.isfinite(area):
+        raise RequestValidationError([area_overflow_error(("body",))], body=body[:64])
+    with stage("serialize"):
+        return JSONResponse(area)
+
+@app.post("/calculate_area/stream", response_class=NDJSONStreamingResponse,
+          summary="Calculate the areas of an NDJSON stream of shapes",
+          openapi_extra={"requestBody": {"required": True, "content": {NDJSON_MEDIA_TYPE: {"schema": {"type": "string"}}}}})
+async def calculate_area_stream(request: Request) -> NDJSONStreamingResponse:
+    """
+    Calculates the areas of shapes sent as NDJSON, one shape per line.
+
+    The body is parsed and computed while it is uploaded, and results are
+    streamed back as NDJSON: `{"line": n, "area": ...}` for each valid line,
+    and `{"line": n, "error": [...]}` for each rejected one. Clients must read
+    the response while they upload (curl does).
+
+    Args:
+        request: The request, whose body is read incrementally.
+
+    Returns:
+        A streaming NDJSON response, one line per non-blank input line.
+    """
+    return NDJSONStreamingResponse(stream_areas(request.stream()))
+
+@app.get("/cache/stats", summary="Area cache counters of this worker")
+async def cache_stats() -> dict:
+    """
+    Returns this worker's cache counters: hits per tier, misses and 304s
+    answered, plus the LRU's size and the shared cache in use.
+    """
+    return area_cache.stats()
+
+@app.get("/timing/stats", summary="Per-stage latency histograms of this worker")
+async def get_timing_stats() -> dict:
+    """
+    Returns this worker's latency histograms, per route and stage (parse,
+    compute, serialize, total): count, mean, p50/p95/p99 and bucket counts in ms.
+    The percentiles are bucket upper bounds.
+    """
+    return timing_stats()
+
+_profiling = threading.Lock()
+
+@app.get("/debug/profile", response_class=PlainTextResponse,
+         summary="Sample this worker's stacks and return them as collapsed stacks for a flamegraph")
+async def debug_profile(seconds: float = 10, interval_ms: float = 5) -> PlainTextResponse:
+    """
+    Samples every thread's Python stack of the worker that receives the request,
+    every `interval_ms` for `seconds`, while it keeps serving requests. The
+    result is in the collapsed format that flamegraph.pl and speedscope read.
+
+    Only available with SHAPE_CALCULATOR_PROFILING=1. One profile at a time per worker.
+
+    Raises:
+        HTTPException: 404 if profiling is disabled, 400 for a bad duration or interval,
+            409 if a profile is already running.
+    """
+    if not PROFILING:
+        raise HTTPException(status_code=404, detail="Profiling is disabled; set SHAPE_CALCULATOR_PROFILING=1.")
+    if not 0 < seconds <= MAX_PROFILE_SECONDS or not 0.1 <= interval_ms <= 1000:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {MAX_PROFILE_SECONDS}] "
+                                                    f"and interval_ms in [0.1, 1000].")
+    if not _profiling.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A profile is already running in this worker.")
+    try:
+        stacks = await asyncio.to_thread(sample_stacks, seconds, interval_ms / 1000)
+    finally:
+        _profiling.release()
+    return PlainTextResponse(stacks, headers={
+        "Content-Disposition": f'attachment; filename="shape_calculator-{os.getpid()}.folded"'})
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,67 @@
+"""
+An in-process sampling profiler for a live worker.
+
+`sample_stacks()` runs in a background thread. Every `interval` seconds it
+reads every other thread's current Python stack (`sys._current_frames()`),
+including the event loop serving requests, and counts identical stacks.
+This is the approach of py-spy, in-process and without ptrace, so it works
+in an unprivileged container. The result is in the "collapsed" (folded)
+format: one line per distinct stack, the thread name and then the frames
+from the root to the leaf separated by ';', then the sample count:
+
+    MainThread;run (asyncio/runners.py:86);...;calculate_area_batch (app/main.py:98) 42
+
+flamegraph.pl, speedscope and inferno read this format directly. Sampling
+adds a few microseconds per interval, so it is cheap enough to run against a
+worker under real load.
+
+Unlike py-spy, which reads the process from outside, an in-process sampler
+needs the GIL to take a sample. A long C call that holds it, such as pydantic's
+`validate_json` or a NumPy kernel, is therefore sampled less often than its
+duration deserves, and shows up near the Python frames around it. The
+Server-Timing stages (see `app/timing.py`) measure those exactly. Where the
+container allows ptrace, `py-spy record --format raw -p <pid>` gives an
+unbiased profile in the same format.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+from typing import List
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)  # co_qualname is new in Python 3.11
+    filename = os.path.join(*code.co_filename.split(os.sep)[-2:])
+    return f"{name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _stack(frame: FrameType) -> str:
+    names: List[str] = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def sample_stacks(duration: float, interval: float) -> str:
+    """
+    Samples the stacks of every other thread for 'duration' seconds.
+
+    Returns:
+        The collapsed stacks, most frequent first.
+    """
+    me = threading.get_ident()
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    stacks: Counter = Counter()
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident != me:
+                thread = str(names.get(ident, ident)).replace(";", ":")
+                stacks[f"{thread};{_stack(frame)}"] += 1
+        time.sleep(interval)
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
@@ -0,0 +1,91 @@
+"""
+The shape registry: every supported shape, by `shape_type`.
+
+A shape is declared once, as a pydantic model decorated with its area kernel:
+
+    @register_shape(lambda width, height: width * height)
+    class Rectangle(BaseModel):
+        shape_type: Literal["rectangle"] = "rectangle"
+        width: float = Field(..., gt=0)
+        height: float = Field(..., gt=0)
+
+The kernel computes the areas of many shapes of that type at once, from NumPy
+arrays. By default it gets one array per parameter, holding the model field
+of the same name for every shape of the group. Such a kernel must be plain
+arithmetic, since a single shape's area calls it with floats. A shape whose
+fields don't fit in columns (e.g. a polygon's vertices) passes its own
+`gather`, which turns the group into the kernel's arguments. The endpoints,
+the validation unions and the batch code all read from the registry. Adding a
+shape is therefore one decorated model, and dispatch is one dict lookup on
+`shape_type`.
+"""
+import inspect
+from dataclasses import dataclass
+from typing import Callable, Dict, Mapping, Optional, Sequence, Tuple, Type
+
+import numpy as np
+from pydantic import BaseModel
+
+# Turns a group of shapes (dicts of field values) into the kernel's arguments.
+Gather = Callable[[Sequence[Mapping]], Tuple]
+
+
+def gather_columns(fields: Sequence[str]) -> Gather:
+    """A gather passing one float array per field."""
+    def gather(shapes: Sequence[Mapping]) -> Tuple[np.ndarray, ...]:
+        return tuple(np.fromiter((shape[field] for shape in shapes), dtype=np.float64, count=len(shapes))
+                     for field in fields)
+    return gather
+
+
+@dataclass(frozen=True)
+class ShapeKind:
+    """A registered shape: its model and how to compute its area."""
+    shape_type: str
+    model: Type[BaseModel]
+    kernel: Callable[..., np.ndarray]
+    gather: Gather
+    fields: Optional[Tuple[str, ...]] = None  # the kernel's columns, unless it has its own gather
+
+    def areas(self, shapes: Sequence[Mapping]) -> np.ndarray:
+        """The areas of shapes of this type, given as dicts of their fields."""
+        return np.asarray(self.kernel(*self.gather(shapes)), dtype=np.float64)
+
+    def area(self, shape: BaseModel) -> float:
+        """The area of a single shape model."""
+        if self.fields is not None:
+            # Column kernels are plain arithmetic, so they take scalars as well; no arrays needed.
+            return float(self.kernel(*(getattr(shape, field) for field in self.fields)))
+        # A model's __dict__ holds its field values.
+        return float(self.areas([shape.__dict__])[0])
+
+
+# shape_type -> ShapeKind, in registration order
+SHAPES: Dict[str, ShapeKind] = {}
+
+
+def register_shape(kernel: Callable[..., np.ndarray], gather: Optional[Gather] = None):
+    """
+    Class decorator registering a shape model with its vectorized area kernel.
+
+    Args:
+        kernel: Computes the areas of a group of shapes at once.
+        gather: Builds the kernel's arguments from the group; by default, one
+            column per kernel parameter, taken from the field of that name.
+
+    Raises:
+        ValueError: If the model has no `shape_type` default, or it is already registered.
+    """
+    def decorator(model: Type[BaseModel]) -> Type[BaseModel]:
+        shape_type = model.model_fields["shape_type"].default if "shape_type" in model.model_fields else None
+        if not isinstance(shape_type, str):
+            raise ValueError(f"{model.__name__} needs a `shape_type` field with its tag as the default.")
+        if shape_type in SHAPES:
+            raise ValueError(f"Shape type '{shape_type}' is already registered by {SHAPES[shape_type].model.__name__}.")
+        if gather is not None:
+            SHAPES[shape_type] = ShapeKind(shape_type, model, kernel, gather)
+        else:
+            fields = tuple(inspect.signature(kernel).parameters)
+            SHAPES[shape_type] = ShapeKind(shape_type, model, kernel, gather_columns(fields), fields)
+        return model
+    return decorator
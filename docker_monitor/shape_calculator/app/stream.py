@@ -0,0 +1,124 @@
+"""
+Streaming NDJSON mode: one shape per request line in, one result per line out.
+
+The request body is read as it arrives, split into lines and validated with
+the same rules as the other endpoints, into plain dicts (`RawShape`). Every
+CHUNK_LINES lines, the valid shapes of the chunk are computed with the
+vectorized kernels from `app/batch.py`, and their results are sent before more
+of the body is read. Memory use is therefore bounded by the chunk size, not by
+the upload: a million-shape file never exists as one array on either side.
+
+Each non-blank input line gets one output line, in input order:
+
+    {"line": 1, "area": 78.53975}
+    {"line": 2, "error": [{"type": "greater_than", "loc": ["circle", "radius"], "msg": "..."}]}
+"""
+import json
+import math
+from typing import AsyncIterator, List, Optional, Tuple, Union
+
+from pydantic import ValidationError
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from .batch import area_overflow_error, calculate_raw_areas
+from .models import RawShape, RawShapeAdapter
+from .timing import stage
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Lines validated and computed together; bounds the memory a stream uses.
+CHUNK_LINES = 4096
+
+# Longer lines are rejected without being buffered.
+MAX_LINE_BYTES = 64 * 1024
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """
+    A StreamingResponse whose body is produced while the request body is still
+    being read.
+
+    StreamingResponse normally listens for a client disconnect by calling
+    `receive()` in parallel with the body, which would swallow the request
+    chunks the body generator is waiting for. Here the generator is the only
+    reader: a disconnect surfaces as ClientDisconnect from `request.stream()`.
+    """
+    media_type = NDJSON_MEDIA_TYPE
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Optional[bytes]]:
+    """
+    Splits a byte stream into lines. A line longer than MAX_LINE_BYTES is
+    dropped as it arrives and yielded as None.
+    """
+    buffer = b""
+    overlong = False
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield None if overlong or len(line) > MAX_LINE_BYTES else line
+            overlong = False
+        if len(buffer) > MAX_LINE_BYTES:
+            buffer, overlong = b"", True
+    if buffer or overlong:
+        yield None if overlong else buffer
+
+
+def _parse(line: Optional[bytes]) -> Union[RawShape, list]:
+    """The validated shape, or the list of errors rejecting the line."""
+    if line is None:
+        return [{"type": "line_too_long", "msg": f"Line is longer than {MAX_LINE_BYTES} bytes"}]
+    try:
+        return RawShapeAdapter.validate_json(line)
+    except ValidationError as e:
+        return json.loads(e.json(include_url=False, include_input=False))
+
+
+def _results(pending: List[Tuple[int, Union[RawShape, list]]]) -> bytes:
+    """The output lines of one chunk of parsed lines."""
+    shapes = [parsed for _, parsed in pending if not isinstance(parsed, list)]
+    with stage("compute"):
+        areas = iter(calculate_raw_areas(shapes).tolist())
+    with stage("serialize"):
+        out = []
+        for number, parsed in pending:
+            if isinstance(parsed, list):
+                out.append(json.dumps({"line": number, "error": parsed}))
+                continue
+            area = next(areas)
+            if math.isfinite(area):
+                out.append(json.dumps({"line": number, "area": area}))
+            else:
+                out.append(json.dumps({"line": number, "error": [area_overflow_error(())]}))
+        return ("\n".join(out) + "\n").encode()
+
+
+async def stream_areas(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Computes the areas of an NDJSON stream of shapes, CHUNK_LINES at a time.
+
+    Args:
+        chunks: The raw request body, as it arrives.
+
+    Yields:
+        NDJSON output, one line per non-blank input line (see the module docstring).
+    """
+    pending: List[Tuple[int, Union[RawShape, list]]] = []
+    number = 0
+    async for line in iter_lines(chunks):
+        number += 1
+        if line is not None and not line.strip():
+            continue
+        pending.append((number, _parse(line)))
+        if len(pending) >= CHUNK_LINES:
+            yield _results(pending)
+            pending = []
+    if pending:
+        yield _results(pending)
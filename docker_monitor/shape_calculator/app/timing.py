@@ -0,0 +1,151 @@
+"""
+Per-request stage timings: a Server-Timing header and latency histograms.
+
+`TimingMiddleware` starts a clock for each request. Endpoints report where
+the time went:
+
+    parse       from the request's arrival until its input is validated (routing, reading the body,
+                JSON decoding and validation, which pydantic does in one pass); `mark_parsed()`
+    compute     the areas; `with stage("compute"):`
+    serialize   building the response body; `with stage("serialize"):`
+
+The stages known when the response starts are sent in a Server-Timing header
+(in ms), along with `app`, the time to the response start:
+
+    Server-Timing: parse;dur=0.412, compute;dur=0.003, serialize;dur=0.010, app;dur=0.450
+
+Every stage, plus `total` (until the last byte is handed to the server), is
+recorded in a histogram per route, served by `/timing/stats`. Histograms
+are kept per process, i.e. per gunicorn worker.
+"""
+import contextlib
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Upper bounds (ms) of the histogram buckets; a last bucket holds everything slower.
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class RequestTimings:
+    """The stage durations (seconds) of one request."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def header(self, now: float) -> str:
+        parts = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.stages.items()]
+        parts.append(f"app;dur={(now - self.start) * 1000:.3f}")
+        return ", ".join(parts)
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def mark_parsed():
+    """Records the parse stage as ending now: the endpoint has its validated input."""
+    timings = _current.get()
+    if timings is not None and "parse" not in timings.stages:
+        timings.stages["parse"] = time.perf_counter() - timings.start
+
+
+@contextlib.contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Adds the time spent in the block to the named stage of the current request (if timed)."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+class Histogram:
+    """Counts of durations in BUCKETS_MS buckets."""
+
+    def __init__(self):
+        self.buckets: List[int] = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+
+    def observe(self, ms: float):
+        self.buckets[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.sum_ms += ms
+
+    def quantile(self, q: float) -> Optional[float]:
+        """The upper bound (ms) of the bucket holding the q-quantile; None beyond the last bound."""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": self.sum_ms / self.count if self.count else None,
+            "p50_ms": self.quantile(0.50), "p95_ms": self.quantile(0.95), "p99_ms": self.quantile(0.99),
+            "buckets": {f"le_{bound}": count for bound, count in zip(BUCKETS_MS, self.buckets) if count}
+                       | ({"le_inf": self.buckets[-1]} if self.buckets[-1] else {}),
+        }
+
+
+# route path -> stage -> Histogram
+histograms: Dict[str, Dict[str, Histogram]] = {}
+
+
+def record(route: str, timings: RequestTimings, total: float):
+    stages = histograms.setdefault(route, {})
+    for name, seconds in (*timings.stages.items(), ("total", total)):
+        stages.setdefault(name, Histogram()).observe(seconds * 1000)
+
+
+def timing_stats() -> dict:
+    return {route: {name: histogram.to_dict() for name, histogram in stages.items()}
+            for route, stages in histograms.items()}
+
+
+class TimingMiddleware:
+    """
+    Times every HTTP request (see the module docstring).
+
+    A plain ASGI middleware rather than BaseHTTPMiddleware, which would run the
+    endpoint in another task and buffer streaming responses.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings = RequestTimings()
+        token = _current.set(timings)
+
+        async def send_with_timing(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("Server-Timing", timings.header(time.perf_counter()))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            # The router stores the matched route in the scope; unmatched paths share one entry.
+            route = getattr(scope.get("route"), "path", "unmatched")
+            record(route, timings, time.perf_counter() - timings.start)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmarks the batch endpoint against the single-shape endpoint.
+
+For each batch size N, a random mix of circles, rectangles and triangles is
+sent twice:
+
+    single   N requests to /calculate_area/, one shape each, over one keep-alive connection
+    batch    one request to /calculate_area/batch with all N shapes
+
+Reported per size: shapes per second for both, the batch request's latency,
+and the speedup. The single endpoint is timed on at most --max-single
+requests and its rate extrapolated, so the 100k row doesn't take minutes.
+
+By default the app runs in-process (through httpx's ASGI transport, so no
+server or network is involved); with --url the requests go to a running
+server instead, e.g. the container from `just start_server`.
+
+Usage (from the shape_calculator directory; needs httpx):
+    python benchmarks/bench_batch.py [--sizes 1 10 100 1000 10000 100000] [--max-single 2000] [--url URL]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from typing import List, Optional
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def random_shapes(count: int, seed: int = 0) -> List[dict]:
+    rng = random.Random(seed)
+    shapes = []
+    for _ in range(count):
+        kind = rng.choice(("circle", "rectangle", "triangle"))
+        if kind == "circle":
+            shapes.append({"shape_type": "circle", "radius": rng.uniform(0.1, 100)})
+        elif kind == "rectangle":
+            shapes.append({"shape_type": "rectangle", "width": rng.uniform(0.1, 100), "height": rng.uniform(0.1, 100)})
+        else:
+            shapes.append({"shape_type": "triangle", "base": rng.uniform(0.1, 100), "height": rng.uniform(0.1, 100)})
+    return shapes
+
+
+async def time_single(client: httpx.AsyncClient, shapes: List[dict]) -> float:
+    """Seconds per shape through the single-shape endpoint."""
+    start = time.perf_counter()
+    for shape in shapes:
+        response = await client.post("/calculate_area/", json=shape)
+        response.raise_for_status()
+    return (time.perf_counter() - start) / len(shapes)
+
+
+async def time_batch(client: httpx.AsyncClient, shapes: List[dict]) -> float:
+    """Seconds for one batch request with every shape."""
+    start = time.perf_counter()
+    response = await client.post("/calculate_area/batch", json=shapes)
+    response.raise_for_status()
+    elapsed = time.perf_counter() - start
+    if len(response.json()) != len(shapes):
+        raise RuntimeError(f"Expected {len(shapes)} areas, got {len(response.json())}")
+    return elapsed
+
+
+async def run(sizes: List[int], max_single: int, url: Optional[str]):
+    if url:
+        client = httpx.AsyncClient(base_url=url, timeout=300)
+    else:
+        from app.main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=300)
+
+    async with client:
+        # Warm up both endpoints (imports, route compilation, connection).
+        await time_single(client, random_shapes(10))
+        await time_batch(client, random_shapes(10))
+
+        print(f"{'shapes':>8} | {'single':>14} | {'batch':>14} | {'batch latency':>13} | {'speedup':>8}")
+        print("-" * 70)
+        for size in sizes:
+            shapes = random_shapes(size, seed=size)
+            per_shape = await time_single(client, shapes[:max_single])
+            batch = await time_batch(client, shapes)
+            single_rate, batch_rate = 1 / per_shape, size / batch
+            print(f"{size:>8} | {single_rate:>8.0f} /s    | {batch_rate:>8.0f} /s    | {batch * 1000:>10.2f} ms | "
+                  f"{batch_rate / single_rate:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000, 10000, 100000])
+    parser.add_argument("--max-single", type=int, default=2000,
+                        help="Most single-shape requests timed per size; the rate is extrapolated beyond.")
+    parser.add_argument("--url", help="Benchmark a running server (e.g. http://localhost:8000) instead of in-process.")
+    args = parser.parse_args()
+    asyncio.run(run(args.sizes, args.max_single, args.url))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmarks large polygons sent as JSON against the binary upload.
+
+For each vertex count, one simple polygon (a jittered circle) is sent both ways:
+
+    json     {"shape_type": "polygon", "vertices": [[x, y], ...]} to /calculate_area/
+    binary   the vertices as little-endian float64 x/y pairs to /calculate_area/polygon
+
+Reported per size and format: body size, the client's encoding time, the
+request's round trip (server-side parsing, validation and area included),
+and vertices per second end to end. Both must return the same area.
+
+By default the app runs in-process (through httpx's ASGI transport); with
+--url the requests go to a running server instead.
+
+Usage (from the shape_calculator directory; needs httpx):
+    python benchmarks/bench_polygon.py [--sizes 1000 10000 100000 1000000] [--repeat 5] [--url URL]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Callable, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def random_polygon(count: int, seed: int = 0) -> np.ndarray:
+    """A simple polygon of 'count' vertices: points around a circle at jittered radii, in angle order."""
+    rng = np.random.default_rng(seed)
+    angles = np.sort(rng.uniform(0, 2 * np.pi, count))
+    radii = rng.uniform(50, 100, count)
+    return np.column_stack((radii * np.cos(angles), radii * np.sin(angles)))
+
+
+def encode_json(vertices: np.ndarray) -> bytes:
+    return json.dumps({"shape_type": "polygon", "vertices": vertices.tolist()}).encode()
+
+
+def encode_binary(vertices: np.ndarray) -> bytes:
+    return vertices.astype("<f8").tobytes()
+
+
+async def time_format(client: httpx.AsyncClient, path: str, content_type: str, encode: Callable[[np.ndarray], bytes],
+                      vertices: np.ndarray, repeat: int) -> Tuple[int, float, float, float]:
+    """(body bytes, best encoding time, best round trip, area) over 'repeat' runs."""
+    encodings, round_trips = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = encode(vertices)
+        encodings.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        response = await client.post(path, content=body, headers={"Content-Type": content_type})
+        response.raise_for_status()
+        round_trips.append(time.perf_counter() - start)
+    return len(body), min(encodings), min(round_trips), response.json()
+
+
+async def run(sizes: List[int], repeat: int, url: Optional[str]):
+    if url:
+        client = httpx.AsyncClient(base_url=url, timeout=300)
+    else:
+        from app.main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=300)
+
+    formats = [("json", "/calculate_area/", "application/json", encode_json),
+               ("binary", "/calculate_area/polygon", "application/octet-stream", encode_binary)]
+    async with client:
+        for _, path, content_type, encode in formats:
+            await time_format(client, path, content_type, encode, random_polygon(10), 1)
+
+        print(f"{'vertices':>9} | {'format':<6} | {'body':>9} | {'encode':>10} | {'request':>10} | "
+              f"{'vertices/s':>12} | {'speedup':>7}")
+        print("-" * 82)
+        for size in sizes:
+            vertices = random_polygon(size, seed=size)
+            areas, baseline = [], None
+            for name, path, content_type, encode in formats:
+                body_size, encoding, round_trip, area = await time_format(client, path, content_type, encode,
+                                                                          vertices, repeat)
+                total = encoding + round_trip
+                baseline = baseline or total
+                areas.append(area)
+                print(f"{size:>9} | {name:<6} | {body_size / 1e6:>6.2f} MB | {encoding * 1000:>7.2f} ms | "
+                      f"{round_trip * 1000:>7.2f} ms | {size / total:>12.0f} | {baseline / total:>6.1f}x")
+            if not np.isclose(areas[0], areas[1], rtol=1e-9):
+                raise RuntimeError(f"The formats disagree on the area: {areas}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per size and format; the best is reported.")
+    parser.add_argument("--url", help="Benchmark a running server (e.g. http://localhost:8000) instead of in-process.")
+    args = parser.parse_args()
+    asyncio.run(run(args.sizes, args.repeat, args.url))
+
+
+if __name__ == "__main__":
+    main()
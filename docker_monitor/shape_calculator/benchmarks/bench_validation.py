@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark of the validation cost per shape.
+
+Compares the ways a request body can be turned into validated shapes:
+
+    union        json.loads + the plain Union[Circle, Rectangle, Triangle], which tries each
+                 model in turn (how every request was validated before the tagged union)
+    tagged       json.loads + the `shape_type`-discriminated `Shape`
+    tagged json  `ShapeListAdapter.validate_json`: the precompiled validator parses the raw JSON itself
+    raw json     `RawShapeListAdapter.validate_json`: same rules, into dicts instead of models
+
+Each is timed on single shapes (one body per shape, like /calculate_area/) and
+on one list of --count shapes (like /calculate_area/batch). The best of
+--repeat runs is reported in nanoseconds per shape.
+
+Usage (from the shape_calculator directory):
+    python benchmarks/bench_validation.py [--count 10000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Callable, List, Union
+
+from pydantic import TypeAdapter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import (Circle, RawShapeAdapter, RawShapeListAdapter, Rectangle, ShapeAdapter,  # noqa: E402
+                        ShapeListAdapter, Triangle)
+from benchmarks.bench_batch import random_shapes  # noqa: E402
+
+
+def best_of(repeat: int, func: Callable[[], object]) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=10000, help="Shapes per run.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    shapes = random_shapes(args.count)
+    bodies: List[bytes] = [json.dumps(shape).encode() for shape in shapes]
+    batch = json.dumps(shapes).encode()
+
+    union = TypeAdapter(Union[Circle, Rectangle, Triangle])
+    union_list = TypeAdapter(List[Union[Circle, Rectangle, Triangle]])
+    strategies = [
+        ("union", lambda body: union.validate_python(json.loads(body)),
+         lambda: union_list.validate_python(json.loads(batch))),
+        ("tagged", lambda body: ShapeAdapter.validate_python(json.loads(body)),
+         lambda: ShapeListAdapter.validate_python(json.loads(batch))),
+        ("tagged json", ShapeAdapter.validate_json, lambda: ShapeListAdapter.validate_json(batch)),
+        ("raw json", RawShapeAdapter.validate_json, lambda: RawShapeListAdapter.validate_json(batch)),
+    ]
+
+    print(f"{'strategy':<12} | {'single':>12} | {'list':>12} | {'list speedup':>12}")
+    print("-" * 58)
+    baseline = None
+    for name, single, listed in strategies:
+        single_ns = best_of(args.repeat, lambda: [single(body) for body in bodies]) / args.count * 1e9
+        list_ns = best_of(args.repeat, listed) / args.count * 1e9
+        baseline = baseline or list_ns
+        print(f"{name:<12} | {single_ns:>9.0f} ns | {list_ns:>9.0f} ns | {baseline / list_ns:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Load test of the app under gunicorn, to size the worker count from data.
+
+For every combination of --workers and --settings (event loop and HTTP
+parser), the app is started locally with the same gunicorn command as the
+Dockerfile, and each --rates arrival rate is offered for --duration seconds:
+
+    asyncio-h11          uvicorn.workers.UvicornH11Worker
+    asyncio-httptools    benchmarks.workers.AsyncioHttptoolsWorker
+    uvloop-h11           benchmarks.workers.UvloopH11Worker
+    uvloop-httptools     benchmarks.workers.UvloopHttptoolsWorker
+
+The load is open-loop: requests are sent on a fixed schedule whether or not
+earlier ones have completed, and latency is measured from each request's
+scheduled time. A saturated server therefore shows up as growing latency and
+falling achieved RPS, instead of the client quietly slowing down to match it.
+The client is a minimal HTTP/1.1 keep-alive client on asyncio streams, so
+that it stays much cheaper per request than the server it measures. It runs in
+this process, on the same machine: leave it a core, and treat a run whose
+client fell behind its schedule (flagged with '!') as a client limit.
+
+Reported per run: offered and achieved RPS, p50/p95/p99 latency and errors;
+then, per configuration, the highest offered rate that met the SLO
+(p99 <= --slo-p99-ms, no errors, at least 95% of the offered rate achieved).
+
+Usage (from the shape_calculator directory; needs gunicorn, and uvloop/httptools for those settings):
+    python benchmarks/load_test.py [--workers 1 2 4 8] [--settings asyncio-h11 uvloop-httptools]
+                                   [--rates 500 1000 2000 4000] [--duration 10] [--slo-p99-ms 50]
+                                   [--batch-size 0] [--json results.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import importlib.util
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_batch import random_shapes  # noqa: E402
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# --settings name -> gunicorn worker class
+SETTINGS = {
+    "asyncio-h11": "uvicorn.workers.UvicornH11Worker",
+    "asyncio-httptools": "benchmarks.workers.AsyncioHttptoolsWorker",
+    "uvloop-h11": "benchmarks.workers.UvloopH11Worker",
+    "uvloop-httptools": "benchmarks.workers.UvloopHttptoolsWorker",
+}
+
+# How late (seconds) the client may send a request before the run is flagged as client-limited.
+MAX_CLIENT_LAG = 0.05
+
+
+@dataclass
+class RunResult:
+    workers: int
+    setting: str
+    offered: float
+    achieved: float = 0.0
+    p50: float = float("nan")
+    p95: float = float("nan")
+    p99: float = float("nan")
+    errors: int = 0
+    client_lag: float = 0.0
+    latencies: List[float] = field(default_factory=list, repr=False)
+
+    def summarize(self, elapsed: float):
+        latencies = sorted(self.latencies)
+        if latencies:
+            self.p50, self.p95, self.p99 = (latencies[min(len(latencies) - 1, int(len(latencies) * q))]
+                                            for q in (0.50, 0.95, 0.99))
+        self.achieved = len(latencies) / elapsed if elapsed else 0.0
+
+    def meets(self, slo_p99: float) -> bool:
+        return self.errors == 0 and self.p99 <= slo_p99 and self.achieved >= 0.95 * self.offered
+
+    def row(self) -> str:
+        lagged = "!" if self.client_lag > MAX_CLIENT_LAG else " "
+        return (f"{self.workers:>7} | {self.setting:<17} | {self.offered:>7.0f}{lagged} | {self.achieved:>8.0f} | "
+                f"{self.p50 * 1000:>7.1f} ms | {self.p95 * 1000:>7.1f} ms | {self.p99 * 1000:>7.1f} ms | "
+                f"{self.errors:>6}")
+
+
+class HTTPClient:
+    """
+    A minimal HTTP/1.1 client: POSTs over a pool of at most max_connections
+    keep-alive connections. Requests beyond that wait for a free connection.
+    """
+
+    def __init__(self, host: str, port: int, max_connections: int):
+        self.host = host
+        self.port = port
+        self._idle: List[tuple] = []
+        self._slots = asyncio.Semaphore(max_connections)
+
+    async def post(self, path: str, body: bytes) -> int:
+        """Sends the request and returns the response status."""
+        request = (f"POST {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+                   f"Content-Length: {len(body)}\r\n\r\n").encode() + body
+        async with self._slots:
+            writer = None
+            try:
+                while True:
+                    reused = bool(self._idle)
+                    reader, writer = self._idle.pop() if reused else await asyncio.open_connection(self.host,
+                                                                                                    self.port)
+                    writer.write(request)
+                    try:
+                        status_line = await reader.readline()
+                    except ConnectionError:
+                        status_line = b""
+                    if status_line or not reused:
+                        break
+                    # The server closed the idle connection (keep-alive timeout); retry on another one.
+                    writer.close()
+                status = int(status_line.split()[1])
+                length = 0
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b""):
+                        break
+                    name, _, value = line.partition(b":")
+                    if name.strip().lower() == b"content-length":
+                        length = int(value)
+                await reader.readexactly(length)
+            except BaseException:
+                if writer is not None:
+                    writer.close()
+                raise
+            self._idle.append((reader, writer))
+            return status
+
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+async def offer_load(client: HTTPClient, path: str, bodies: List[bytes], result: RunResult,
+                     duration: float, timeout: float):
+    """Sends result.offered requests per second for 'duration' seconds, open-loop."""
+    loop = asyncio.get_running_loop()
+    total = int(result.offered * duration)
+    interval = 1 / result.offered
+    start = loop.time()
+    pending = set()
+
+    async def one(scheduled: float, body: bytes):
+        try:
+            status = await asyncio.wait_for(client.post(path, body), timeout)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError):
+            result.errors += 1
+            return
+        if status == 200:
+            result.latencies.append(loop.time() - scheduled)
+        else:
+            result.errors += 1
+
+    sent = 0
+    while sent < total:
+        now = loop.time()
+        # Send everything that is due, then sleep until the next request is.
+        while sent < total and start + sent * interval <= now:
+            scheduled = start + sent * interval
+            result.client_lag = max(result.client_lag, now - scheduled)
+            task = loop.create_task(one(scheduled, bodies[sent % len(bodies)]))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            sent += 1
+        await asyncio.sleep(max(0.0, start + sent * interval - loop.time()))
+    if pending:
+        await asyncio.wait(pending)
+    result.summarize(loop.time() - start)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(port: int, process: subprocess.Popen, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1) as s:
+                s.sendall(b"GET /cache/stats HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+                if s.recv(64).startswith(b"HTTP/1.1 200"):
+                    return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"gunicorn didn't answer on port {port} within {timeout}s")
+
+
+@contextlib.contextmanager
+def gunicorn(workers: int, worker_class: str) -> Iterator[int]:
+    """Runs the app under gunicorn as the Dockerfile does; yields the port."""
+    port = free_port()
+    process = subprocess.Popen([sys.executable, "-m", "gunicorn", "app.main:app", "--workers", str(workers),
+                                "--worker-class", worker_class, "--bind", f"127.0.0.1:{port}",
+                                "--log-level", "warning"], cwd=APP_DIR)
+    try:
+        wait_ready(port, process)
+        yield port
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+async def run_configuration(workers: int, setting: str, args, bodies: List[bytes], path: str) -> List[RunResult]:
+    results = []
+    with gunicorn(workers, SETTINGS[setting]) as port:
+        client = HTTPClient("127.0.0.1", port, args.connections)
+        try:
+            # Warm up every worker (imports, first requests) at a modest rate; not reported.
+            await offer_load(client, path, bodies, RunResult(workers, setting, min(args.rates)), args.warmup,
+                             args.timeout)
+            for rate in args.rates:
+                result = RunResult(workers, setting, rate)
+                await offer_load(client, path, bodies, result, args.duration, args.timeout)
+                print(result.row(), flush=True)
+                results.append(result)
+        finally:
+            client.close()
+    return results
+
+
+def check_settings(settings: List[str]):
+    for setting in settings:
+        if setting not in SETTINGS:
+            sys.exit(f"Unknown setting '{setting}'; choose from {', '.join(SETTINGS)}.")
+        for module in ("uvloop", "httptools"):
+            if module in setting and importlib.util.find_spec(module) is None:
+                sys.exit(f"'{setting}' needs {module} (pip install {module}).")
+    if importlib.util.find_spec("gunicorn") is None:
+        sys.exit("The load test runs the app under gunicorn (pip install gunicorn).")
+
+
+def print_slo_summary(results: List[RunResult], slo_p99: float):
+    print(f"\nHighest offered rate meeting the SLO (p99 <= {slo_p99 * 1000:.0f} ms, no errors, "
+          f">= 95% of the offered rate achieved):")
+    best: Dict[tuple, Optional[RunResult]] = {}
+    for result in results:
+        key = (result.workers, result.setting)
+        best.setdefault(key, None)
+        if result.meets(slo_p99) and (best[key] is None or result.offered > best[key].offered):
+            best[key] = result
+    print(f"{'workers':>7} | {'setting':<17} | {'rate':>8} | {'p99':>10}")
+    for (workers, setting), result in best.items():
+        if result is None:
+            print(f"{workers:>7} | {setting:<17} | {'none':>8} | {'':>10}")
+        else:
+            print(f"{workers:>7} | {setting:<17} | {result.offered:>8.0f} | {result.p99 * 1000:>7.1f} ms")
+
+
+async def run(args):
+    check_settings(args.settings)
+    if args.batch_size:
+        path = "/calculate_area/batch"
+        bodies = [json.dumps(random_shapes(args.batch_size, seed=i)).encode() for i in range(16)]
+    else:
+        path = "/calculate_area/"
+        bodies = [json.dumps(shape).encode() for shape in random_shapes(1000)]
+
+    print(f"{os.cpu_count()} CPUs; POST {path}, {args.duration:.0f}s per rate; '!' = the client fell behind.")
+    print(f"{'workers':>7} | {'setting':<17} | {'offered':>8} | {'achieved':>8} | {'p50':>10} | {'p95':>10} | "
+          f"{'p99':>10} | {'errors':>6}")
+    print("-" * 98)
+    results: List[RunResult] = []
+    for workers in args.workers:
+        for setting in args.settings:
+            results += await run_configuration(workers, setting, args, bodies, path)
+    print_slo_summary(results, args.slo_p99_ms / 1000)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump([{k: v for k, v in asdict(r).items() if k != "latencies"} for r in results], f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--settings", nargs="+", default=["asyncio-h11", "uvloop-httptools"], metavar="SETTING",
+                        help=f"Event loop and HTTP parser combinations: {', '.join(SETTINGS)}.")
+    parser.add_argument("--rates", type=float, nargs="+", default=[500, 1000, 2000, 4000],
+                        help="Offered requests per second.")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per rate.")
+    parser.add_argument("--warmup", type=float, default=2, help="Seconds of warm-up load per configuration.")
+    parser.add_argument("--connections", type=int, default=256, help="Most connections the client opens.")
+    parser.add_argument("--timeout", type=float, default=5, help="Seconds before a request counts as an error.")
+    parser.add_argument("--slo-p99-ms", type=float, default=50)
+    parser.add_argument("--batch-size", type=int, default=0,
+                        help="Shapes per request to /calculate_area/batch; 0 (the default) loads /calculate_area/.")
+    parser.add_argument("--json", help="Also write the results (without raw latencies) to this file.")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
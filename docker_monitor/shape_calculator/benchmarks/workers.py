@@ -0,0 +1,21 @@
+"""
+Gunicorn worker classes pinning uvicorn's event loop and HTTP parser, for the
+load test (`--worker-class benchmarks.workers.UvloopHttptoolsWorker`).
+
+uvicorn.workers.UvicornWorker picks "auto" for both, which means uvloop and
+httptools when they are installed and asyncio and h11 otherwise; these make
+the choice explicit so a run measures what its label says.
+"""
+from uvicorn.workers import UvicornWorker
+
+
+class AsyncioHttptoolsWorker(UvicornWorker):
+    CONFIG_KWARGS = {"loop": "asyncio", "http": "httptools"}
+
+
+class UvloopH11Worker(UvicornWorker):
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "h11"}
+
+
+class UvloopHttptoolsWorker(UvicornWorker):
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools"}
@@ -0,0 +1,158 @@
+"""
+On-disk journal of the managed fleet, so a restarted monitor picks up where
+the previous run left off.
+
+The journal is a small SQLite database holding, per container name, the
+container ID, spec hash, host, last seen status and the supervisor's restart
+count, plus an event cursor: the time up to which the journal is known to be
+complete. On startup the monitor reattaches to the existing fleet with its
+usual single labelled list call, restores the restart counts, and resumes the
+Docker event stream from the cursor, so whatever happened while it was down
+(e.g. after a SIGKILL, when no cleanup ran) is replayed instead of lost.
+
+    journal = StateJournal("docker_monitor.db")
+    previous = journal.entries()
+    ...
+    journal.record_transition(transition)
+
+Writes are small single-row upserts in WAL mode, cheap enough to do on every
+transition.
+"""
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS containers (
+    name TEXT PRIMARY KEY,
+    container_id TEXT NOT NULL,
+    spec_hash TEXT,
+    host TEXT,
+    status TEXT,
+    health TEXT,
+    exit_code INTEGER,
+    restarts INTEGER NOT NULL DEFAULT 0,
+    last_seen REAL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_UPSERT_CONTAINER = """
+INSERT INTO containers (name, container_id, spec_hash, host, status, health, exit_code, last_seen)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(name) DO UPDATE SET
+    container_id = excluded.container_id, spec_hash = excluded.spec_hash, host = excluded.host,
+    status = excluded.status, health = excluded.health, exit_code = excluded.exit_code,
+    last_seen = excluded.last_seen
+"""
+
+# The cursor only moves forward, whichever thread writes last.
+_ADVANCE_CURSOR = """
+INSERT INTO meta (key, value) VALUES ('event_cursor', ?)
+ON CONFLICT(key) DO UPDATE SET value = max(CAST(value AS REAL), excluded.value)
+"""
+
+
+@dataclass
+class JournalEntry:
+    """What the journal knows about one container."""
+    name: str
+    container_id: str
+    spec_hash: Optional[str] = None
+    host: Optional[str] = None
+    status: Optional[str] = None
+    health: Optional[str] = None
+    exit_code: Optional[int] = None
+    restarts: int = 0
+    last_seen: Optional[float] = None
+
+
+class StateJournal:
+    """
+    The fleet journal, safe to use from several threads.
+
+    Args:
+        path: The SQLite database file; created if it doesn't exist.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def entries(self) -> Dict[str, JournalEntry]:
+        """Every journaled container, keyed by name."""
+        with self._lock:
+            rows = self._db.execute("SELECT name, container_id, spec_hash, host, status, health, exit_code, "
+                                    "restarts, last_seen FROM containers").fetchall()
+        return {row[0]: JournalEntry(*row) for row in rows}
+
+    @property
+    def event_cursor(self) -> Optional[float]:
+        """The time up to which the journal is complete; None for a new journal."""
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'event_cursor'").fetchone()
+        return float(row[0]) if row else None
+
+    def advance_cursor(self, timestamp: Optional[float] = None):
+        """Moves the event cursor forward to 'timestamp' (now by default)."""
+        timestamp = timestamp or time.time()
+        with self._lock:
+            self._db.execute(_ADVANCE_CURSOR, (timestamp,))
+
+    def record_fleet(self, containers: Iterable[JournalEntry]):
+        """
+        Records the whole fleet (e.g. after launch) in one transaction. Containers
+        that aren't part of it any more are dropped; the others keep their restart counts.
+        """
+        now = time.time()
+        rows = [(c.name, c.container_id, c.spec_hash, c.host, c.status, c.health, c.exit_code, now)
+                for c in containers]
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            self._db.execute("CREATE TEMP TABLE IF NOT EXISTS fleet (name TEXT PRIMARY KEY)")
+            self._db.execute("DELETE FROM fleet")
+            self._db.executemany("INSERT OR IGNORE INTO fleet (name) VALUES (?)", [(row[0],) for row in rows])
+            self._db.execute("DELETE FROM containers WHERE name NOT IN (SELECT name FROM fleet)")
+            self._db.executemany(_UPSERT_CONTAINER, rows)
+
+    def record_container(self, entry: JournalEntry):
+        """Records a single (e.g. recreated) container. Its restart count is kept."""
+        with self._lock:
+            self._db.execute(_UPSERT_CONTAINER, (entry.name, entry.container_id, entry.spec_hash, entry.host,
+                                                 entry.status, entry.health, entry.exit_code, time.time()))
+
+    def record_transition(self, transition):
+        """Records the new state from a Transition and advances the event cursor."""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            self._db.execute("UPDATE containers SET status = ?, health = ?, exit_code = ?, last_seen = ? "
+                             "WHERE name = ? AND container_id = ?",
+                             (transition.new_status, transition.health, transition.exit_code, now,
+                              transition.name, transition.container_id))
+            if transition.source != "replay":
+                self._db.execute(_ADVANCE_CURSOR, (now,))
+
+    def record_restarts(self, name: str, restarts: int):
+        """Records the supervisor's restart attempt count for a container."""
+        with self._lock:
+            self._db.execute("UPDATE containers SET restarts = ? WHERE name = ?", (restarts, name))
+
+    def forget(self, name: str):
+        """Drops a container, e.g. after it was cleaned up."""
+        with self._lock:
+            self._db.execute("DELETE FROM containers WHERE name = ?", (name,))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
@@ -0,0 +1,268 @@
+"""
+Restart policy engine for docker_monitor.
+
+The Supervisor is fed the same Transitions the monitor logs and restarts failed
+containers according to a per-spec policy:
+
+    {"name": ..., "image": ..., "command": ...,
+     "restart": {"policy": "on-failure", "max_attempts": 5}}
+
+Policies are 'no', 'always' and 'on-failure' (only a non-zero exit code counts).
+Restarts are delayed with exponential backoff plus jitter, a container that
+keeps dying right after it starts is flagged as crash-looping and held back
+for a cooldown, and all restarts go through a shared token bucket and a small
+worker pool so a mass failure doesn't turn into a thundering herd of requests
+against the daemon.
+"""
+import heapq
+import logging
+import queue
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+import docker
+import requests
+
+RESTART_POLICIES = ("no", "always", "on-failure")
+
+# A container that stays up this long is considered healthy again and its attempt counter resets.
+STABLE_AFTER_SECONDS = 60
+
+# This many failures within CRASH_LOOP_WINDOW_SECONDS counts as a crash loop.
+CRASH_LOOP_FAILURES = 5
+CRASH_LOOP_WINDOW_SECONDS = 120
+
+# How long a crash-looping container is left alone before the next attempt.
+CRASH_LOOP_COOLDOWN_SECONDS = 300
+
+
+@dataclass
+class RestartPolicy:
+    """How (and how often) a container is restarted after it stops."""
+    policy: str = "on-failure"
+    max_attempts: int = 5  # 0 means unlimited
+    backoff_initial: float = 1.0
+    backoff_max: float = 60.0
+
+    @classmethod
+    def from_spec(cls, spec: dict, default: Optional[dict] = None) -> "RestartPolicy":
+        """Builds the policy from a spec's 'restart' entry, falling back to 'default'."""
+        config = dict(default or {})
+        config.update(spec.get("restart") or {})
+        policy = cls(**config)
+        if policy.policy not in RESTART_POLICIES:
+            raise ValueError(f"Unknown restart policy '{policy.policy}' for container '{spec['name']}'.")
+        return policy
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before the given (1-based) attempt: exponential, capped, with jitter."""
+        delay = min(self.backoff_max, self.backoff_initial * 2 ** (attempt - 1))
+        # "Equal jitter": never less than half the delay, so retries still back off,
+        # but spread out enough that many containers failing together don't retry together.
+        return delay / 2 + random.uniform(0, delay / 2)
+
+
+@dataclass
+class RestartState:
+    """Restart bookkeeping for one spec."""
+    attempts: int = 0
+    last_started: Optional[float] = None
+    failures: Deque[float] = field(default_factory=lambda: deque(maxlen=CRASH_LOOP_FAILURES))
+    scheduled: bool = False
+    crash_looping: bool = False
+    gave_up: bool = False
+
+
+class TokenBucket:
+    """Blocking rate limiter shared by all restarts."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, stopping: threading.Event):
+        while not stopping.is_set():
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            stopping.wait(wait)
+
+
+class Supervisor:
+    """
+    Restarts failed containers according to their spec's restart policy.
+
+    Args:
+        client: The Docker client.
+        specs: The container specs; containers are matched to specs by name.
+        launch: Called with a spec to recreate a container that no longer exists; returns the new container.
+        on_replaced: Called with (old container ID, new container) after a recreate.
+        default_policy: Restart settings for specs without a 'restart' entry.
+        max_concurrent_restarts: Restarts in flight at the same time.
+        restarts_per_second: Sustained restart rate across the whole fleet.
+        client_for: Returns the client for a container name, when the fleet spans several hosts.
+        on_attempt: Called with (name, attempt count) whenever a container's count changes, e.g. to journal it.
+    """
+
+    def __init__(self, client: docker.DockerClient, specs: List[dict], launch: Callable[[dict], object],
+                 on_replaced: Optional[Callable[[str, object], None]] = None, default_policy: Optional[dict] = None,
+                 max_concurrent_restarts: int = 4, restarts_per_second: float = 2.0,
+                 client_for: Optional[Callable[[str], docker.DockerClient]] = None,
+                 on_attempt: Optional[Callable[[str, int], None]] = None):
+        self.client = client
+        self.client_for = client_for
+        self.specs = {spec["name"]: spec for spec in specs}
+        self.policies = {spec["name"]: RestartPolicy.from_spec(spec, default_policy) for spec in specs}
+        self.states: Dict[str, RestartState] = {name: RestartState() for name in self.specs}
+        self.launch = launch
+        self.on_replaced = on_replaced
+        self.on_attempt = on_attempt
+        self.max_concurrent_restarts = max_concurrent_restarts
+        self._bucket = TokenBucket(restarts_per_second, burst=max_concurrent_restarts)
+        self._lock = threading.Lock()
+        self._schedule: List[Tuple[float, str, str, str]] = []  # (due, name, container id, status) heap
+        self._due: "queue.Queue[Tuple[str, str, str]]" = queue.Queue()
+        self._wakeup = threading.Condition()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        """Starts the scheduler and restart worker threads."""
+        self._threads = [threading.Thread(target=self._run_schedule, name="supervisor", daemon=True)]
+        self._threads += [threading.Thread(target=self._run_restarts, name=f"restart-{i}", daemon=True)
+                          for i in range(self.max_concurrent_restarts)]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """Stops scheduling restarts; restarts already in flight are allowed to finish."""
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+    def restore_attempts(self, attempts: Dict[str, int], running: Iterable[str] = ()):
+        """
+        Carries restart attempt counts over from a previous run, so max_attempts
+        spans monitor restarts. Containers in 'running' count as started now, so
+        their counter still resets once they have been up STABLE_AFTER_SECONDS.
+        """
+        running = set(running)
+        with self._lock:
+            for name, count in attempts.items():
+                if name in self.states:
+                    self.states[name].attempts = count
+                    if name in running:
+                        self.states[name].last_started = time.time()
+
+    def observe(self, transition):
+        """Feeds a container Transition to the supervisor."""
+        name = transition.name
+        if name not in self.specs:
+            return
+        with self._lock:
+            state = self.states[name]
+            if transition.new_status == "running":
+                state.last_started = time.time()
+                return
+            if transition.new_status not in ("exited", "dead", "removed") or state.scheduled or state.gave_up:
+                return
+            policy = self.policies[name]
+            failed = transition.new_status == "removed" or transition.exit_code not in (0, None)
+            if policy.policy == "no" or (policy.policy == "on-failure" and not failed):
+                return
+            self._schedule_restart(name, transition.container_id, transition.new_status, transition.exit_code)
+
+    def _schedule_restart(self, name: str, container_id: str, status: str, exit_code: Optional[int]):
+        """Counts a failure and queues the next restart attempt after its backoff. Called with _lock held."""
+        state = self.states[name]
+        policy = self.policies[name]
+        now = time.time()
+        if state.last_started is not None and now - state.last_started >= STABLE_AFTER_SECONDS:
+            state.attempts = 0
+            state.crash_looping = False
+        state.failures.append(now)
+        if policy.max_attempts and state.attempts >= policy.max_attempts:
+            state.gave_up = True
+            logging.error(f"Container '{name}' failed {state.attempts} restart attempts. Giving up on it.")
+            return
+
+        state.attempts += 1
+        if self.on_attempt:
+            self.on_attempt(name, state.attempts)
+        delay = policy.backoff(state.attempts)
+        if len(state.failures) == CRASH_LOOP_FAILURES and now - state.failures[0] <= CRASH_LOOP_WINDOW_SECONDS:
+            if not state.crash_looping:
+                logging.error(f"Container '{name}' is CRASH-LOOPING ({CRASH_LOOP_FAILURES} failures in "
+                              f"{now - state.failures[0]:.0f}s). Holding restarts for {CRASH_LOOP_COOLDOWN_SECONDS}s.")
+            state.crash_looping = True
+            delay = max(delay, CRASH_LOOP_COOLDOWN_SECONDS)
+        exit_detail = f" (exit code {exit_code})" if exit_code is not None else ""
+        logging.warning(f"Container '{name}' is {status}{exit_detail}. Restart attempt {state.attempts} in {delay:.1f}s.")
+        state.scheduled = True
+        with self._wakeup:
+            heapq.heappush(self._schedule, (time.monotonic() + delay, name, container_id, status))
+            self._wakeup.notify()
+
+    def _run_schedule(self):
+        """Moves restarts whose backoff has elapsed to the workers, at most restarts_per_second."""
+        while not self._stopping.is_set():
+            with self._wakeup:
+                while not self._stopping.is_set() and (not self._schedule or self._schedule[0][0] > time.monotonic()):
+                    timeout = self._schedule[0][0] - time.monotonic() if self._schedule else None
+                    self._wakeup.wait(timeout)
+                if self._stopping.is_set():
+                    return
+                _, name, container_id, status = heapq.heappop(self._schedule)
+            self._bucket.acquire(self._stopping)
+            self._due.put((name, container_id, status))
+
+    def _run_restarts(self):
+        while not self._stopping.is_set():
+            try:
+                name, container_id, status = self._due.get(timeout=1)
+            except queue.Empty:
+                continue
+            try:
+                if status == "removed":
+                    logging.info(f"Recreating container '{name}'.")
+                    container = self.launch(self.specs[name])
+                    if self.on_replaced:
+                        self.on_replaced(container_id, container)
+                else:
+                    logging.info(f"Restarting container '{name}' (ID: {container_id[:12]}).")
+                    client = self.client_for(name) if self.client_for else self.client
+                    client.api.start(container_id)
+            except docker.errors.NotFound:
+                # Gone since we last looked: recreate it on the next attempt.
+                self._retry(name, container_id, "removed")
+            except (docker.errors.APIError, requests.exceptions.RequestException) as e:
+                logging.error(f"Failed to restart container '{name}': {e}")
+                self._retry(name, container_id, status)
+            except Exception:
+                # launch() goes through image pulls, readiness gates and the async client, which raise
+                # their own errors. Whatever it is, this worker must survive it and retry later.
+                logging.exception(f"Failed to restart container '{name}'")
+                self._retry(name, container_id, status)
+            else:
+                with self._lock:
+                    self.states[name].scheduled = False
+
+    def _retry(self, name: str, container_id: str, status: str):
+        """Treats a failed restart attempt like another failure of the container."""
+        with self._lock:
+            self.states[name].scheduled = False
+            self._schedule_restart(name, container_id, status, None)
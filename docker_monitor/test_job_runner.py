@@ -0,0 +1,62 @@
+"""
+Tests for job_runner.py against the in-process fake daemon (fake_daemon.py).
+
+    python -m unittest test_job_runner
+"""
+import os
+import signal
+import tempfile
+import threading
+import time
+import unittest
+
+import docker
+
+from fake_daemon import FakeDockerDaemon
+from job_runner import JOB_LABEL, Job, JobRunner
+
+
+class InterruptedRunTest(unittest.TestCase):
+
+    def setUp(self):
+        self.daemon = FakeDockerDaemon().start()
+        self.addCleanup(self.daemon.stop)
+        self.client = docker.DockerClient(base_url=self.daemon.base_url)
+        self.addCleanup(self.client.close)
+        self.results_path = os.path.join(tempfile.mkdtemp(), "results.jsonl")
+
+    def job_containers(self, status=None):
+        return [c for c in self.client.containers.list(all=True, sparse=True, filters={"label": JOB_LABEL})
+                if status is None or c.status == status]
+
+    def interrupt_when_running(self, count):
+        """Sends SIGINT to the main thread (as Ctrl+C would) once 'count' job containers are running."""
+        main = threading.main_thread().ident
+
+        def watch():
+            deadline = time.time() + 10
+            while time.time() < deadline and len(self.job_containers("running")) < count:
+                time.sleep(0.05)
+            signal.pthread_kill(main, signal.SIGINT)
+        threading.Thread(target=watch, daemon=True).start()
+
+    def assert_no_job_containers(self):
+        # Workers that were mid-create when the run was interrupted remove their container themselves.
+        deadline = time.time() + 5
+        while self.job_containers() and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertEqual([c.short_id for c in self.job_containers()], [])
+
+    def test_interrupted_cold_run_leaves_no_containers(self):
+        # The fake daemon's containers run until they are removed, so every job is still in flight.
+        jobs = [Job(str(i), "fake/image:latest", ["sleep", "infinity"]) for i in range(8)]
+        runner = JobRunner(self.client, self.results_path, concurrency=4)
+        self.interrupt_when_running(4)
+        with self.assertRaises(KeyboardInterrupt):
+            runner.run(jobs)
+        self.assert_no_job_containers()
+        self.assertEqual(runner.results, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
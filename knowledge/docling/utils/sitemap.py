@@ -1,58 +1,282 @@
+import gzip
+import io
+import logging
+import queue
+import threading
 import xml.etree.ElementTree as ET
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import IO, Deque, Iterator, List, Optional, Set, Tuple
 from urllib.parse import urljoin
 
 import requests
+from requests.adapters import HTTPAdapter
 
+logger = logging.getLogger(__name__)
 
-def get_sitemap_urls(base_url: str, sitemap_filename: str = "sitemap.xml") -> List[str]:
-    """Fetches and parses a sitemap XML file to extract URLs.
+# Sitemaps fetched at once, and the size of the connection pool they share.
+MAX_WORKERS = 8
+# How deep sitemap indexes may nest. The protocol allows one level, but some sites nest further.
+MAX_DEPTH = 3
+GZIP_MAGIC = b"\x1f\x8b"
+# Parsed entries buffered between the fetching threads and the caller. A thread
+# whose entries aren't consumed blocks, so memory stays bounded however long a sitemap is.
+MAX_BUFFERED_ENTRIES = 1000
+
+
+@dataclass(frozen=True)
+class SitemapEntry:
+    """A page listed in a sitemap."""
+
+    url: str
+    lastmod: Optional[datetime] = None  # timezone-aware; None if the sitemap doesn't say
+
+
+class SitemapNotFound(Exception):
+    """The sitemap returned 404."""
+
+
+def parse_lastmod(value: Optional[str]) -> Optional[datetime]:
+    """Parses a W3C datetime (YYYY, YYYY-MM, YYYY-MM-DD or a full timestamp) as UTC unless it has an offset.
+
+    Returns:
+        The datetime, or None if the value is missing or malformed.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if len(value) == 4:
+        value += "-01-01"
+    elif len(value) == 7:
+        value += "-01"
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _is_modified(lastmod: Optional[datetime], since: Optional[datetime]) -> bool:
+    # Without a lastmod there is no telling, so the entry counts as modified.
+    return since is None or lastmod is None or lastmod > since
+
+
+def _local_name(tag: str) -> str:
+    # Sitemaps use a namespace (sometimes none, sometimes a non-standard one); only the local name matters.
+    return tag.rsplit("}", 1)[-1]
+
+
+def _open_sitemap(session: requests.Session, url: str, timeout: float) -> Tuple[requests.Response, IO[bytes]]:
+    """Requests a sitemap and returns a stream of its XML, decompressed if it is gzipped.
+
+    Raises:
+        SitemapNotFound: If the sitemap returns 404.
+        requests.RequestException: If the request fails.
+    """
+    response = session.get(url, timeout=timeout, stream=True)
+    if response.status_code == 404:
+        response.close()
+        raise SitemapNotFound(url)
+    response.raise_for_status()
+    # Undo any Content-Encoding while reading; a .xml.gz file is gzipped on top of that.
+    response.raw.decode_content = True
+    # Keep the raw stream open at EOF so the buffered reader around it can still read the end.
+    response.raw.auto_close = False
+    stream = io.BufferedReader(response.raw)
+    if stream.peek(len(GZIP_MAGIC)).startswith(GZIP_MAGIC):
+        return response, gzip.GzipFile(fileobj=stream)
+    return response, stream
+
+
+def _read_sitemap(session: requests.Session, url: str, timeout: float) -> Iterator[Tuple[str, SitemapEntry]]:
+    """Fetches one sitemap or sitemap index and yields its entries as they are parsed.
+
+    The XML is parsed as it streams in, and each <url> or <sitemap> element is
+    discarded once read, so memory stays bounded whatever the size of the document.
+
+    Yields:
+        ("url", page) for each page listed, and ("sitemap", child) for each child
+        sitemap listed (if it is an index).
+    """
+    response, stream = _open_sitemap(session, url, timeout)
+    with response:
+        root = None
+        depth = 0
+        loc = lastmod = None
+        for event, elem in ET.iterparse(stream, events=("start", "end")):
+            if event == "start":
+                root = elem if root is None else root
+                depth += 1
+                continue
+            depth -= 1
+            name = _local_name(elem.tag)
+            # <urlset><url><loc> is depth 2; deeper <loc>s belong to extensions, e.g. <image:image>.
+            if depth == 2 and name == "loc":
+                loc = (elem.text or "").strip()
+            elif depth == 2 and name == "lastmod":
+                lastmod = parse_lastmod(elem.text)
+            elif depth == 1 and name in ("url", "sitemap"):
+                entry = SitemapEntry(loc, lastmod) if loc else None
+                loc = lastmod = None
+                # Drop the parsed entries from the tree.
+                root.clear()
+                if entry:
+                    yield name, entry
+
+
+def _as_value_error(error: Exception) -> Exception:
+    """A sitemap's fetch or parse error as ValueError (SitemapNotFound is kept as is)."""
+    if isinstance(error, SitemapNotFound):
+        return error
+    if isinstance(error, requests.RequestException):
+        return ValueError(f"Failed to fetch sitemap: {str(error)}")
+    if isinstance(error, ET.ParseError):
+        return ValueError(f"Failed to parse sitemap XML: {str(error)}")
+    return ValueError(f"Unexpected error processing sitemap: {str(error)}")
+
+
+def iter_sitemap_entries(
+    base_url: str,
+    sitemap_filename: str = "sitemap.xml",
+    since: Optional[datetime] = None,
+    max_workers: int = MAX_WORKERS,
+    timeout: float = 10,
+) -> Iterator[SitemapEntry]:
+    """Crawls a site's sitemap, following sitemap indexes, and yields its pages as they are found.
+
+    Child sitemaps of an index are fetched concurrently by up to 'max_workers'
+    threads sharing one connection pool of that size. Gzipped sitemaps
+    (.xml.gz) are decompressed. Each sitemap is fetched at most once. Pages are
+    handed over one at a time while their sitemap is still being parsed, and at
+    most MAX_BUFFERED_ENTRIES wait for the caller, so even a sitemap of 50,000
+    URLs is never held in memory.
 
     Args:
         base_url: The base URL of the website
-        sitemap_filename: The filename of the sitemap (default: sitemap.xml)
+        sitemap_filename: The filename of the sitemap, or sitemap index (default: sitemap.xml)
+        since: For incremental crawls, only yield pages modified after this time (naive
+            means UTC). Pages without a lastmod are always yielded, and child sitemaps
+            whose lastmod is not after it are not fetched.
+        max_workers: How many sitemaps to fetch at once
+        timeout: Seconds to wait for each sitemap's server
 
-    Returns:
-        List of URLs found in the sitemap. If sitemap is not found, returns a list
-        containing only the base URL.
+    Yields:
+        The pages, in no particular order across sitemaps. If the sitemap is not
+        found, just the base URL.
 
     Raises:
-        ValueError: If there's an error fetching (except 404) or parsing the sitemap
+        ValueError: If there's an error fetching (except 404) or parsing the top-level
+            sitemap; pages it listed before the error have been yielded already. A
+            child sitemap that fails is logged and skipped.
     """
+    if since is not None and since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    sitemap_url = urljoin(base_url, sitemap_filename)
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sitemap")
+    # Entries parsed by the threads, as (kind, entry or error, sitemap url, depth). A
+    # sitemap's last item is ("done", its error or None, url, depth).
+    results: "queue.Queue[Tuple[str, object, str, int]]" = queue.Queue(maxsize=MAX_BUFFERED_ENTRIES)
+    stopping = threading.Event()
+
+    def put(item) -> bool:
+        # Waits for room in the buffer, unless the caller has stopped consuming.
+        while not stopping.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read(url: str, depth: int):
+        entries = _read_sitemap(session, url, timeout)
+        try:
+            for kind, entry in entries:
+                if not put((kind, entry, url, depth)):
+                    return
+        except Exception as e:
+            put(("done", e, url, depth))
+        else:
+            put(("done", None, url, depth))
+        finally:
+            entries.close()
+
     try:
-        sitemap_url = urljoin(base_url, sitemap_filename)
+        seen: Set[str] = {sitemap_url}
+        # Sitemaps found but not fetched yet, as (url, depth). At most 'max_workers' are in flight.
+        backlog: Deque[Tuple[str, int]] = deque([(sitemap_url, 0)])
+        in_flight = 0
+        while backlog or in_flight:
+            while backlog and in_flight < max_workers:
+                executor.submit(read, *backlog.popleft())
+                in_flight += 1
+            kind, item, url, depth = results.get()
+            if kind == "url":
+                if _is_modified(item.lastmod, since):
+                    yield item
+            elif kind == "sitemap":
+                if item.url in seen or not _is_modified(item.lastmod, since):
+                    continue
+                if depth + 1 > MAX_DEPTH:
+                    logger.warning("Skipping sitemap %s: indexes nested deeper than %d", item.url, MAX_DEPTH)
+                    continue
+                seen.add(item.url)
+                backlog.append((item.url, depth + 1))
+            else:
+                in_flight -= 1
+                if item is None:
+                    continue
+                error = _as_value_error(item)
+                if isinstance(error, SitemapNotFound):
+                    if depth == 0:
+                        # Return just the base URL if sitemap not found
+                        yield SitemapEntry(base_url.rstrip("/"))
+                    else:
+                        logger.warning("Skipping sitemap %s: not found", url)
+                elif depth == 0:
+                    raise error from item
+                else:
+                    logger.warning("Skipping sitemap %s: %s", url, error)
+    finally:
+        # Also reached when the caller stops early: threads waiting for room in the buffer give up.
+        stopping.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+        session.close()
 
-        # Fetch sitemap URL
-        response = requests.get(sitemap_url, timeout=10)
 
-        # # Return just the base URL if sitemap not found
-        if response.status_code == 404:
-            return [base_url.rstrip("/")]
+def iter_sitemap_urls(base_url: str, sitemap_filename: str = "sitemap.xml", **kwargs) -> Iterator[str]:
+    """Like iter_sitemap_entries(), yielding just the URLs."""
+    for entry in iter_sitemap_entries(base_url, sitemap_filename, **kwargs):
+        yield entry.url
 
-        response.raise_for_status()
 
-        # Parse XML content
-        root = ET.fromstring(response.content)
+def get_sitemap_urls(base_url: str, sitemap_filename: str = "sitemap.xml") -> List[str]:
+    """Fetches and parses a sitemap XML file to extract URLs.
 
-        # Handle different XML namespaces that sitemaps might use
-        namespaces = (
-            {"ns": root.tag.split("}")[0].strip("{")} if "}" in root.tag else ""
-        )
+    Follows sitemap indexes and decompresses gzipped sitemaps; see
+    iter_sitemap_entries() to stream the pages or crawl incrementally.
 
-        # Extract URLs using namespace if present
-        if namespaces:
-            urls = [elem.text for elem in root.findall(".//ns:loc", namespaces)]
-        else:
-            urls = [elem.text for elem in root.findall(".//loc")]
+    Args:
+        base_url: The base URL of the website
+        sitemap_filename: The filename of the sitemap (default: sitemap.xml)
 
-        return urls
+    Returns:
+        List of URLs found in the sitemap. If sitemap is not found, returns a list
+        containing only the base URL.
 
-    except requests.RequestException as e:
-        raise ValueError(f"Failed to fetch sitemap: {str(e)}")
-    except ET.ParseError as e:
-        raise ValueError(f"Failed to parse sitemap XML: {str(e)}")
-    except Exception as e:
-        raise ValueError(f"Unexpected error processing sitemap: {str(e)}")
+    Raises:
+        ValueError: If there's an error fetching (except 404) or parsing the sitemap
+    """
+    return list(iter_sitemap_urls(base_url, sitemap_filename))
 
 
 if __name__ == "__main__":